@@ -0,0 +1,29 @@
+"""
+Grouping of pending refund orders for consolidated requests.
+
+Several orders from the same customer on the same platform (a bulk
+incident, a damaged multi-item delivery) are sent as one merchant request:
+one policy fetch and one message instead of one of each per order. Platform
+names are compared by their registry name, so "Amazon" and "amazon.com"
+orders of one customer share a request.
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from .platforms import PlatformRegistry, normalize
+
+class PendingOrder(BaseModel):
+    platform: str
+    order_id: str
+    issue_description: str
+    email: Optional[str] = None
+
+def group_orders(orders: List[PendingOrder],
+                 platforms: Optional[PlatformRegistry] = None) -> Dict[Tuple[str, str], List[PendingOrder]]:
+    """Orders keyed by (customer, canonical platform), in submission order; no email means its own group"""
+    groups: Dict[Tuple[str, str], List[PendingOrder]] = defaultdict(list)
+    for order in orders:
+        customer = (order.email or f"order:{order.order_id}").strip().lower()
+        platform = platforms.canonical(order.platform) if platforms is not None else order.platform
+        groups[(customer, normalize(platform))].append(order)
+    return dict(groups)
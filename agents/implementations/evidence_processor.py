@@ -1,62 +1,113 @@
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+import asyncio
 import json
-from openai import OpenAI
-import pytesseract
-from PIL import Image
-import io
 import base64
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from ..interfaces import IEvidenceProcessor, RefundPolicy
+from .openai_base import OpenAIComponent
+from .receipt_extractors import extract_receipt
+from .receipt_router import VISION_MODEL, choose_route, encode_for_vision, ocr_usable
+from utils.metrics import STAGE_LATENCY, record_fallback, record_receipt_extraction, record_receipt_route
+from utils.deadlines import DeadlineExceeded, ensure_budget, record_cancelled, within_deadline
+from utils.tokens import allocate, estimate_tokens, fit_text
+from utils.tracing import tracer
 from loguru import logger
 from datetime import datetime
 
-class OpenAIEvidenceProcessor(IEvidenceProcessor):
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+# Tesseract releases the GIL, so pages of one receipt OCR in parallel
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+_ocr_pool = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+
+RECEIPT_FIELDS = """Extract and format as JSON with these keys:
+        - order_id: string (any order/transaction ID)
+        - date: string (purchase date)
+        - total_amount: float
+        - merchant: string
+        - items: list of items with prices
+        - payment_method: string
+        - delivery_status: string (if applicable)"""
+
+def _has_receipt_fields(content: str) -> bool:
+    info = json.loads(content)
+    return info.get("order_id") is not None and info.get("total_amount") is not None
+
+def _is_validation(content: str) -> bool:
+    return isinstance(json.loads(content).get("meets_requirements"), bool)
+
+class OpenAIEvidenceProcessor(OpenAIComponent, IEvidenceProcessor):
 
     async def process_receipt(self, receipt_data: bytes) -> Dict[str, Any]:
         """Process receipt and extract relevant information"""
         try:
-            # First try OCR to extract text from receipt
-            receipt_text = self._perform_ocr(receipt_data)
-            
-            # Use GPT-4 to extract structured information
-            prompt = f"""
-            Extract key information from this receipt text:
-            
-            Receipt Text:
-            {receipt_text}
-            
-            Extract and format as JSON with these keys:
-            - order_id: string (any order/transaction ID)
-            - date: string (purchase date)
-            - total_amount: float
-            - merchant: string
-            - items: list of items with prices
-            - payment_method: string
-            - delivery_status: string (if applicable)
-            """
-
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
+            loop = asyncio.get_running_loop()
+            route, reason = await loop.run_in_executor(None, choose_route, receipt_data)
+            receipt_text = ""
 
-            receipt_info = json.loads(response.choices[0].message.content)
-            
-            # Add metadata
-            receipt_info.update({
-                "processing_timestamp": datetime.utcnow().isoformat(),
-                "text_confidence": self._estimate_text_confidence(receipt_text),
-                "has_image": True
-            })
+            if route == "ocr":
+                receipt_text, word_confidence = await self._perform_ocr(receipt_data)
+                if ocr_usable(receipt_text, word_confidence):
+                    record_receipt_route(route, reason)
+                    # Known layouts are read locally; GPT-4 only when a required field is missing or unsure
+                    merchant, receipt_info = extract_receipt(receipt_text, word_confidence)
+                    path = "local" if receipt_info is not None else "llm"
+                    if receipt_info is None:
+                        receipt_info = await self._extract_from_text(receipt_text)
+                    record_receipt_extraction(merchant or "unknown", path)
+                    return self._with_metadata(receipt_info, receipt_text, path)
+                # Garbage OCR would only get a garbage answer from the text model
+                route, reason = "vision", "ocr_low_confidence"
 
-            return receipt_info
+            record_receipt_route(route, reason)
+            receipt_info = await self._extract_from_image(receipt_data)
+            record_receipt_extraction("unknown", "vision")
+            return self._with_metadata(receipt_info, receipt_text, "vision")
 
         except Exception as e:
             logger.error(f"Error processing receipt: {str(e)}")
             return self._get_fallback_receipt_info()
 
+    async def _extract_from_text(self, receipt_text: str) -> Dict[str, Any]:
+        """Use GPT-4 to extract structured information from OCR text"""
+        # Long multi-page receipts would overflow the context window and lose the whole answer
+        receipt_tokens, _ = allocate("process_receipt", RECEIPT_FIELDS, estimate_tokens(receipt_text))
+        receipt_text = fit_text(receipt_text, receipt_tokens)
+        prompt = f"""
+        Extract key information from this receipt text:
+        
+        Receipt Text:
+        {receipt_text}
+        
+        {RECEIPT_FIELDS}
+        """
+
+        content = await self._chat("process_receipt", prompt, temperature=0.3, accept=_has_receipt_fields)
+        return json.loads(content)
+
+    async def _extract_from_image(self, receipt_data: bytes) -> Dict[str, Any]:
+        """Send the downscaled receipt image straight to a vision model"""
+        image = await asyncio.get_running_loop().run_in_executor(None, encode_for_vision, receipt_data)
+        prompt = f"""
+        Extract key information from this receipt image.
+        
+        {RECEIPT_FIELDS}
+        """
+
+        content = await self._chat("process_receipt_image", prompt, temperature=0.3,
+                                   model=VISION_MODEL, image=image)
+        return json.loads(content)
+
+    def _with_metadata(self, receipt_info: Dict[str, Any], receipt_text: str, path: str) -> Dict[str, Any]:
+        receipt_info.setdefault("items", [])
+        receipt_info.setdefault("delivery_status", None)
+        receipt_info.update({
+            "processing_timestamp": datetime.utcnow().isoformat(),
+            "text_confidence": self._estimate_text_confidence(receipt_text),
+            "has_image": True,
+            "extraction": path
+        })
+        return receipt_info
+
     async def validate_evidence(self, 
         evidence: Dict[str, Any], 
         policy: RefundPolicy
@@ -84,13 +135,9 @@ class OpenAIEvidenceProcessor(IEvidenceProcessor):
             }}
             """
 
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
+            content = await self._chat("validate_evidence", prompt, temperature=0.3, accept=_is_validation)
 
-            validation = json.loads(response.choices[0].message.content)
+            validation = json.loads(content)
             
             # Log validation results
             if not validation["meets_requirements"]:
@@ -102,19 +149,63 @@ class OpenAIEvidenceProcessor(IEvidenceProcessor):
             logger.error(f"Error validating evidence: {str(e)}")
             return self._basic_validation(evidence, policy)
 
-    def _perform_ocr(self, image_data: bytes) -> str:
-        """Perform OCR on receipt image"""
+    async def _perform_ocr(self, image_data: bytes) -> Tuple[str, Dict[str, float]]:
+        """OCR every page of the receipt; returns the text stitched in page order and per-word confidences"""
+        ensure_budget("ocr")
+        futures: List[Future] = []
         try:
-            # Convert bytes to image
-            image = Image.open(io.BytesIO(image_data))
-            
-            # Perform OCR
-            text = pytesseract.image_to_string(image)
-            
-            return text.strip()
+            loop = asyncio.get_running_loop()
+            with tracer.span("ocr", image_bytes=len(image_data)) as span, STAGE_LATENCY.labels("ocr").time():
+                pages = await within_deadline("ocr", self._ocr_pages(loop, image_data, futures))
+                if span is not None:
+                    span.set_attribute("pages", len(pages))
+
+            word_confidence: Dict[str, float] = {}
+            for _, confidence in pages:
+                for word, conf in confidence.items():
+                    word_confidence[word] = min(conf, word_confidence.get(word, conf))
+            return "\n\n".join(text.strip() for text, _ in pages if text.strip()), word_confidence
+        except (DeadlineExceeded, asyncio.CancelledError):
+            # Pages not yet picked up by a worker are dropped; running ones cannot be interrupted
+            dropped = sum(f.cancel() for f in futures)
+            if dropped:
+                record_cancelled("ocr_page", count=dropped)
+            raise
         except Exception as e:
             logger.error(f"OCR failed: {str(e)}")
-            return ""
+            return "", {}
+
+    async def _ocr_pages(self, loop, image_data: bytes,
+                         futures: List[Future]) -> List[Tuple[str, Dict[str, float]]]:
+        """Render pages off the loop and queue each for OCR as soon as it is ready.
+
+        At most OCR_WORKERS rendered pages wait on or run OCR at once, so a long
+        PDF never holds more than a few page bitmaps in memory.
+        """
+        # Imported on first use; pytesseract alone adds ~0.5s to cold start
+        from .receipt_pages import iter_pages, ocr_page
+
+        slots = asyncio.Semaphore(OCR_WORKERS)
+
+        def release(_):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(slots.release)
+
+        pages = iter_pages(image_data)
+        try:
+            while True:
+                await slots.acquire()
+                page = await loop.run_in_executor(None, next, pages, None)
+                if page is None:
+                    break
+                futures.append(_ocr_pool.submit(ocr_page, page))
+                futures[-1].add_done_callback(release)
+            return await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+        finally:
+            try:
+                pages.close()
+            except ValueError:
+                pass  # still rendering on an executor thread; closed when that render returns and it is collected
 
     def _estimate_text_confidence(self, text: str) -> float:
         """Estimate confidence in extracted text"""
@@ -156,6 +247,7 @@ class OpenAIEvidenceProcessor(IEvidenceProcessor):
 
     def _get_fallback_receipt_info(self) -> Dict[str, Any]:
         """Return fallback receipt information structure"""
+        record_fallback("receipt_info")
         return {
             "order_id": None,
             "date": datetime.utcnow().isoformat(),
@@ -0,0 +1,237 @@
+"""
+Refund request templates keyed by platform and issue category.
+
+Most first requests are the same email with different order details, so
+they are rendered locally in well under a millisecond instead of being
+written from scratch by GPT-4. Templates are parsed once at registration;
+a line whose fields are missing from the order details is left out rather
+than rendered with blanks.
+"""
+import re
+from string import Formatter
+from typing import Any, Dict, List, Optional, Tuple
+
+# Checked in order; the first category whose pattern matches the issue wins
+ISSUE_CATEGORIES: List[Tuple[str, "re.Pattern[str]"]] = [
+    ("not_received", re.compile(r"\b(never (arrived|received|delivered)|not (arrived|received|delivered)|missing (order|package|delivery)|lost)\b", re.I)),
+    ("wrong_item", re.compile(r"\b(wrong (item|order|size|colou?r)|incorrect (item|order)|different item|missing items?)\b", re.I)),
+    ("damaged", re.compile(r"\b(damaged|broken|defective|cracked|smashed|spilled|faulty|torn)\b", re.I)),
+    ("not_as_described", re.compile(r"\b(not as described|doesn't match|does not match|misleading|listing)\b", re.I)),
+    ("cancelled", re.compile(r"\b(cancell?ed|host cancel|double charged|charged twice)\b", re.I)),
+]
+
+PLATFORM_NAMES = {"amazon": "Amazon", "ubereats": "Uber Eats", "airbnb": "Airbnb"}
+
+# Fields a template may use, computed from the order details and policy
+TEMPLATE_FIELDS = ("platform", "order_id", "order_date", "total", "items", "merchant",
+                   "issue", "policy_point", "personal_note")
+# Fields without which a templated request is not sent
+REQUIRED_FIELDS = ("order_id", "issue")
+
+
+class MessageTemplate:
+    """A template split once into lines of (literal, field) segments"""
+
+    def __init__(self, text: str):
+        self.lines: List[List[Tuple[str, Optional[str]]]] = []
+        for line in text.strip("\n").split("\n"):
+            segments = [(literal, field) for literal, field, _, _ in Formatter().parse(line)]
+            for _, field in segments:
+                if field is not None and field not in TEMPLATE_FIELDS:
+                    raise ValueError(f"Unknown template field {field!r}")
+            self.lines.append(segments)
+
+    def render(self, values: Dict[str, Any]) -> str:
+        out = []
+        for segments in self.lines:
+            if any(field is not None and not values.get(field) for _, field in segments):
+                continue
+            out.append("".join(literal + (str(values[field]) if field else "") for literal, field in segments))
+        return "\n".join(out)
+
+
+TEMPLATES: Dict[Tuple[str, str], MessageTemplate] = {}
+
+
+def register_template(platform: str, category: str, text: str) -> None:
+    """Register a template; ``platform`` "*" applies to any platform without its own"""
+    TEMPLATES[(platform, category)] = MessageTemplate(text)
+
+
+def classify_issue(issue_description: str) -> Optional[str]:
+    for category, pattern in ISSUE_CATEGORIES:
+        if pattern.search(issue_description):
+            return category
+    return None
+
+
+def find_template(platform: str, issue_description: str) -> Tuple[Optional[str], Optional[MessageTemplate]]:
+    category = classify_issue(issue_description)
+    if category is None:
+        return None, None
+    return category, TEMPLATES.get((platform, category)) or TEMPLATES.get(("*", category))
+
+
+def template_values(platform: str, category: str, issue_description: str,
+                    policy_criteria: Dict[str, Any], order_details: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill the template fields from what the evidence processor and policy analysis returned"""
+    total = order_details.get("total_amount")
+    items = order_details.get("items") or []
+    names = [item.get("name", "") if isinstance(item, dict) else str(item) for item in items]
+    return {
+        "platform": PLATFORM_NAMES.get(platform, platform.title()),
+        "order_id": order_details.get("order_id"),
+        "order_date": order_details.get("date"),
+        "total": f"${total:,.2f}" if isinstance(total, (int, float)) else total,
+        "items": ", ".join(name for name in names if name),
+        "merchant": order_details.get("merchant"),
+        "issue": issue_description.strip().rstrip("."),
+        "policy_point": _policy_point(category, policy_criteria),
+    }
+
+
+def _policy_point(category: Optional[str], criteria: Dict[str, Any]) -> Optional[str]:
+    """The eligibility criterion the policy analysis filed under this category, if any"""
+    if category is None:
+        return None
+    words = category.split("_")
+    for key, value in criteria.items():
+        if all(word in key.lower() for word in words) and isinstance(value, str) and value:
+            return value.strip().rstrip(".")
+    return None
+
+
+_REQUEST_CLOSE = """
+{personal_note}
+I would appreciate a full refund to my original payment method. Please let me know if you need anything further from me.
+
+Kind regards"""
+
+register_template("*", "damaged", """
+Dear {platform} Customer Service,
+
+I am writing to request a refund for order {order_id}, which arrived damaged.
+The order was placed on {order_date} for a total of {total}.
+Affected item(s): {items}.
+Details: {issue}.
+Your refund policy covers this case: {policy_point}.
+""" + _REQUEST_CLOSE)
+
+register_template("*", "not_received", """
+Dear {platform} Customer Service,
+
+I am writing to request a refund for order {order_id}, which I have not received.
+The order was placed on {order_date} for a total of {total}.
+Item(s) ordered: {items}.
+Details: {issue}.
+Your refund policy covers this case: {policy_point}.
+""" + _REQUEST_CLOSE)
+
+register_template("*", "wrong_item", """
+Dear {platform} Customer Service,
+
+I am writing to request a refund for order {order_id}, as I received the wrong item.
+The order was placed on {order_date} for a total of {total}.
+Item(s) ordered: {items}.
+Details: {issue}.
+Your refund policy covers this case: {policy_point}.
+""" + _REQUEST_CLOSE)
+
+register_template("*", "not_as_described", """
+Dear {platform} Customer Service,
+
+I am writing to request a refund for order {order_id}, as it was not as described.
+The order was placed on {order_date} for a total of {total}.
+Item(s) ordered: {items}.
+Details: {issue}.
+Your refund policy covers this case: {policy_point}.
+""" + _REQUEST_CLOSE)
+
+register_template("ubereats", "not_received", """
+Dear Uber Eats Support,
+
+My order {order_id} from {merchant} was never delivered.
+The order was placed on {order_date} and I was charged {total}.
+Details: {issue}.
+Your refund policy covers this case: {policy_point}.
+""" + _REQUEST_CLOSE)
+
+register_template("airbnb", "cancelled", """
+Dear Airbnb Support,
+
+I am writing to request a refund for reservation {order_id}, which was cancelled.
+The booking was made on {order_date} for a total of {total}.
+Details: {issue}.
+Your refund policy covers this case: {policy_point}.
+""" + _REQUEST_CLOSE)
+
+
+# Sent when the LLM cannot be reached (open breaker, no time left) and no category template fits
+FALLBACK_REQUEST = MessageTemplate("""
+Dear {platform} Customer Service,
+
+I am writing to request a refund for order {order_id}.
+The order was placed on {order_date} for a total of {total}.
+Details: {issue}.
+""" + _REQUEST_CLOSE)
+
+FALLBACK_ESCALATION = MessageTemplate("""
+Dear {platform} Customer Service,
+
+Thank you for your reply, but I cannot accept this decision. I believe my request is covered by your refund policy.
+Please escalate it to a supervisor for review and let me know the outcome.
+
+Kind regards""")
+
+
+def render_fallback_request(platform: str, issue_description: str, policy_criteria: Dict[str, Any],
+                            order_details: Dict[str, Any]) -> str:
+    """The category template if one matches, else a generic request; lines without values are left out"""
+    category, template = find_template(platform, issue_description)
+    values = template_values(platform, category, issue_description, policy_criteria, order_details)
+    return (template or FALLBACK_REQUEST).render(values)
+
+
+def render_fallback_escalation(platform: str) -> str:
+    return FALLBACK_ESCALATION.render({"platform": PLATFORM_NAMES.get(platform, platform.title())})
+
+
+_CONSOLIDATED_HEADER = MessageTemplate("""
+Dear {platform} Customer Service,
+
+I am writing to request refunds for the following orders:
+""")
+
+_CONSOLIDATED_ORDER = MessageTemplate("""
+- Order {order_id}: {issue}.
+  Placed on {order_date} for {total}.
+  Item(s): {items}.
+""")
+
+_CONSOLIDATED_POLICY = MessageTemplate("""- {policy_point}.""")
+
+_CONSOLIDATED_CLOSE = MessageTemplate(_REQUEST_CLOSE.replace("a full refund", "full refunds"))
+
+
+def render_consolidated(platform: str, orders: List[Dict[str, Any]],
+                        policy_criteria: Dict[str, Any], strict: bool = True) -> Optional[str]:
+    """One request listing every order, or None if any issue falls outside the known categories.
+
+    With ``strict=False`` (the fallback when the LLM is unavailable) unknown issues are listed as well.
+    """
+    categories = [classify_issue(order["issue_description"]) for order in orders]
+    if strict and None in categories:
+        return None
+    rows = [
+        template_values(platform, category, order["issue_description"], policy_criteria,
+                        {**order["order_details"], "order_id": order["order_id"]})
+        for category, order in zip(categories, orders)
+    ]
+    points = list(dict.fromkeys(row["policy_point"] for row in rows if row["policy_point"]))
+    parts = [_CONSOLIDATED_HEADER.render(rows[0])]
+    parts.extend(_CONSOLIDATED_ORDER.render(row) for row in rows)
+    if points:
+        parts.append("\nYour refund policy covers these cases:")
+        parts.extend(_CONSOLIDATED_POLICY.render({"policy_point": point}) for point in points)
+    parts.extend(["", _CONSOLIDATED_CLOSE.render({})])
+    return "\n".join(parts)
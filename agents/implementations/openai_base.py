@@ -0,0 +1,111 @@
+import time
+from typing import Any, Callable, Optional, Tuple
+from loguru import logger
+from utils.cassette import cassette_from_env
+from utils.circuit import llm_breaker
+from utils.deadlines import ensure_budget, within_deadline
+from utils.metrics import LLM_LATENCY, record_llm_usage
+from utils.model_routing import MODEL_TIERS, record_route, record_route_outcome, route_model, upgrade_tier
+from utils.tokens import check_budget, estimate_tokens, image_tokens, ledger
+from utils.tracing import tracer
+
+class OpenAIComponent:
+    """Shared OpenAI client and instrumented chat call for the GPT-4 components"""
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self._client = None
+
+    @property
+    def client(self):
+        """AsyncOpenAI client, created (and openai imported) on the first call.
+
+        With ``LLM_CASSETTE`` set, calls are recorded through or replayed from a cassette.
+        """
+        if self._client is None:
+            cassette = cassette_from_env(self._openai_client)
+            self._client = cassette if cassette is not None else self._openai_client()
+        return self._client
+
+    def _openai_client(self):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=self.api_key)
+
+    @client.setter
+    def client(self, client) -> None:
+        self._client = client
+
+    async def _chat(self, call_site: str, prompt: str, temperature: float, model: Optional[str] = None,
+                    image: Optional[Tuple[str, int, int]] = None,
+                    accept: Optional[Callable[[str], bool]] = None) -> str:
+        """Send a single-message chat completion and return the reply text.
+
+        ``image`` is an optional ``(url, width, height)`` sent alongside the prompt.
+        Without an explicit ``model`` the call site's route picks one; a small-model
+        reply that fails ``accept`` is retried once on the large model.
+        """
+        estimated = estimate_tokens(prompt)
+        message = prompt
+        if image is not None:
+            url, width, height = image
+            estimated += image_tokens(width, height)
+            message = [
+                {"type": "text", "text": prompt},
+                {"type": "image_url", "image_url": {"url": url, "detail": "high"}},
+            ]
+
+        tier = ""
+        if model is None:
+            tier, model = route_model(call_site, estimated)
+        content = await self._complete(call_site, prompt, message, estimated, temperature, model, tier)
+
+        if accept is not None and upgrade_tier(tier):
+            accepted = _accepts(accept, content)
+            record_route_outcome(call_site, tier, accepted)
+            if not accepted:
+                tier = upgrade_tier(tier)
+                content = await self._complete(
+                    call_site, prompt, message, estimated, temperature, MODEL_TIERS[tier], tier
+                )
+        return content
+
+    async def _complete(self, call_site: str, prompt: str, message: Any, estimated: int,
+                        temperature: float, model: str, tier: str) -> str:
+        if not check_budget(call_site, estimated, model):
+            logger.warning(f"{call_site} prompt of ~{estimated} tokens exceeds its budget")
+        # Skip the call (callers fall back locally) rather than start one that cannot finish in time
+        ensure_budget(call_site, estimated)
+
+        started = time.perf_counter()
+        with tracer.span(f"llm.{call_site}", model=model, prompt_chars=len(prompt),
+                         estimated_prompt_tokens=estimated) as span:
+            # An open breaker raises CircuitOpen at once, so callers fall back without stalling
+            response = await within_deadline(call_site, llm_breaker(call_site).call(
+                self.client.chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": message}],
+                    temperature=temperature
+                )
+            ), estimated)
+            content = response.choices[0].message.content
+            usage = response.usage
+            prompt_tokens = usage.prompt_tokens if usage else estimated
+            completion_tokens = usage.completion_tokens if usage else estimate_tokens(content or "")
+            if span is not None:
+                span.set_attribute("prompt_tokens", prompt_tokens)
+                span.set_attribute("completion_tokens", completion_tokens)
+        latency = time.perf_counter() - started
+
+        LLM_LATENCY.labels(call_site).observe(latency)
+        if tier:
+            record_route(call_site, tier, latency)
+        record_llm_usage(call_site, prompt_tokens, completion_tokens)
+        ledger.record(call_site, prompt_tokens, completion_tokens, latency)
+        return content
+
+
+def _accepts(accept: Callable[[str], bool], content: str) -> bool:
+    try:
+        return bool(accept(content))
+    except Exception:
+        return False
@@ -1,24 +1,58 @@
-from typing import Dict, Any
-from openai import OpenAI
+from typing import Dict, Any, Optional
 from ..interfaces import IMessageGenerator, RefundPolicy
+from .openai_base import OpenAIComponent
+from .message_templates import (
+    REQUIRED_FIELDS,
+    find_template,
+    render_consolidated,
+    render_fallback_escalation,
+    render_fallback_request,
+    template_values
+)
+from utils.metrics import record_fallback, record_message_path
+from utils.tokens import allocate
+from loguru import logger
 import json
 
-class OpenAIMessageGenerator(IMessageGenerator):
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+class OpenAIMessageGenerator(OpenAIComponent, IMessageGenerator):
+    POLICY_EXCERPT_TOKENS = 600
+
+    def __init__(self, api_key: str, personalize: bool = False):
+        super().__init__(api_key)
+        # Templated requests get a short GPT-4 note in the customer's words when enabled
+        self.personalize = personalize
 
     async def generate_request(
         self,
         issue_description: str,
         policy: RefundPolicy,
-        order_details: Dict[str, Any]
+        order_details: Dict[str, Any],
+        order_id: Optional[str] = None
     ) -> str:
+        if order_id:
+            # The claimed order wins over whatever ID the receipt extraction found
+            order_details = {**order_details, "order_id": order_id}
+        category, template = find_template(policy.platform, issue_description)
+        values = template_values(
+            policy.platform, category, issue_description, policy.eligibility_criteria, order_details
+        ) if template is not None else {}
+        # A letter without the order reference is no use; GPT-4 writes it from the description instead
+        if template is not None and all(values.get(field) for field in REQUIRED_FIELDS):
+            if self.personalize:
+                values["personal_note"] = await self._personal_note(issue_description)
+            record_message_path("request", "template+llm" if values.get("personal_note") else "template")
+            return template.render(values)
+
+        record_message_path("request", "llm")
+        details = json.dumps(order_details)
+        # Order details are never cut; the policy excerpt shrinks to fit the budget
+        policy_tokens, _ = allocate("generate_request", issue_description + details, self.POLICY_EXCERPT_TOKENS)
         prompt = f"""
         Generate a professional refund request based on:
 
         Issue: {issue_description}
-        Order Details: {json.dumps(order_details)}
-        Platform Policy: {policy.policy_text}
+        Order Details: {details}
+        Platform Policy: {policy.excerpt(issue_description, policy_tokens)}
         
         Requirements:
         1. Professional and courteous tone
@@ -27,13 +61,64 @@ class OpenAIMessageGenerator(IMessageGenerator):
         4. Clear statement of desired resolution
         """
 
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
-        )
+        try:
+            return await self._chat("generate_request", prompt, temperature=0.7)
+        except Exception as e:
+            # Open breaker, deadline or provider error: a plain letter beats no request at all
+            logger.error(f"Error generating refund request: {str(e)}")
+            record_fallback("request_message")
+            return render_fallback_request(policy.platform, issue_description, policy.eligibility_criteria,
+                                           order_details)
+
+    async def generate_consolidated_request(
+        self,
+        orders: list[Dict[str, Any]],
+        policy: RefundPolicy
+    ) -> str:
+        message = render_consolidated(policy.platform, orders, policy.eligibility_criteria)
+        if message is not None:
+            record_message_path("consolidated_request", "template")
+            return message
+
+        record_message_path("consolidated_request", "llm")
+        details = json.dumps([
+            {"order_id": o["order_id"], "issue": o["issue_description"], **o["order_details"]} for o in orders
+        ])
+        policy_tokens, _ = allocate("generate_consolidated_request", details, self.POLICY_EXCERPT_TOKENS)
+        issues = " ".join(o["issue_description"] for o in orders)
+        prompt = f"""
+        Generate one professional refund request covering several orders:
+
+        Orders: {details}
+        Platform Policy: {policy.excerpt(issues, policy_tokens)}
+        
+        Requirements:
+        1. Professional and courteous tone
+        2. List every order with its issue and relevant details
+        3. Reference specific policy points that support the request
+        4. Clear statement of desired resolution for each order
+        """
+
+        try:
+            return await self._chat("generate_consolidated_request", prompt, temperature=0.7)
+        except Exception as e:
+            logger.error(f"Error generating consolidated refund request: {str(e)}")
+            record_fallback("consolidated_request_message")
+            return render_consolidated(policy.platform, orders, policy.eligibility_criteria, strict=False)
+
+    async def _personal_note(self, issue_description: str) -> str:
+        """One or two sentences restating the issue in the customer's voice; empty on failure"""
+        prompt = f"""
+        Write one or two sentences, in the first person, that a customer could add to a
+        refund request to explain this problem in their own words. Return only the sentences.
 
-        return response.choices[0].message.content
+        Problem: {issue_description}
+        """
+        try:
+            return (await self._chat("personalize_request", prompt, temperature=0.7)).strip()
+        except Exception as e:
+            logger.error(f"Error personalizing refund request: {str(e)}")
+            return ""
 
     async def generate_escalation(
         self,
@@ -41,11 +126,18 @@ class OpenAIMessageGenerator(IMessageGenerator):
         policy: RefundPolicy,
         history: list[str]
     ) -> str:
+        # The rejection and the original request decide which policy points matter
+        query = " ".join([previous_response, *history[:1]])
+        # Older history is dropped first, then the policy excerpt shrinks
+        policy_tokens, history = allocate(
+            "generate_escalation", previous_response, self.POLICY_EXCERPT_TOKENS, history
+        )
+        policy_excerpt = policy.excerpt(query, policy_tokens)
         prompt = f"""
         Generate an escalation message based on:
 
         Previous Response: {previous_response}
-        Platform Policy: {policy.policy_text}
+        Platform Policy: {policy_excerpt}
         Conversation History: {json.dumps(history)}
         
         Requirements:
@@ -55,10 +147,9 @@ class OpenAIMessageGenerator(IMessageGenerator):
         4. Clear escalation request (e.g., supervisor review)
         """
 
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
-        )
-
-        return response.choices[0].message.content 
\ No newline at end of file
+        try:
+            return await self._chat("generate_escalation", prompt, temperature=0.7)
+        except Exception as e:
+            logger.error(f"Error generating escalation: {str(e)}")
+            record_fallback("escalation_message")
+            return render_fallback_escalation(policy.platform) 
\ No newline at end of file
@@ -0,0 +1,110 @@
+from typing import Dict, List, Optional
+import asyncio
+import random
+from ..interfaces import IPolicyFetcher, RefundPolicy
+from ..platforms import PlatformRegistry
+from ..policy_sections import PolicyVersion
+from .policy_fetcher import OpenAIPolicyFetcher
+from utils.deadlines import deadline_scope, within_deadline
+from utils.metrics import record_cache
+from utils.tracing import tracer
+from loguru import logger
+
+class WarmPolicyCache(IPolicyFetcher):
+    """
+    Serves pre-analyzed policies from memory.
+
+    ``warm_up`` loads every configured platform concurrently at startup and
+    ``start_refresh`` re-validates them on a schedule, so request paths read
+    a ready RefundPolicy instead of scraping and calling GPT-4 inline.
+    A failed refresh keeps the previous policy.
+    """
+
+    def __init__(self, fetcher: OpenAIPolicyFetcher, refresh_interval: float = 6 * 3600):
+        self.fetcher = fetcher
+        self.refresh_interval = refresh_interval
+        self._policies: Dict[str, RefundPolicy] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        self._refresher: Optional[asyncio.Task] = None
+
+    @property
+    def platforms(self) -> PlatformRegistry:
+        return self.fetcher.platforms
+
+    def history(self, platform: str) -> List[PolicyVersion]:
+        return self.fetcher.history(platform)
+
+    async def fetch_policy(self, platform: str) -> RefundPolicy:
+        """Return the cached policy, loading it inline only on a cold miss"""
+        spec = self.platforms.resolve(platform)
+        if spec is None:
+            return self.platforms.default_policy(platform)
+        platform = spec.name
+        policy = self._policies.get(platform)
+        record_cache("policy", policy is not None)
+        with tracer.span("policy_cache", platform=platform, cache="hit" if policy else "miss"):
+            if policy is not None:
+                return policy
+            try:
+                return await self._load(platform)
+            except Exception as e:
+                logger.error(f"Error fetching policy for {platform}: {str(e)}")
+                return self.fetcher._get_fallback_policy(platform)
+
+    async def _load(self, platform: str) -> RefundPolicy:
+        """Load and cache a policy; concurrent callers share one scrape and analysis"""
+        task = self._loading.get(platform)
+        if task is None:
+            task = asyncio.ensure_future(self._load_shared(platform))
+            self._loading[platform] = task
+            task.add_done_callback(lambda done: self._store(platform, done))
+        # A caller that runs out of time stops waiting; the shared load carries on
+        return await within_deadline("policy_fetch", asyncio.shield(task))
+
+    async def _load_shared(self, platform: str) -> RefundPolicy:
+        # The result is cached for everyone, so the first caller's deadline must not cut it short
+        with deadline_scope(None):
+            return await self.fetcher.load_policy(platform)
+
+    def _store(self, platform: str, task: asyncio.Task) -> None:
+        self._loading.pop(platform, None)
+        if not task.cancelled() and task.exception() is None:
+            self._policies[platform] = task.result()
+
+    async def warm_up(self, timeout: Optional[float] = 60) -> None:
+        """Load every configured platform concurrently; stragglers finish in the background"""
+        tasks = [asyncio.ensure_future(self.refresh(platform)) for platform in self.platforms.names()]
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        logger.info(f"Policy warm-up: {len(self._policies)}/{len(tasks)} platforms ready")
+        if pending:
+            logger.warning(f"Policy warm-up still running for {len(pending)} platform(s)")
+
+    async def refresh(self, platform: str) -> bool:
+        """Re-load one platform's policy, keeping the cached one on failure"""
+        try:
+            await self._load(platform)
+            return True
+        except Exception as e:
+            logger.error(f"Error refreshing policy for {platform}: {str(e)}")
+            return False
+
+    async def _refresh_forever(self) -> None:
+        while True:
+            # Jitter keeps several workers from re-scraping in lockstep
+            await asyncio.sleep(self.refresh_interval * random.uniform(0.9, 1.1))
+            await asyncio.gather(*(self.refresh(platform) for platform in self.platforms.names()))
+
+    def start_refresh(self) -> None:
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.ensure_future(self._refresh_forever())
+
+    async def stop_refresh(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
@@ -1,113 +1,186 @@
-from typing import Dict, Any
-import aiohttp
-from bs4 import BeautifulSoup
-from openai import OpenAI
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
 import json
+from urllib.parse import urlparse
 from ..interfaces import IPolicyFetcher, RefundPolicy
+from ..platforms import DEFAULT_POLICY, PlatformRegistry
+from ..policy_index import PolicyIndex
+from ..policy_sections import PolicySectionStore, PolicyVersion, content_hash
+from .openai_base import OpenAIComponent
+from utils.circuit import host_breaker
+from utils.metrics import STAGE_LATENCY, record_cache, record_fallback
+from utils.tokens import PROMPT_OVERHEAD_TOKENS, estimate_tokens, prompt_budget
+from utils.tracing import tracer
 from loguru import logger
 
-class OpenAIPolicyFetcher(IPolicyFetcher):
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
-        self.policy_urls = {
-            "amazon": "https://www.amazon.com/gp/help/customer/display.html?nodeId=GKM69DUUYKQWKWX7",
-            "ubereats": "https://help.uber.com/ubereats/article/uber-eats-refund-policy",
-            "airbnb": "https://www.airbnb.com/help/article/1320/airbnb-guest-refund-policy",
-        }
+# What _analyze_policy needs to find in a policy page
+ANALYSIS_QUERY = (
+    "refund return eligible eligibility conditions damaged defective not received "
+    "not as described days hours window time limit deadline evidence photos "
+    "receipt proof order number documentation required"
+)
+
+def _is_section_analysis(section_ids: List[str]):
+    def accept(content: str) -> bool:
+        analysis = json.loads(content)
+        return all(isinstance(analysis.get(section_id), dict) for section_id in section_ids)
+    return accept
+
+class OpenAIPolicyFetcher(OpenAIComponent, IPolicyFetcher):
+    ANALYSIS_EXCERPT_TOKENS = 500
+
+    def __init__(self, api_key: str, platforms: Optional[PlatformRegistry] = None):
+        super().__init__(api_key)
+        self.download_timeout = 15.0
+        self.sections = PolicySectionStore()
+        self.platforms = platforms or PlatformRegistry.from_file()
+
+    @property
+    def policy_urls(self) -> Dict[str, str]:
+        return self.platforms.urls()
         
     async def fetch_policy(self, platform: str) -> RefundPolicy:
         """Fetch and analyze refund policy for a given platform"""
+        spec = self.platforms.resolve(platform)
+        if spec is None:
+            # Nothing to scrape or analyze for an unknown platform
+            return self.platforms.default_policy(platform)
+        platform = spec.name
         try:
+            return await self.load_policy(platform)
+        except Exception as e:
+            logger.error(f"Error fetching policy for {platform}: {str(e)}")
+            # Return a basic policy if we can't fetch the actual one
+            return self._get_fallback_policy(platform)
+
+    async def load_policy(self, platform: str) -> RefundPolicy:
+        """Scrape and analyze the policy, raising instead of falling back.
+
+        Only sections not analyzed before go to GPT-4; an unchanged page is not analyzed at all.
+        """
+        with tracer.span("policy_fetch", platform=platform), STAGE_LATENCY.labels("policy_fetch").time():
             # Get policy text from platform's website
             policy_text = await self._fetch_policy_text(platform)
-            
-            # Analyze policy using GPT-4
-            analysis = await self._analyze_policy(platform, policy_text)
-            
-            return RefundPolicy(
+            unchanged = self.sections.unchanged(platform, policy_text)
+            record_cache("policy_text", unchanged is not None)
+            if unchanged is not None:
+                return unchanged
+            index = PolicyIndex.from_text(policy_text)
+
+            # Analyze new or edited sections using GPT-4
+            chosen = [index.sections[i] for i in index.select(ANALYSIS_QUERY, self.ANALYSIS_EXCERPT_TOKENS)]
+            hashes = [content_hash(section) for section in chosen]
+            missing = self.sections.missing(platform, hashes)
+            by_hash = dict(zip(hashes, chosen))
+            analyzed = await self._analyze_sections(platform, [(h, by_hash[h]) for h in missing])
+            analysis = self.sections.merged(platform, hashes, analyzed) or self._get_fallback_analysis()
+
+            policy = RefundPolicy(
                 platform=platform,
                 policy_text=policy_text,
                 eligibility_criteria=analysis["eligibility_criteria"],
                 time_limits=analysis["time_limits"],
                 required_evidence=analysis["required_evidence"]
             )
-            
-        except Exception as e:
-            logger.error(f"Error fetching policy for {platform}: {str(e)}")
-            # Return a basic policy if we can't fetch the actual one
-            return self._get_fallback_policy(platform)
+            policy._index = index
+            version = self.sections.commit(platform, policy_text, hashes, analyzed, policy)
+            logger.info(
+                f"Policy {platform} v{version.version}: {len(analyzed)}/{len(hashes)} sections analyzed"
+            )
+            return policy
+
+    def history(self, platform: str) -> List[PolicyVersion]:
+        return self.sections.history(self.platforms.canonical(platform))
 
     async def _fetch_policy_text(self, platform: str) -> str:
-        """Fetch policy text from platform website"""
-        if platform not in self.policy_urls:
-            return f"No policy URL configured for {platform}"
+        """Fetch policy text from platform website, or its static text"""
+        spec = self.platforms.specs.get(platform)
+        if spec is None:
+            raise ValueError(f"No policy source configured for {platform}")
+        if spec.policy_text is not None:
+            return spec.policy_text
             
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.policy_urls[platform]) as response:
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    # Remove script and style elements
-                    for script in soup(["script", "style"]):
-                        script.decompose()
-                    return soup.get_text()
+            # Imported on first fetch to keep worker start-up fast
+            from bs4 import BeautifulSoup
+
+            url = spec.url
+            with tracer.span("policy_download"), STAGE_LATENCY.labels("policy_download").time():
+                html = await host_breaker(urlparse(url).netloc).call(self._download(url))
+            with tracer.span("html_extraction"), STAGE_LATENCY.labels("html_extraction").time():
+                soup = BeautifulSoup(html, 'html.parser')
+                # Remove script and style elements
+                for script in soup(["script", "style"]):
+                    script.decompose()
+                return soup.get_text()
         except Exception as e:
             logger.error(f"Error fetching policy text: {str(e)}")
-            return f"Error fetching policy for {platform}"
+            raise
+
+    async def _download(self, url: str) -> str:
+        import aiohttp
+
+        timeout = aiohttp.ClientTimeout(total=self.download_timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(url) as response:
+                response.raise_for_status()
+                return await response.text()
 
-    async def _analyze_policy(self, platform: str, policy_text: str) -> Dict[str, Any]:
-        """Analyze policy text using GPT-4"""
+    async def _analyze_sections(self, platform: str,
+                                sections: List[Tuple[str, str]]) -> Dict[str, Dict[str, Any]]:
+        """Analyze ``(hash, text)`` sections, batched per prompt budget; failed batches are left out"""
+        budget = prompt_budget("analyze_policy") - PROMPT_OVERHEAD_TOKENS
+        batches: List[List[Tuple[str, str]]] = []
+        size = budget
+        for section in sections:
+            cost = estimate_tokens(section[1])
+            if size + cost > budget:
+                batches.append([])
+                size = 0
+            batches[-1].append(section)
+            size += cost
+        results = await asyncio.gather(*(self._analyze_policy(platform, batch) for batch in batches))
+        return {h: analysis for result in results for h, analysis in result.items()}
+
+    async def _analyze_policy(self, platform: str, sections: List[Tuple[str, str]]) -> Dict[str, Dict[str, Any]]:
+        """Analyze policy sections using GPT-4, one result per section hash"""
+        ids = [f"s{i + 1}" for i in range(len(sections))]
+        numbered = "\n".join(f"[{section_id}] {text}" for section_id, (_, text) in zip(ids, sections))
         prompt = f"""
-        Analyze this {platform} refund policy and extract:
+        Analyze these sections of the {platform} refund policy and extract, for each section, only what it states:
         1. Eligibility criteria for refunds
         2. Time limits for different types of refunds
         3. Required evidence or documentation
         
-        Policy Text:
-        {policy_text[:2000]}  # Truncate to avoid token limits
+        Policy Sections:
+        {numbered}
         
-        Format the response as JSON with these keys:
+        Format the response as a JSON object keyed by section id (e.g. "s1"), each with these keys
+        (empty when the section states none):
         - eligibility_criteria: dict of conditions
         - time_limits: dict of timeframes in hours
         - required_evidence: list of required documents/evidence
         """
         
-        response = self.client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7
-        )
+        content = await self._chat("analyze_policy", prompt, temperature=0.7, accept=_is_section_analysis(ids))
         
         try:
-            return json.loads(response.choices[0].message.content)
+            analysis = json.loads(content)
         except json.JSONDecodeError:
             logger.error("Error parsing GPT-4 response as JSON")
-            return self._get_fallback_analysis()
+            return {}
+        # Sections missing from the reply stay unanalyzed and are retried on the next refresh
+        return {h: analysis[section_id] for section_id, (h, _) in zip(ids, sections)
+                if isinstance(analysis.get(section_id), dict)}
 
     def _get_fallback_policy(self, platform: str) -> RefundPolicy:
         """Return a basic fallback policy when actual policy can't be fetched"""
-        return RefundPolicy(
-            platform=platform,
-            policy_text="Standard refund policy applies",
-            eligibility_criteria={
-                "damaged": "Item received damaged",
-                "not_as_described": "Item not as described",
-                "not_received": "Item not received"
-            },
-            time_limits={
-                "standard": 30 * 24,  # 30 days in hours
-                "damaged": 48,        # 48 hours
-                "not_received": 7 * 24 # 7 days in hours
-            },
-            required_evidence=[
-                "Order number",
-                "Photos of damaged items",
-                "Description of issue"
-            ]
-        )
+        record_fallback("policy")
+        return DEFAULT_POLICY.model_copy(update={"platform": platform})
 
     def _get_fallback_analysis(self) -> Dict[str, Any]:
         """Return fallback analysis structure"""
+        record_fallback("policy_analysis")
         return {
             "eligibility_criteria": {
                 "standard": "Standard return window",
@@ -0,0 +1,123 @@
+"""
+Local, per-merchant receipt field extraction.
+
+Well-known receipt layouts carry the order ID, date, total and payment
+method on predictable labelled lines, so precompiled patterns can read
+them straight from the OCR text. Each captured value is checked against
+Tesseract's per-word confidences; the GPT-4 extraction only runs when a
+required field is missing, unparseable or read with low confidence.
+"""
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+REQUIRED_FIELDS = ("order_id", "date", "total_amount", "payment_method")
+# Tesseract word confidence (0-100) below which a captured value is not trusted
+MIN_WORD_CONFIDENCE = 70.0
+
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%B %d, %Y", "%b %d, %Y", "%d %B %Y", "%d %b %Y")
+
+_MONTH_DATE = r"(?:\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{2,4}|[A-Z][a-z]{2,8}\.? \d{1,2}, \d{4}|\d{1,2} [A-Z][a-z]{2,8} \d{4})"
+_AMOUNT = r"\$?\s?(\d{1,3}(?:,\d{3})*\.\d{2})"
+_CARD = r"((?:VISA|Visa|Mastercard|MasterCard|AMEX|Amex|American Express|Discover|PayPal|Apple Pay)[^\n]*?(?:\d{4})?)\s*$"
+
+
+class ReceiptExtractor:
+    """Precompiled field patterns for one merchant's receipt layout"""
+
+    def __init__(self, merchant: str, detect: str, fields: Dict[str, str]):
+        self.merchant = merchant
+        self.detect = re.compile(detect, re.IGNORECASE)
+        # Each pattern captures the value in group 1; first match wins
+        self.fields = {name: re.compile(pattern, re.MULTILINE) for name, pattern in fields.items()}
+
+    def matches(self, text: str) -> bool:
+        return self.detect.search(text) is not None
+
+    def extract(
+        self, text: str, word_confidence: Optional[Dict[str, float]] = None
+    ) -> Tuple[Dict[str, Any], List[str]]:
+        """Return the fields read confidently, and the required ones that were not"""
+        found: Dict[str, Any] = {}
+        for name, pattern in self.fields.items():
+            match = pattern.search(text)
+            if match is None:
+                continue
+            if _confidence(text, match.start(1), match.end(1), word_confidence) < MIN_WORD_CONFIDENCE:
+                continue
+            value = _normalise(name, match.group(1).strip())
+            if value is not None:
+                found[name] = value
+        return found, [name for name in REQUIRED_FIELDS if name not in found]
+
+
+def _confidence(text: str, start: int, end: int, word_confidence: Optional[Dict[str, float]]) -> float:
+    """Lowest OCR confidence among the whole words a capture touches"""
+    if word_confidence is None:
+        return 100.0
+    while start > 0 and not text[start - 1].isspace():
+        start -= 1
+    while end < len(text) and not text[end].isspace():
+        end += 1
+    words = text[start:end].split()
+    return min((word_confidence.get(word, 0.0) for word in words), default=0.0)
+
+
+def _normalise(name: str, value: str) -> Any:
+    if name == "total_amount":
+        return float(value.replace(",", ""))
+    if name == "date":
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.strptime(value.replace(".", ""), fmt).date().isoformat()
+            except ValueError:
+                continue
+        return None
+    return value
+
+
+EXTRACTORS: Dict[str, ReceiptExtractor] = {}
+
+
+def register_extractor(extractor: ReceiptExtractor) -> None:
+    EXTRACTORS[extractor.merchant] = extractor
+
+
+register_extractor(ReceiptExtractor("amazon", r"amazon", {
+    "order_id": r"Order\s*(?:#|Number|ID)\s*:?\s*(\d{3}-\d{3,7}-\d{3,7})",
+    "date": r"Order\s*(?:Date|Placed)\s*:?\s*(" + _MONTH_DATE + r")",
+    "total_amount": r"^(?:Order\s+|Grand\s+)?Total\s*(?:\(\w+\))?\s*:?\s*" + _AMOUNT,
+    "payment_method": r"^(?:Payment\s+Method\s*:?\s*)?" + _CARD,
+}))
+
+register_extractor(ReceiptExtractor("ubereats", r"uber\s*eats", {
+    "order_id": r"Order\s*(?:#|ID)\s*:?\s*([A-Z0-9-]{5,})",
+    "date": r"(?:^|\s)(" + _MONTH_DATE + r")",
+    "total_amount": r"^Total\s*:?\s*" + _AMOUNT,
+    "payment_method": r"^" + _CARD,
+}))
+
+register_extractor(ReceiptExtractor("airbnb", r"airbnb", {
+    "order_id": r"Confirmation\s+code\s*:?\s*([A-Z0-9]{8,12})",
+    "date": r"(?:Check-in|Booked)\s*:?\s*(?:[A-Z][a-z]{2},\s*)?(" + _MONTH_DATE + r")",
+    "total_amount": r"^Total\s*(?:\(\w+\))?\s*:?\s*" + _AMOUNT,
+    "payment_method": r"^" + _CARD,
+}))
+
+
+def extract_receipt(
+    text: str, word_confidence: Optional[Dict[str, float]] = None
+) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """Match a known merchant layout and read its fields locally.
+
+    Returns ``(merchant, fields)``; ``fields`` is None when the layout is
+    unknown or a required field could not be read confidently.
+    """
+    for extractor in EXTRACTORS.values():
+        if not extractor.matches(text):
+            continue
+        found, missing = extractor.extract(text, word_confidence)
+        if missing:
+            return extractor.merchant, None
+        return extractor.merchant, {"merchant": extractor.merchant, **found}
+    return None, None
@@ -0,0 +1,108 @@
+"""
+Split receipts into OCR-sized pages.
+
+Multi-page PDFs are rendered page by page, multi-frame images (TIFF, GIF)
+yield each frame, and very tall screenshots are cut into tiles at blank
+rows so no text line is split between tiles. Pages come out in reading
+order so their OCR text can be stitched back together, and lazily: a page
+is only rendered when the consumer asks for it. Receipts longer than
+``MAX_PAGES`` are truncated.
+"""
+import os
+import threading
+from typing import Dict, Iterator, List, Tuple
+from loguru import logger
+from utils.uploads import BufferReader
+
+PDF_MAGIC = b"%PDF-"
+PDF_RENDER_DPI = 300
+# Tesseract slows down sharply past a few thousand pixels of height
+MAX_TILE_HEIGHT = 2000
+# How far above the target cut to look for a blank row
+CUT_SEARCH_ROWS = 200
+BLANK_ROW_MIN = 200
+# A US-letter page at 300 DPI is ~25 MB of RGB; no real receipt needs more pages than this
+MAX_PAGES = int(os.getenv("MAX_RECEIPT_PAGES", 10))
+# PDFium is not thread-safe; pages are rendered one at a time across all executor threads,
+# while OCR of rendered pages stays parallel. Re-entrant so a generator closed by the GC
+# inside a render does not deadlock.
+_pdfium_lock = threading.RLock()
+
+def iter_pages(data) -> Iterator["Image.Image"]:
+    """Yield PIL images, one per page or tile, in reading order, at most MAX_PAGES of them"""
+    from PIL import Image, ImageSequence
+
+    if bytes(data[:len(PDF_MAGIC)]) == PDF_MAGIC:
+        yield from _render_pdf(data)
+        return
+
+    image = Image.open(BufferReader(data))
+    count = 0
+    for frame in ImageSequence.Iterator(image):
+        for tile in _tile(frame.copy()):
+            if count == MAX_PAGES:
+                logger.warning(f"Receipt image has more than {MAX_PAGES} pages; reading only the first {MAX_PAGES}")
+                return
+            count += 1
+            yield tile
+
+def _render_pdf(data) -> Iterator["Image.Image"]:
+    import pypdfium2 as pdfium
+
+    with _pdfium_lock:
+        document = pdfium.PdfDocument(BufferReader(data))
+        pages = len(document)
+    if pages > MAX_PAGES:
+        logger.warning(f"Receipt PDF has {pages} pages; reading only the first {MAX_PAGES}")
+        pages = MAX_PAGES
+    try:
+        for index in range(pages):
+            # Held per page, not across the yield, so a consumer that stops early never blocks others
+            with _pdfium_lock:
+                page = document[index]
+                image = page.render(scale=PDF_RENDER_DPI / 72).to_pil()
+                page.close()
+            yield image
+    finally:
+        with _pdfium_lock:
+            document.close()
+
+def _tile(image: "Image.Image") -> Iterator["Image.Image"]:
+    width, height = image.size
+    if height <= MAX_TILE_HEIGHT:
+        yield image
+        return
+
+    gray = image.convert("L")
+    top = 0
+    while top < height:
+        bottom = min(top + MAX_TILE_HEIGHT, height)
+        if bottom < height:
+            bottom = _blank_row_above(gray, bottom, max(top + 1, bottom - CUT_SEARCH_ROWS))
+        yield image.crop((0, top, width, bottom))
+        top = bottom
+
+def _blank_row_above(gray: "Image.Image", start: int, stop: int) -> int:
+    """Nearest row at or above ``start`` with no dark pixels, else ``start`` itself"""
+    width = gray.size[0]
+    for y in range(start, stop, -1):
+        darkest, _ = gray.crop((0, y - 1, width, y)).getextrema()
+        if darkest >= BLANK_ROW_MIN:
+            return y
+    return start
+
+def ocr_page(image: "Image.Image") -> Tuple[str, Dict[str, float]]:
+    """OCR one page, returning its text and the lowest confidence seen for each word"""
+    import pytesseract
+
+    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    confidence: Dict[str, float] = {}
+    for i, word in enumerate(data["text"]):
+        word = word.strip()
+        if not word:
+            continue
+        lines.setdefault((data["block_num"][i], data["par_num"][i], data["line_num"][i]), []).append(word)
+        conf = float(data["conf"][i])
+        confidence[word] = min(conf, confidence.get(word, conf))
+    return "\n".join(" ".join(words) for words in lines.values()), confidence
@@ -0,0 +1,111 @@
+"""
+Per-receipt choice between OCR + text LLM and a direct vision call.
+
+Clean scans and screenshots OCR quickly and accurately, and often need no
+LLM at all (see ``receipt_extractors``). Small, blurry or photographed
+receipts make Tesseract slow and wrong, so the text LLM then gets garbage
+and the fallback answer comes after two slow steps. Cheap statistics on a
+thumbnail pick the route up front; OCR output that still turns out
+unusable is handed to the vision call instead of the text LLM.
+"""
+import base64
+import io
+import os
+from typing import Dict, Tuple
+
+from pydantic import BaseModel
+
+from .receipt_pages import PDF_MAGIC, iter_pages
+from utils.uploads import BufferReader
+
+VISION_MODEL = os.getenv("RECEIPT_VISION_MODEL", "gpt-4o")
+# Longest side sent to the vision model; receipt text stays legible at this size
+VISION_MAX_SIDE = 1024
+VISION_JPEG_QUALITY = 85
+
+THUMBNAIL_SIDE = 256
+# Below this many pixels on the short side Tesseract misses small print
+MIN_OCR_SIDE = 500
+# Mean distance of text pixels from the paper's grey level; faded or blurry text sits below it.
+# Measured on the text only: a sharp screenshot is mostly white, so the whole image's stddev is low
+MIN_CONTRAST = 45.0
+# Grey levels a pixel must differ from the paper by to count as text
+INK_THRESHOLD = 24
+# Share of the thumbnail that must be text before contrast is measured at all
+MIN_INK_SHARE = 0.005
+# Mean HSV saturation; scans and screenshots are near grey, photos of paper on a table are not
+MAX_SATURATION = 60.0
+
+# Early OCR checks before trusting the text
+MIN_MEAN_WORD_CONFIDENCE = 60.0
+MIN_OCR_WORDS = 8
+
+
+class ImageStats(BaseModel):
+    width: int
+    height: int
+    contrast: float
+    saturation: float
+
+
+def image_stats(data) -> ImageStats:
+    """Size, contrast and colourfulness from a small thumbnail of the first frame"""
+    from PIL import Image, ImageStat
+
+    image = Image.open(BufferReader(data))
+    width, height = image.size
+    # JPEG decodes at reduced scale directly; other formats are shrunk after decoding
+    image.draft("RGB", (THUMBNAIL_SIDE, THUMBNAIL_SIDE))
+    thumb = image.convert("RGB")
+    thumb.thumbnail((THUMBNAIL_SIDE, THUMBNAIL_SIDE))
+    return ImageStats(
+        width=width,
+        height=height,
+        contrast=text_contrast(thumb.convert("L").histogram()),
+        saturation=ImageStat.Stat(thumb.convert("HSV")).mean[1],
+    )
+
+
+def text_contrast(histogram) -> float:
+    """Mean distance from the most common (paper) grey level of pixels that differ from it"""
+    paper = max(range(256), key=histogram.__getitem__)
+    ink = [(abs(level - paper), count) for level, count in enumerate(histogram)
+           if count and abs(level - paper) > INK_THRESHOLD]
+    ink_pixels = sum(count for _, count in ink)
+    if ink_pixels < MIN_INK_SHARE * sum(histogram):
+        return 0.0
+    return sum(distance * count for distance, count in ink) / ink_pixels
+
+
+def choose_route(data) -> Tuple[str, str]:
+    """Return ``(route, reason)`` with route ``"ocr"`` or ``"vision"``"""
+    if bytes(data[:len(PDF_MAGIC)]) == PDF_MAGIC:
+        # Rendered PDFs are crisp and may run to several pages
+        return "ocr", "pdf"
+    stats = image_stats(data)
+    if min(stats.width, stats.height) < MIN_OCR_SIDE:
+        return "vision", "low_resolution"
+    if stats.contrast < MIN_CONTRAST:
+        return "vision", "low_contrast"
+    if stats.saturation > MAX_SATURATION:
+        return "vision", "photo"
+    return "ocr", "clean_scan"
+
+
+def ocr_usable(text: str, word_confidence: Dict[str, float]) -> bool:
+    """Whether OCR output is worth sending on, judged from Tesseract's word confidences"""
+    words = text.split()
+    if len(words) < MIN_OCR_WORDS:
+        return False
+    scores = [word_confidence.get(word, 0.0) for word in words]
+    return sum(scores) / len(scores) >= MIN_MEAN_WORD_CONFIDENCE
+
+
+def encode_for_vision(data) -> Tuple[str, int, int]:
+    """First page downscaled to ``VISION_MAX_SIDE`` as a JPEG data URL, with its size"""
+    page = next(iter_pages(data)).convert("RGB")
+    page.thumbnail((VISION_MAX_SIDE, VISION_MAX_SIDE))
+    out = io.BytesIO()
+    page.save(out, format="JPEG", quality=VISION_JPEG_QUALITY)
+    encoded = base64.b64encode(out.getvalue()).decode("ascii")
+    return f"data:image/jpeg;base64,{encoded}", page.width, page.height
@@ -1,12 +1,34 @@
-from typing import Dict, Any
-from openai import OpenAI
+from typing import Dict, Any, List, Optional, Tuple
 import json
 from ..interfaces import IResponseAnalyzer, RefundPolicy
+from .openai_base import OpenAIComponent
+from utils.batching import MicroBatcher
+from utils.deadlines import ensure_budget, within_deadline
+from utils.tokens import allocate
+from utils.metrics import record_fallback
 from loguru import logger
 
-class OpenAIResponseAnalyzer(IResponseAnalyzer):
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+ANALYSIS_FIELDS = """Format the response as JSON with these keys:
+        - approved: boolean
+        - needs_escalation: boolean
+        - key_points: list of main points from response
+        - policy_violations: list of violated policies (if any)
+        - suggested_action: string (next recommended action)
+        - confidence: float (0-1, confidence in analysis)"""
+
+class OpenAIResponseAnalyzer(OpenAIComponent, IResponseAnalyzer):
+    POLICY_EXCERPT_TOKENS = 150
+    # Per item in a batch, so a full batch still fits the prompt budget
+    BATCH_POLICY_EXCERPT_TOKENS = 100
+    # Small-model analyses below this self-reported confidence are redone on the large model
+    MIN_CONFIDENCE = 0.7
+
+    def __init__(self, api_key: str, batch_size: int = 1, batch_window: float = 0.05):
+        super().__init__(api_key)
+        # With batch_size > 1, analyses arriving within batch_window share one LLM request
+        self._batcher: Optional[MicroBatcher] = None
+        if batch_size > 1:
+            self._batcher = MicroBatcher("analyze_response", self._analyze_batch, batch_size, batch_window)
 
     async def analyze_response(
         self,
@@ -17,34 +39,13 @@ class OpenAIResponseAnalyzer(IResponseAnalyzer):
         Analyze platform response to determine status and next steps
         """
         try:
-            # Analyze response using GPT-4
-            prompt = f"""
-            Analyze this response to a refund request and determine:
-            1. Whether the refund was approved or denied
-            2. If denied, whether escalation is needed
-            3. Key points made in the response
-            4. Relevant policy violations (if any)
-            
-            Platform: {policy.platform}
-            Response: {response}
-            Platform Policy Summary: {policy.policy_text[:500]}
-            
-            Format the response as JSON with these keys:
-            - approved: boolean
-            - needs_escalation: boolean
-            - key_points: list of main points from response
-            - policy_violations: list of violated policies (if any)
-            - suggested_action: string (next recommended action)
-            - confidence: float (0-1, confidence in analysis)
-            """
-
-            gpt_response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3  # Lower temperature for more consistent analysis
-            )
-
-            analysis = json.loads(gpt_response.choices[0].message.content)
+            if self._batcher is not None:
+                ensure_budget("analyze_response")
+                analysis = await within_deadline("analyze_response", self._batcher.submit((response, policy)))
+                if analysis is None:
+                    return self._get_fallback_analysis(response)
+            else:
+                analysis = await self._analyze_one(response, policy)
             
             # Enhance the analysis with additional metadata
             return {
@@ -61,6 +62,72 @@ class OpenAIResponseAnalyzer(IResponseAnalyzer):
             logger.error(f"Error analyzing response: {str(e)}")
             return self._get_fallback_analysis(response)
 
+    async def _analyze_one(self, response: str, policy: RefundPolicy) -> Dict[str, Any]:
+        policy_tokens, _ = allocate("analyze_response", response, self.POLICY_EXCERPT_TOKENS)
+        # Analyze response using GPT-4
+        prompt = f"""
+        Analyze this response to a refund request and determine:
+        1. Whether the refund was approved or denied
+        2. If denied, whether escalation is needed
+        3. Key points made in the response
+        4. Relevant policy violations (if any)
+        
+        Platform: {policy.platform}
+        Response: {response}
+        Relevant Policy Sections: {policy.excerpt(response, policy_tokens)}
+        
+        {ANALYSIS_FIELDS}
+        """
+
+        # Lower temperature for more consistent analysis
+        content = await self._chat("analyze_response", prompt, temperature=0.3, accept=self._is_confident)
+        return json.loads(content)
+
+    async def _analyze_batch(self, items: List[Tuple[str, RefundPolicy]]) -> List[Optional[Dict[str, Any]]]:
+        """One LLM request for several analyses; items it fails to answer get None (fallback)"""
+        if len(items) == 1:
+            return [await self._analyze_one(*items[0])]
+
+        entries = [
+            {
+                "id": i,
+                "platform": policy.platform,
+                "response": response,
+                "policy": policy.excerpt(response, self.BATCH_POLICY_EXCERPT_TOKENS),
+            }
+            for i, (response, policy) in enumerate(items)
+        ]
+        prompt = f"""
+        Analyze each of these responses to refund requests and determine, per item:
+        1. Whether the refund was approved or denied
+        2. If denied, whether escalation is needed
+        3. Key points made in the response
+        4. Relevant policy violations (if any)
+
+        Items:
+        {json.dumps(entries)}
+
+        Respond with a JSON array holding one object per item, each with an "id" key
+        matching the item and these keys:
+        {ANALYSIS_FIELDS}
+        """
+
+        content = await self._chat("analyze_response_batch", prompt, temperature=0.3,
+                                   accept=lambda c: len(json.loads(c)) == len(items))
+        by_id = {
+            result.get("id"): result for result in json.loads(content)
+            if isinstance(result, dict) and isinstance(result.get("approved"), bool)
+        }
+        return [
+            {k: v for k, v in by_id[i].items() if k != "id"} if i in by_id else None
+            for i in range(len(items))
+        ]
+
+    def _is_confident(self, content: str) -> bool:
+        analysis = json.loads(content)
+        return (isinstance(analysis.get("approved"), bool)
+                and float(analysis.get("confidence", 0)) >= self.MIN_CONFIDENCE)
+
     def _get_timestamp(self) -> str:
         """Get current timestamp in ISO format"""
         from datetime import datetime
@@ -68,6 +135,7 @@ class OpenAIResponseAnalyzer(IResponseAnalyzer):
 
     def _get_fallback_analysis(self, response: str) -> Dict[str, Any]:
         """Return fallback analysis when GPT-4 analysis fails"""
+        record_fallback("response_analysis")
         # Use basic keyword matching as fallback
         response_lower = response.lower()
         
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
+from .policy_index import PolicyIndex
 
 class RefundPolicy(BaseModel):
     platform: str
@@ -8,6 +9,18 @@ class RefundPolicy(BaseModel):
     eligibility_criteria: Dict[str, Any]
     time_limits: Dict[str, int]
     required_evidence: list[str]
+    _index: Optional[PolicyIndex] = PrivateAttr(default=None)
+
+    @property
+    def index(self) -> PolicyIndex:
+        """Section index over policy_text, built on first use if the fetcher didn't"""
+        if self._index is None:
+            self._index = PolicyIndex.from_text(self.policy_text)
+        return self._index
+
+    def excerpt(self, query: str, max_tokens: int) -> str:
+        """Policy sections most relevant to ``query`` within a token budget"""
+        return self.index.excerpt(query, max_tokens)
 
 class IPolicyFetcher(ABC):
     @abstractmethod
@@ -20,9 +33,10 @@ class IMessageGenerator(ABC):
     async def generate_request(self, 
         issue_description: str, 
         policy: RefundPolicy,
-        order_details: Dict[str, Any]
+        order_details: Dict[str, Any],
+        order_id: Optional[str] = None
     ) -> str:
-        """Generate refund request message"""
+        """Generate refund request message; ``order_id`` is the order being claimed"""
         pass
 
     @abstractmethod
@@ -34,6 +48,22 @@ class IMessageGenerator(ABC):
         """Generate escalation message"""
         pass
 
+    async def generate_consolidated_request(self,
+        orders: list[Dict[str, Any]],
+        policy: RefundPolicy
+    ) -> str:
+        """Generate one refund request covering several orders.
+
+        Each order has ``order_id``, ``issue_description`` and ``order_details``.
+        The default folds them into a single generate_request call.
+        """
+        issues = "; ".join(f"Order {o['order_id']}: {o['issue_description']}" for o in orders)
+        return await self.generate_request(
+            issue_description=issues,
+            policy=policy,
+            order_details={"orders": [{**o["order_details"], "order_id": o["order_id"]} for o in orders]}
+        )
+
 class IResponseAnalyzer(ABC):
     @abstractmethod
     async def analyze_response(self, 
@@ -0,0 +1,366 @@
+"""
+Ingestion of merchant replies from a local mailbox.
+
+``MailIngestor`` reads new messages from a Maildir (``new/``) or an mbox
+file, a stand-in for an IMAP inbox, in batches. Each reply is threaded to
+an order by ``In-Reply-To``/``References`` of earlier replies or by an
+active order ID in its subject or body, and mapped to a platform by sender
+domain. Duplicates, by Message-ID or by identical text for the same order,
+are dropped. The new text of each reply, with the quoted history removed,
+is passed to ``RefundAgent.handle_response``: different orders run
+concurrently, up to ``concurrency`` at a time, and replies to one order run
+in arrival order.
+
+Progress is checkpointed after every batch: processed Maildir messages are
+moved to ``cur/`` and marked seen, the mbox byte offset is saved (so each
+poll reads only what was appended), and so are the seen Message-IDs and
+the thread map. A crash mid-batch replays that batch on restart, so
+delivery is at least once. A reply the agent fails to handle is left
+unprocessed and retried in later batches, up to ``MAX_ATTEMPTS`` times.
+Replies that match no active order (for example after a restart emptied
+the agent's history) and replies out of attempts are parked rather than
+dropped: in the ``.unmatched`` / ``.failed`` Maildir folders, or appended to
+``<mbox>.unmatched`` / ``<mbox>.failed``. Moving them back re-ingests them.
+"""
+import asyncio
+import email
+import email.policy
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict, defaultdict
+from email.message import EmailMessage
+from email.utils import parseaddr
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+from prometheus_client import Counter
+
+from utils.deadlines import Deadline
+
+from .refund_agent import RefundAgent
+
+PLATFORM_DOMAINS = {
+    "amazon": ("amazon.com", "amazon.co.uk", "amazon.de"),
+    "ubereats": ("uber.com", "ubereats.com"),
+    "airbnb": ("airbnb.com",),
+}
+# Message-IDs and thread links kept in the checkpoint
+MAX_REMEMBERED = 50_000
+# Tries at handling one reply before it is parked as failed
+MAX_ATTEMPTS = 5
+ORDER_ID_PATTERN = re.compile(r"\b[A-Z0-9]+(?:-[A-Z0-9]+)*\b", re.I)
+# Where a reply's quoted history starts
+QUOTE_MARKERS = re.compile(r"^(On .+ wrote:|-{2,} ?Original Message ?-{2,}|From: .+)$", re.I)
+
+MAIL_MESSAGES = Counter(
+    "refund_mail_messages_total",
+    "Mailbox messages ingested, by outcome (handled/duplicate/unmatched/retry/failed)",
+    ["outcome"],
+)
+
+
+class MailReply:
+    def __init__(self, message_id: str, thread_ids: List[str], subject: str,
+                 platform: Optional[str], text: str):
+        self.message_id = message_id
+        self.thread_ids = thread_ids
+        self.subject = subject
+        self.platform = platform
+        self.text = text
+        self.order_id: Optional[str] = None
+        self.content_key: Optional[str] = None
+
+
+def parse_reply(key: str, data: bytes) -> MailReply:
+    message = email.message_from_bytes(data, policy=email.policy.default)
+    return MailReply(
+        message_id=(message.get("Message-ID") or "").strip() or f"<{key}@local>",
+        thread_ids=(message.get("In-Reply-To", "") + " " + message.get("References", "")).split(),
+        subject=str(message.get("Subject", "")),
+        platform=platform_for_sender(message.get("From", "")),
+        text=reply_text(message)
+    )
+
+
+def platform_for_sender(sender: str) -> Optional[str]:
+    domain = parseaddr(sender)[1].rpartition("@")[2].lower()
+    for platform, domains in PLATFORM_DOMAINS.items():
+        if any(domain == d or domain.endswith("." + d) for d in domains):
+            return platform
+    return None
+
+
+def reply_text(message: EmailMessage) -> str:
+    """The new part of a reply: plain text (or tag-stripped HTML) up to the quoted history"""
+    body = message.get_body(preferencelist=("plain", "html"))
+    if body is None:
+        return ""
+    text = body.get_content()
+    if body.get_content_subtype() == "html":
+        text = re.sub(r"<[^>]+>", " ", re.sub(r"<br\s*/?>|</p>", "\n", text, flags=re.I))
+    lines = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if QUOTE_MARKERS.match(stripped):
+            break
+        if not stripped.startswith(">"):
+            lines.append(line.rstrip())
+    return "\n".join(lines).strip()
+
+
+def _mbox_message(f) -> Optional[bytes]:
+    """The message at the file position, "From " line included; None at the end or mid-write"""
+    start = f.tell()
+    lines = [f.readline()]
+    if not lines[0]:
+        return None
+    while True:
+        position = f.tell()
+        line = f.readline()
+        if not line or line.startswith(b"From "):
+            f.seek(position)
+            break
+        lines.append(line)
+    if not lines[-1].endswith(b"\n"):
+        # The last message is still being appended
+        f.seek(start)
+        return None
+    return b"".join(lines)
+
+
+def _delivery_order(name: str) -> List[Tuple[int, Any]]:
+    """Maildir names start "<seconds>.M<microseconds>P<pid>Q<count>"; compare the numbers as numbers"""
+    return [(0, int(part)) if part.isdigit() else (1, part) for part in re.split(r"(\d+)", name)]
+
+
+class MailIngestor:
+    def __init__(self, agent: RefundAgent, path: str, checkpoint_path: Optional[str] = None,
+                 batch_size: int = 200, concurrency: int = 8, poll_interval: float = 5.0,
+                 reply_timeout: float = 60.0):
+        self.agent = agent
+        self.path = path
+        self.checkpoint_path = checkpoint_path or path.rstrip("/") + ".checkpoint.json"
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.reply_timeout = reply_timeout
+        self.mbox_offset = 0
+        # Offsets of mbox messages to retry, and failed tries per message key
+        self.mbox_retry: List[int] = []
+        self.attempts: Dict[str, int] = {}
+        self._mbox_read_to = 0
+        self._mbox_retry_unread: List[int] = []
+        self.seen: "OrderedDict[str, None]" = OrderedDict()
+        self.threads: "OrderedDict[str, str]" = OrderedDict()
+        self._worker: Optional[asyncio.Task] = None
+        self._load_checkpoint()
+
+    @property
+    def is_maildir(self) -> bool:
+        return os.path.isdir(self.path)
+
+    def start(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._ingest_forever())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def _ingest_forever(self) -> None:
+        while True:
+            try:
+                counts = await self.ingest()
+            except Exception as e:
+                logger.error(f"Error ingesting mailbox {self.path}: {str(e)}")
+                counts = {}
+            # Nothing new, or only replies waiting to be retried
+            if counts.get("read", 0) == counts.get("retry", 0):
+                await asyncio.sleep(self.poll_interval)
+
+    async def ingest(self) -> Dict[str, int]:
+        """Process one batch of new messages and checkpoint it"""
+        loop = asyncio.get_running_loop()
+        # Header parsing is the bulk of the CPU cost; keep it off the event loop
+        batch = await loop.run_in_executor(None, self._read_batch)
+        outcomes: Dict[str, str] = {}
+        by_order: Dict[str, List[Tuple[str, MailReply]]] = defaultdict(list)
+        for key, _, reply in batch:
+            self._thread(reply)
+            outcome = self._classify(reply)
+            if outcome:
+                outcomes[key] = outcome
+            else:
+                by_order[reply.order_id].append((key, reply))
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._handle_order(replies, semaphore) for replies in by_order.values()))
+        for handled in results:
+            outcomes.update(handled)
+        for key, _, reply in batch:
+            if outcomes[key] == "failed":
+                outcomes[key] = self._retry_or_give_up(key, reply)
+            else:
+                self.attempts.pop(key, None)
+
+        counts: Dict[str, int] = defaultdict(int)
+        counts["read"] = len(batch)
+        for outcome in outcomes.values():
+            counts[outcome] += 1
+            MAIL_MESSAGES.labels(outcome).inc()
+        await loop.run_in_executor(None, self._commit, batch, outcomes)
+        return dict(counts)
+
+    def _retry_or_give_up(self, key: str, reply: MailReply) -> str:
+        """"retry" leaves the reply to be read again; "failed" once it is out of attempts"""
+        self.attempts[key] = self.attempts.get(key, 0) + 1
+        if self.attempts[key] >= MAX_ATTEMPTS:
+            del self.attempts[key]
+            logger.error(f"Giving up on mailed reply {reply.message_id} after {MAX_ATTEMPTS} attempts")
+            return "failed"
+        # Not seen yet, or the retry would be dropped as a duplicate
+        self.seen.pop(reply.message_id, None)
+        self.seen.pop(reply.content_key, None)
+        return "retry"
+
+    def _classify(self, reply: MailReply) -> Optional[str]:
+        """"duplicate" or "unmatched" for a reply that should not reach the agent"""
+        reply.content_key = f"{reply.order_id}:{hashlib.sha1(reply.text.encode()).hexdigest()}"
+        if reply.message_id in self.seen or reply.content_key in self.seen:
+            return "duplicate"
+        if reply.order_id is None or reply.platform is None or not reply.text:
+            # Parked, not seen: it can be moved back once its order is known again
+            return "unmatched"
+        self._remember(self.seen, reply.message_id, None)
+        self._remember(self.seen, reply.content_key, None)
+        # Later replies in this thread reach the order even without its ID
+        self._remember(self.threads, reply.message_id, reply.order_id)
+        return None
+
+    async def _handle_order(self, replies: List[Tuple[str, MailReply]],
+                            semaphore: asyncio.Semaphore) -> Dict[str, str]:
+        outcomes = {}
+        async with semaphore:
+            for key, reply in replies:
+                try:
+                    result = await self.agent.handle_response(
+                        order_id=reply.order_id,
+                        response=reply.text,
+                        platform=reply.platform,
+                        deadline=Deadline(self.reply_timeout)
+                    )
+                    outcomes[key] = "failed" if result.get("status") == "error" else "handled"
+                except Exception as e:
+                    logger.error(f"Error handling mailed reply for {reply.order_id}: {str(e)}")
+                    outcomes[key] = "failed"
+        return outcomes
+
+    def _thread(self, reply: MailReply) -> None:
+        reply.order_id = next((self.threads[m] for m in reply.thread_ids if m in self.threads), None)
+        if reply.order_id is None:
+            reply.order_id = self._find_order_id(reply.subject + "\n" + reply.text)
+
+    def _find_order_id(self, text: str) -> Optional[str]:
+        for candidate in ORDER_ID_PATTERN.findall(text):
+            if candidate in self.agent.conversation_history:
+                return candidate
+        return None
+
+    def _read_batch(self) -> List[Tuple[str, bytes, MailReply]]:
+        """(key, raw message, parsed reply) for up to ``batch_size`` messages, retries first"""
+        if self.is_maildir:
+            new_dir = os.path.join(self.path, "new")
+            names = sorted(os.listdir(new_dir), key=_delivery_order)[:self.batch_size]
+            batch = []
+            for name in names:
+                with open(os.path.join(new_dir, name), "rb") as f:
+                    data = f.read()
+                batch.append((name, data, parse_reply(name, data)))
+            return batch
+        batch = []
+        with open(self.path, "rb") as f:
+            # Retries beyond this batch's size are not read and stay queued
+            self._mbox_retry_unread = self.mbox_retry[self.batch_size:]
+            for offset in self.mbox_retry[:self.batch_size]:
+                f.seek(offset)
+                data = _mbox_message(f)
+                if data is not None:
+                    batch.append((str(offset), data))
+            # Only what was appended since the last batch is read
+            f.seek(self.mbox_offset)
+            while len(batch) < self.batch_size:
+                offset = f.tell()
+                data = _mbox_message(f)
+                if data is None:
+                    break
+                batch.append((str(offset), data))
+            self._mbox_read_to = f.tell()
+        # The "From " separator line is mbox framing, not part of the message
+        return [(key, data, parse_reply(key, data.partition(b"\n")[2])) for key, data in batch]
+
+    def _commit(self, batch: List[Tuple[str, bytes, MailReply]], outcomes: Dict[str, str]) -> None:
+        for key, data, _ in batch:
+            outcome = outcomes[key]
+            if outcome == "retry":
+                continue
+            if outcome in ("unmatched", "failed"):
+                self._park(outcome, key, data)
+            elif self.is_maildir:
+                # Maildir's "seen" flag: the message moves to cur/ with an S info suffix
+                os.replace(os.path.join(self.path, "new", key),
+                           os.path.join(self.path, "cur", key.split(":")[0] + ":2,S"))
+        if not self.is_maildir:
+            self.mbox_offset = self._mbox_read_to
+            retry = [int(key) for key, _, _ in batch if outcomes[key] == "retry"]
+            self.mbox_retry = sorted(retry + self._mbox_retry_unread)
+        state = {
+            "mbox_offset": self.mbox_offset,
+            "mbox_retry": self.mbox_retry,
+            "attempts": self.attempts,
+            "seen": list(self.seen),
+            "threads": self.threads,
+        }
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def _load_checkpoint(self) -> None:
+        try:
+            with open(self.checkpoint_path) as f:
+                state: Dict[str, Any] = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.error(f"Error reading mailbox checkpoint {self.checkpoint_path}: {str(e)}")
+            return
+        self.mbox_offset = state.get("mbox_offset", 0)
+        self.mbox_retry = state.get("mbox_retry", [])
+        self.attempts = state.get("attempts", {})
+        self.seen = OrderedDict.fromkeys(state.get("seen", []))
+        self.threads = OrderedDict(state.get("threads", {}))
+
+    def _park(self, folder: str, key: str, data: bytes) -> None:
+        """Keep a reply that cannot be handled where an operator can inspect or re-queue it"""
+        if self.is_maildir:
+            parked = os.path.join(self.path, "." + folder)
+            for sub in ("new", "cur", "tmp"):
+                os.makedirs(os.path.join(parked, sub), exist_ok=True)
+            os.replace(os.path.join(self.path, "new", key), os.path.join(parked, "new", key))
+            return
+        with open(f"{self.path}.{folder}", "ab") as f:
+            f.write(data if data.endswith(b"\n\n") else data + b"\n")
+
+    @staticmethod
+    def _remember(store: "OrderedDict[str, Any]", key: str, value: Any) -> None:
+        store[key] = value
+        store.move_to_end(key)
+        while len(store) > MAX_REMEMBERED:
+            store.popitem(last=False)
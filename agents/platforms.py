@@ -0,0 +1,131 @@
+"""
+Registry of supported platforms and where their refund policies come from.
+
+Each platform has a canonical name, aliases ("Uber Eats", "uber-eats",
+"amazon.com") and one policy source: a URL that is scraped and analyzed,
+or static policy text that is analyzed once. A name that resolves to no
+platform is negatively cached and gets the precomputed default policy
+immediately, with no network or LLM call, instead of having a "no policy
+URL configured" sentence analyzed on every request.
+"""
+import json
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from pydantic import BaseModel
+
+from utils.metrics import record_cache
+
+from .interfaces import RefundPolicy
+
+# Unknown names remembered; bounded because platform names come from clients
+MAX_UNKNOWN = 1000
+
+DEFAULT_POLICY = RefundPolicy(
+    platform="default",
+    policy_text="Standard refund policy applies",
+    eligibility_criteria={
+        "damaged": "Item received damaged",
+        "not_as_described": "Item not as described",
+        "not_received": "Item not received"
+    },
+    time_limits={
+        "standard": 30 * 24,  # 30 days in hours
+        "damaged": 48,        # 48 hours
+        "not_received": 7 * 24 # 7 days in hours
+    },
+    required_evidence=[
+        "Order number",
+        "Photos of damaged items",
+        "Description of issue"
+    ]
+)
+
+
+class PlatformSpec(BaseModel):
+    name: str
+    aliases: List[str] = []
+    url: Optional[str] = None
+    policy_text: Optional[str] = None
+
+
+BUILTIN_PLATFORMS = [
+    PlatformSpec(
+        name="amazon",
+        aliases=["amazon.com", "amzn"],
+        url="https://www.amazon.com/gp/help/customer/display.html?nodeId=GKM69DUUYKQWKWX7",
+    ),
+    PlatformSpec(
+        name="ubereats",
+        aliases=["uber eats"],
+        url="https://help.uber.com/ubereats/article/uber-eats-refund-policy",
+    ),
+    PlatformSpec(
+        name="airbnb",
+        aliases=["airbnb.com"],
+        url="https://www.airbnb.com/help/article/1320/airbnb-guest-refund-policy",
+    ),
+]
+
+
+def normalize(name: str) -> str:
+    """Case, spaces, dashes and underscores do not matter: "Uber-Eats" == "ubereats" """
+    return re.sub(r"[\s_\-]+", "", name.strip().lower())
+
+
+class PlatformRegistry:
+    def __init__(self, specs: Iterable[PlatformSpec] = ()):
+        self.specs: Dict[str, PlatformSpec] = {}
+        self._names: Dict[str, str] = {}
+        self._unknown: "OrderedDict[str, RefundPolicy]" = OrderedDict()
+        for spec in specs:
+            self.register(spec)
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None) -> "PlatformRegistry":
+        """Built-in platforms, plus or overridden by a JSON list of PlatformSpec objects"""
+        registry = cls(BUILTIN_PLATFORMS)
+        if path:
+            with open(path) as f:
+                for spec in json.load(f):
+                    registry.register(PlatformSpec(**spec))
+        return registry
+
+    def register(self, spec: PlatformSpec) -> None:
+        if (spec.url is None) == (spec.policy_text is None):
+            raise ValueError(f"Platform {spec.name!r} needs exactly one of url or policy_text")
+        self.specs[spec.name] = spec.model_copy(deep=True)
+        for name in [spec.name, *spec.aliases]:
+            self._names[normalize(name)] = spec.name
+            self._unknown.pop(normalize(name), None)
+
+    def resolve(self, name: str) -> Optional[PlatformSpec]:
+        canonical = self._names.get(normalize(name))
+        record_cache("platform", canonical is not None)
+        return self.specs[canonical] if canonical else None
+
+    def canonical(self, name: str) -> str:
+        spec = self.resolve(name)
+        return spec.name if spec else name
+
+    def default_policy(self, name: str) -> RefundPolicy:
+        """The shared default policy for a platform with no policy source, built once per name"""
+        key = normalize(name)
+        policy = self._unknown.pop(key, None)
+        if policy is None:
+            policy = DEFAULT_POLICY.model_copy(update={"platform": name})
+        self._unknown[key] = policy
+        while len(self._unknown) > MAX_UNKNOWN:
+            self._unknown.popitem(last=False)
+        return policy
+
+    def set_url(self, name: str, url: str) -> None:
+        spec = self.specs[self.canonical(name)]
+        spec.url, spec.policy_text = url, None
+
+    def names(self) -> List[str]:
+        return list(self.specs)
+
+    def urls(self) -> Dict[str, str]:
+        return {name: spec.url for name, spec in self.specs.items() if spec.url}
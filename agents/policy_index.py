@@ -0,0 +1,120 @@
+"""
+Section-level BM25 index over scraped policy text.
+
+Policy pages are split into sections once at fetch time; prompts then ask
+for the sections most relevant to an issue or merchant reply instead of a
+blind prefix of the page.
+"""
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from utils.tokens import estimate_tokens
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have i if in is it its my of on or our "
+    "that the this to was we were will with you your".split()
+)
+
+# Rough size of a token, used only when a single section must be cut
+CHARS_PER_TOKEN = 4
+MAX_SECTION_CHARS = 600
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _is_heading(line: str) -> bool:
+    return len(line) < 60 and not line.endswith((".", ",", ";", ":"))
+
+
+def _ends_sentence(line: str) -> bool:
+    return line.endswith((".", "!", "?"))
+
+
+def split_sections(text: str) -> List[str]:
+    """Group the page's lines into sections, starting a new one at heading-like lines"""
+    sections: List[str] = []
+    current: List[str] = []
+    size = 0
+    for raw in text.splitlines():
+        line = " ".join(raw.split())
+        if not line:
+            continue
+        # A heading after body text opens a new section; runs of headings (nav) stay together
+        starts_section = bool(current) and _ends_sentence(current[-1]) and _is_heading(line)
+        if current and (starts_section or size + len(line) > MAX_SECTION_CHARS):
+            sections.append(" ".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        sections.append(" ".join(current))
+    return sections
+
+
+class PolicyIndex:
+    """Inverted index with Okapi BM25 scoring over policy sections"""
+
+    def __init__(self, sections: List[str], k1: float = 1.5, b: float = 0.75):
+        self.sections = sections
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.lengths: List[int] = []
+        self.token_counts = [estimate_tokens(section) for section in sections]
+        for i, section in enumerate(sections):
+            counts: Dict[str, int] = defaultdict(int)
+            terms = tokenize(section)
+            for term in terms:
+                counts[term] += 1
+            for term, tf in counts.items():
+                self.postings[term].append((i, tf))
+            self.lengths.append(len(terms))
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+    @classmethod
+    def from_text(cls, text: str) -> "PolicyIndex":
+        return cls(split_sections(text))
+
+    def score(self, query: str) -> List[float]:
+        scores = [0.0] * len(self.sections)
+        n = len(self.sections)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[i] / self.avg_length)
+                scores[i] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def select(self, query: str, max_tokens: int) -> List[int]:
+        """Indices of the best-matching sections that fit ``max_tokens``, in page order"""
+        if not self.sections:
+            return []
+        scores = self.score(query)
+        ranked = [i for i in sorted(range(len(self.sections)), key=lambda i: -scores[i]) if scores[i]]
+        if not ranked:
+            ranked = list(range(len(self.sections)))  # Nothing matched, keep page order
+
+        budget = max_tokens
+        chosen: List[int] = []
+        for i in ranked:
+            if self.token_counts[i] <= budget:
+                chosen.append(i)
+                budget -= self.token_counts[i]
+            if budget <= 0:
+                break
+        return sorted(chosen) or ranked[:1]
+
+    def excerpt(self, query: str, max_tokens: int) -> str:
+        """Best-matching sections that fit ``max_tokens``, in page order"""
+        chosen = self.select(query, max_tokens)
+        if len(chosen) == 1 and self.token_counts[chosen[0]] > max_tokens:
+            return self.sections[chosen[0]][:max_tokens * CHARS_PER_TOKEN]
+        return "\n".join(self.sections[i] for i in chosen)
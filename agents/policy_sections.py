@@ -0,0 +1,136 @@
+"""
+Hashed policy sections, per-section analyses and version history.
+
+A policy page is analyzed section by section, and each section's extracted
+criteria are kept under the hash of its text. When the page changes, only
+sections with a new hash go back to the LLM. The platform's
+``eligibility_criteria``, ``time_limits`` and ``required_evidence`` are
+re-merged from the per-section results in page order, so a refresh costs
+in proportion to the edit rather than the page. Every change that is
+applied is recorded as a ``PolicyVersion`` saying which sections were
+added or removed and how the merged analysis changed.
+"""
+import hashlib
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from pydantic import BaseModel
+
+from .interfaces import RefundPolicy
+
+ANALYSIS_KEYS = ("eligibility_criteria", "time_limits", "required_evidence")
+MAX_VERSIONS = 20
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(" ".join(text.split()).encode()).hexdigest()[:16]
+
+
+def merge_analyses(analyses: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-section results in page order; a later section's value for a key wins"""
+    merged: Dict[str, Any] = {"eligibility_criteria": {}, "time_limits": {}, "required_evidence": []}
+    for analysis in analyses:
+        for field in ("eligibility_criteria", "time_limits"):
+            if isinstance(analysis.get(field), dict):
+                merged[field].update(analysis[field])
+        evidence = analysis.get("required_evidence")
+        for item in evidence if isinstance(evidence, list) else []:
+            if item not in merged["required_evidence"]:
+                merged["required_evidence"].append(item)
+    return merged
+
+
+def diff_analysis(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Keys added, removed or changed per field between two merged analyses"""
+    changes: Dict[str, Any] = {}
+    for field in ("eligibility_criteria", "time_limits"):
+        before, after = old.get(field, {}), new.get(field, {})
+        field_changes = {
+            "added": {k: v for k, v in after.items() if k not in before},
+            "removed": {k: v for k, v in before.items() if k not in after},
+            "changed": {k: {"from": before[k], "to": v} for k, v in after.items() if k in before and before[k] != v},
+        }
+        if any(field_changes.values()):
+            changes[field] = field_changes
+    before, after = old.get("required_evidence", []), new.get("required_evidence", [])
+    evidence = {"added": [e for e in after if e not in before], "removed": [e for e in before if e not in after]}
+    if any(evidence.values()):
+        changes["required_evidence"] = evidence
+    return changes
+
+
+class PolicyVersion(BaseModel):
+    version: int
+    created_at: float
+    text_hash: str
+    sections: List[str]
+    added_sections: List[str]
+    removed_sections: List[str]
+    analyzed_sections: int
+    changes: Dict[str, Any]
+
+
+class PolicySectionStore:
+    """Per platform: section analyses by hash, the current policy and its version history"""
+
+    def __init__(self):
+        self.analyses: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.policies: Dict[str, RefundPolicy] = {}
+        self.versions: Dict[str, List[PolicyVersion]] = {}
+
+    def current(self, platform: str) -> Optional[PolicyVersion]:
+        versions = self.versions.get(platform)
+        return versions[-1] if versions else None
+
+    def unchanged(self, platform: str, text: str) -> Optional[RefundPolicy]:
+        """The stored policy if the page text is the same as last time"""
+        current = self.current(platform)
+        if current is not None and current.text_hash == content_hash(text):
+            return self.policies.get(platform)
+        return None
+
+    def missing(self, platform: str, hashes: Sequence[str]) -> List[str]:
+        known = self.analyses.get(platform, {})
+        return [h for h in dict.fromkeys(hashes) if h not in known]
+
+    def merged(self, platform: str, hashes: Sequence[str],
+               analyzed: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Merged analysis of the page's sections from stored and just-analyzed results"""
+        known = {**self.analyses.get(platform, {}), **analyzed}
+        parts = [known[h] for h in hashes if h in known]
+        return merge_analyses(parts) if parts else None
+
+    def commit(self, platform: str, text: str, hashes: List[str], analyzed: Dict[str, Dict[str, Any]],
+               policy: RefundPolicy) -> PolicyVersion:
+        """Store new section analyses and the policy, and record what changed"""
+        known = self.analyses.setdefault(platform, {})
+        known.update(analyzed)
+        # Sections no longer on the page are forgotten; if one returns it is analyzed again
+        for stale in set(known) - set(hashes):
+            del known[stale]
+
+        previous = self.current(platform)
+        # Sections whose analysis failed leave the version incomplete, so the next
+        # refresh retries them even if the page has not changed
+        complete = all(h in known for h in hashes)
+        old_sections = previous.sections if previous else []
+        old_policy = self.policies.get(platform)
+        old_analysis = {key: getattr(old_policy, key) for key in ANALYSIS_KEYS} if old_policy else {}
+        version = PolicyVersion(
+            version=previous.version + 1 if previous else 1,
+            created_at=time.time(),
+            text_hash=content_hash(text) if complete else "",
+            sections=hashes,
+            added_sections=[h for h in hashes if h not in old_sections],
+            removed_sections=[h for h in old_sections if h not in hashes],
+            analyzed_sections=len(analyzed),
+            changes=diff_analysis(old_analysis, {key: getattr(policy, key) for key in ANALYSIS_KEYS}),
+        )
+        history = self.versions.setdefault(platform, [])
+        history.append(version)
+        del history[:-MAX_VERSIONS]
+        self.policies[platform] = policy
+        return version
+
+    def history(self, platform: str) -> List[PolicyVersion]:
+        return list(self.versions.get(platform, []))
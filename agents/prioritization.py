@@ -0,0 +1,60 @@
+"""
+Priority classes for refund work.
+
+A request is ``urgent`` when the policy's refund window closes soon, so a
+delayed request could be refused as out of time, and ``expired`` once the
+window has closed: hurrying cannot help it, so it goes after every claim
+that is still in time. Otherwise its class follows the order value. Some platforms have a floor: an Airbnb
+reservation is time-bound and usually large, so it is never ``low``.
+Orders without a receipt have no known value and are ``normal``.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from agents.interfaces import RefundPolicy
+from utils.scheduling import PRIORITY_CLASSES
+
+# Hours left in the policy window below which a request is urgent
+URGENT_WINDOW_HOURS = 72
+# (minimum order total, class), first match wins; below every threshold is "low"
+VALUE_CLASSES = [(500.0, "high"), (50.0, "normal")]
+PLATFORM_MIN_CLASS = {"airbnb": "normal"}
+
+
+def hours_left(order_details: Dict[str, Any], policy: RefundPolicy,
+               now: Optional[datetime] = None) -> Optional[float]:
+    """Hours until the policy's standard refund window closes, None if unknown"""
+    limit = policy.time_limits.get("standard")
+    try:
+        purchased = datetime.fromisoformat(str(order_details["date"]))
+        if purchased.tzinfo is not None:
+            # Receipt dates may carry an offset; "now" is naive UTC
+            purchased = purchased.astimezone(timezone.utc).replace(tzinfo=None)
+    except (KeyError, ValueError, TypeError):
+        return None
+    if limit is None:
+        return None
+    elapsed = ((now or datetime.utcnow()) - purchased).total_seconds() / 3600
+    return limit - elapsed
+
+
+def priority_class(platform: str, order_details: Dict[str, Any], policy: RefundPolicy,
+                   now: Optional[datetime] = None) -> str:
+    left = hours_left(order_details, policy, now)
+    if left is not None and left < 0:
+        return "expired"
+    if left is not None and left <= URGENT_WINDOW_HOURS:
+        return "urgent"
+    total = order_details.get("total_amount")
+    if isinstance(total, (int, float)):
+        priority = next((name for minimum, name in VALUE_CLASSES if total >= minimum), "low")
+    else:
+        priority = "normal"
+    floor = PLATFORM_MIN_CLASS.get(platform)
+    if floor and PRIORITY_CLASSES.index(floor) < PRIORITY_CLASSES.index(priority):
+        priority = floor
+    return priority
+
+
+def most_urgent(priorities: List[str]) -> str:
+    return min(priorities, key=PRIORITY_CLASSES.index, default="normal")
@@ -1,4 +1,6 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Union
+import asyncio
+import time
 from agents.interfaces import (
     IPolicyFetcher,
     IMessageGenerator,
@@ -6,6 +8,14 @@ from agents.interfaces import (
     IEvidenceProcessor,
     RefundPolicy
 )
+from agents.prioritization import most_urgent, priority_class
+from utils.blobs import BlobRef, BlobStore
+from utils.deadlines import Deadline, bind_deadline
+from utils.metrics import observe_workflow
+from utils.outcomes import record_outcome
+from utils.scheduling import PriorityScheduler
+from utils.tokens import account_usage, shared_usage_scope
+from utils.tracing import trace_workflow
 from loguru import logger
 
 class RefundAgent:
@@ -14,47 +24,70 @@ class RefundAgent:
         policy_fetcher: IPolicyFetcher,
         message_generator: IMessageGenerator,
         response_analyzer: IResponseAnalyzer,
-        evidence_processor: IEvidenceProcessor
+        evidence_processor: IEvidenceProcessor,
+        scheduler: Optional[PriorityScheduler] = None,
+        evidence_store: Optional[BlobStore] = None
     ):
         self.policy_fetcher = policy_fetcher
         self.message_generator = message_generator
         self.response_analyzer = response_analyzer
         self.evidence_processor = evidence_processor
+        # Admits the LLM stages by priority class once order value and dates are known
+        self.scheduler = scheduler or PriorityScheduler()
+        # Receipts passed as BlobRefs are read from here, and their refs kept for escalations
+        self.evidence_store = evidence_store
+        self.evidence: Dict[str, List[BlobRef]] = {}
         self.conversation_history: Dict[str, list[str]] = {}
+        self.order_details: Dict[str, Dict[str, Any]] = {}
+        self.initiated_at: Dict[str, float] = {}
+        # order_id -> every order covered by the same (possibly consolidated) request
+        self.order_groups: Dict[str, List[str]] = {}
 
+    @observe_workflow("initiate_refund")
+    @record_outcome("initiate_refund")
+    @trace_workflow("initiate_refund", attributes=("order_id", "platform"))
+    @account_usage
+    @bind_deadline
     async def initiate_refund(
         self,
         platform: str,
         order_id: str,
         issue_description: str,
-        receipt_data: Optional[bytes] = None
+        receipt_data: Optional[Union[bytes, BlobRef]] = None,
+        deadline: Optional[Deadline] = None
     ) -> Dict[str, Any]:
         """
-        Initiate the refund process for a given order
+        Initiate the refund process for a given order.
+        ``receipt_data`` is the receipt's bytes or its reference in the evidence store.
+        Stages that cannot finish before ``deadline`` fall back or are skipped.
         """
         try:
             # Fetch platform's refund policy
             policy = await self.policy_fetcher.fetch_policy(platform)
             
             # Process receipt if provided
-            order_details = {}
-            if receipt_data:
-                order_details = await self.evidence_processor.process_receipt(receipt_data)
-                if not await self.evidence_processor.validate_evidence(order_details, policy):
-                    return {
-                        "status": "error",
-                        "message": "Insufficient evidence for refund request"
-                    }
+            order_details = await self._order_details(receipt_data, policy)
+            if order_details is None:
+                return {
+                    "status": "error",
+                    "message": "Insufficient evidence for refund request"
+                }
 
             # Generate initial refund request
-            request_message = await self.message_generator.generate_request(
-                issue_description=issue_description,
-                policy=policy,
-                order_details=order_details
-            )
+            async with self.scheduler.slot(platform, priority_class(platform, order_details, policy)):
+                request_message = await self.message_generator.generate_request(
+                    issue_description=issue_description,
+                    policy=policy,
+                    order_details=order_details,
+                    order_id=order_id
+                )
 
             # Store conversation history
             self.conversation_history[order_id] = [request_message]
+            self.order_details[order_id] = order_details
+            self.initiated_at[order_id] = time.time()
+            if isinstance(receipt_data, BlobRef):
+                self.evidence[order_id] = [receipt_data]
 
             return {
                 "status": "initiated",
@@ -69,11 +102,118 @@ class RefundAgent:
                 "message": f"Failed to initiate refund: {str(e)}"
             }
 
+    @observe_workflow("initiate_consolidated_refund")
+    @record_outcome("initiate_consolidated_refund")
+    @trace_workflow("initiate_consolidated_refund", attributes=("platform",))
+    @bind_deadline
+    async def initiate_consolidated_refund(
+        self,
+        platform: str,
+        orders: List[Dict[str, Any]],
+        deadline: Optional[Deadline] = None
+    ) -> Dict[str, Any]:
+        """
+        Initiate one refund request covering several orders on the same platform.
+        Each order has ``order_id``, ``issue_description`` and optional ``receipt_data``;
+        replies to the request are tracked against every included order.
+        """
+        order_ids = [order["order_id"] for order in orders]
+        try:
+            # LLM usage is shared evenly by the orders in the request
+            with shared_usage_scope([(order_id, platform) for order_id in order_ids]):
+                policy = await self.policy_fetcher.fetch_policy(platform)
+                details = await asyncio.gather(
+                    *(self._order_details(order.get("receipt_data"), policy) for order in orders)
+                )
+                included = [
+                    {"order_id": order["order_id"], "issue_description": order["issue_description"],
+                     "order_details": order_details}
+                    for order, order_details in zip(orders, details) if order_details is not None
+                ]
+                excluded = [order["order_id"] for order, order_details in zip(orders, details) if order_details is None]
+                if not included:
+                    return {
+                        "status": "error",
+                        "message": "Insufficient evidence for refund request",
+                        "excluded": excluded
+                    }
+                priority = most_urgent([
+                    priority_class(platform, order["order_details"], policy) for order in included
+                ])
+                async with self.scheduler.slot(platform, priority):
+                    request_message = await self.message_generator.generate_consolidated_request(
+                        orders=included,
+                        policy=policy
+                    )
+
+            # One conversation shared by every included order
+            history = [request_message]
+            tracking_ids = [order["order_id"] for order in included]
+            receipts = {order["order_id"]: order.get("receipt_data") for order in orders}
+            for order in included:
+                if isinstance(receipts[order["order_id"]], BlobRef):
+                    self.evidence[order["order_id"]] = [receipts[order["order_id"]]]
+                self.conversation_history[order["order_id"]] = history
+                self.order_groups[order["order_id"]] = tracking_ids
+                self.order_details[order["order_id"]] = order["order_details"]
+                self.initiated_at[order["order_id"]] = time.time()
+
+            return {
+                "status": "initiated",
+                "message": request_message,
+                "tracking_ids": tracking_ids,
+                "excluded": excluded
+            }
+
+        except Exception as e:
+            logger.error(f"Error initiating consolidated refund: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"Failed to initiate refund: {str(e)}"
+            }
+
+    def outcome_fields(self, order_id: str) -> Dict[str, Any]:
+        """Amount, escalations so far and time since the request was sent, for the outcome store"""
+        history = self.conversation_history.get(order_id, [])
+        total = self.order_details.get(order_id, {}).get("total_amount")
+        started = self.initiated_at.get(order_id)
+        return {
+            "amount": float(total) if isinstance(total, (int, float)) else None,
+            # request, then (reply, escalation) pairs
+            "escalation_depth": max(len(history) - 1, 0) // 2,
+            "since_start": time.time() - started if started and len(history) > 1 else None,
+        }
+
+    def evidence_refs(self, order_id: str) -> List[BlobRef]:
+        """Stored receipts of every order covered by this order's request"""
+        return [ref for oid in self.order_groups.get(order_id, [order_id]) for ref in self.evidence.get(oid, [])]
+
+    async def _order_details(self, receipt_data: Optional[Union[bytes, BlobRef]],
+                             policy: RefundPolicy) -> Optional[Dict[str, Any]]:
+        """Receipt details ({} without a receipt), or None if the evidence does not meet the policy"""
+        if not receipt_data:
+            return {}
+        if isinstance(receipt_data, BlobRef):
+            if self.evidence_store is None:
+                raise ValueError("Receipt reference given but no evidence store is configured")
+            # Mapped, not copied; unmapped once extraction drops its views
+            receipt_data = self.evidence_store.read(receipt_data)
+        order_details = await self.evidence_processor.process_receipt(receipt_data)
+        if not await self.evidence_processor.validate_evidence(order_details, policy):
+            return None
+        return order_details
+
+    @observe_workflow("handle_response")
+    @record_outcome("handle_response")
+    @trace_workflow("handle_response", attributes=("order_id", "platform"))
+    @account_usage
+    @bind_deadline
     async def handle_response(
         self,
         order_id: str,
         response: str,
-        platform: str
+        platform: str,
+        deadline: Optional[Deadline] = None
     ) -> Dict[str, Any]:
         """
         Handle response from the platform and determine next steps
@@ -83,7 +223,9 @@ class RefundAgent:
                 return {"status": "error", "message": "No active refund request found"}
 
             policy = await self.policy_fetcher.fetch_policy(platform)
-            analysis = await self.response_analyzer.analyze_response(response, policy)
+            priority = priority_class(platform, self.order_details.get(order_id, {}), policy)
+            async with self.scheduler.slot(platform, priority):
+                analysis = await self.response_analyzer.analyze_response(response, policy)
 
             self.conversation_history[order_id].append(response)
 
@@ -91,26 +233,32 @@ class RefundAgent:
                 return {
                     "status": "success",
                     "message": "Refund approved",
-                    "details": analysis
+                    "details": analysis,
+                    "tracking_ids": self.order_groups.get(order_id, [order_id])
                 }
 
             if analysis.get("needs_escalation", False):
-                escalation_message = await self.message_generator.generate_escalation(
-                    previous_response=response,
-                    policy=policy,
-                    history=self.conversation_history[order_id]
-                )
+                async with self.scheduler.slot(platform, priority):
+                    escalation_message = await self.message_generator.generate_escalation(
+                        previous_response=response,
+                        policy=policy,
+                        history=self.conversation_history[order_id]
+                    )
                 self.conversation_history[order_id].append(escalation_message)
                 return {
                     "status": "escalated",
                     "message": escalation_message,
-                    "details": analysis
+                    "details": analysis,
+                    "tracking_ids": self.order_groups.get(order_id, [order_id]),
+                    # Receipts to attach, served by GET /evidence/{digest}
+                    "evidence": [ref.model_dump() for ref in self.evidence_refs(order_id)]
                 }
 
             return {
                 "status": "rejected",
                 "message": "Refund request rejected",
-                "details": analysis
+                "details": analysis,
+                "tracking_ids": self.order_groups.get(order_id, [order_id])
             }
 
         except Exception as e:
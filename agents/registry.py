@@ -0,0 +1,162 @@
+"""
+Component registry that builds the RefundAgent's parts lazily from configuration.
+
+Nothing heavy is imported when this module loads: each factory imports its
+implementation (and through it openai, bs4, aiohttp, pytesseract, PIL) the
+first time that component is requested. Build times are kept so startup
+and first-request costs can be reported.
+"""
+import os
+import tempfile
+import time
+from typing import Any, Callable, Dict, Optional
+
+from prometheus_client import Histogram
+
+from utils.scheduling import PriorityScheduler
+
+from .refund_agent import RefundAgent
+
+Factory = Callable[[Dict[str, Any]], Any]
+
+COMPONENT_BUILD = Histogram(
+    "refund_component_build_seconds",
+    "Time to import and construct a component on first use",
+    ["role"],
+)
+
+
+def _warm_openai_policy_fetcher(config: Dict[str, Any]):
+    from .implementations.policy_cache import WarmPolicyCache
+    return WarmPolicyCache(
+        _openai_policy_fetcher(config),
+        refresh_interval=config["policy_refresh_interval"]
+    )
+
+
+def _openai_policy_fetcher(config: Dict[str, Any]):
+    from .implementations.policy_fetcher import OpenAIPolicyFetcher
+    from .platforms import PlatformRegistry
+    return OpenAIPolicyFetcher(
+        api_key=config["api_key"],
+        platforms=PlatformRegistry.from_file(config["platforms_file"])
+    )
+
+
+def _openai_message_generator(config: Dict[str, Any]):
+    from .implementations.openai_message_gen import OpenAIMessageGenerator
+    return OpenAIMessageGenerator(api_key=config["api_key"], personalize=config["personalize_messages"])
+
+
+def _openai_response_analyzer(config: Dict[str, Any]):
+    from .implementations.response_analyzer import OpenAIResponseAnalyzer
+    return OpenAIResponseAnalyzer(
+        api_key=config["api_key"],
+        batch_size=config["analysis_batch_size"],
+        batch_window=config["analysis_batch_window"]
+    )
+
+
+def _openai_evidence_processor(config: Dict[str, Any]):
+    from .implementations.evidence_processor import OpenAIEvidenceProcessor
+    return OpenAIEvidenceProcessor(api_key=config["api_key"])
+
+
+def _local_evidence_store(config: Dict[str, Any]):
+    from utils.blobs import BlobStore
+    return BlobStore(config["evidence_store_path"] or os.path.join(tempfile.gettempdir(), "refund-evidence"))
+
+
+# role -> implementation name -> factory
+FACTORIES: Dict[str, Dict[str, Factory]] = {
+    "policy_fetcher": {"warm_openai": _warm_openai_policy_fetcher, "openai": _openai_policy_fetcher},
+    "message_generator": {"openai": _openai_message_generator},
+    "response_analyzer": {"openai": _openai_response_analyzer},
+    "evidence_processor": {"openai": _openai_evidence_processor},
+    "evidence_store": {"local": _local_evidence_store},
+}
+
+DEFAULTS: Dict[str, Any] = {
+    "policy_fetcher": "warm_openai",
+    "message_generator": "openai",
+    "response_analyzer": "openai",
+    "evidence_processor": "openai",
+    "evidence_store": "local",
+    "evidence_store_path": None,
+    "policy_refresh_interval": 6 * 3600,
+    "platforms_file": None,
+    "personalize_messages": False,
+    "analysis_batch_size": 1,
+    "analysis_batch_window": 0.05,
+    "max_concurrent_refunds": None,
+    "queue_promote_seconds": 30.0,
+}
+
+
+class ComponentRegistry:
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        self.config = {**DEFAULTS, **(config or {})}
+        self.factories = {role: dict(impls) for role, impls in FACTORIES.items()}
+        self.build_seconds: Dict[str, float] = {}
+        self._instances: Dict[str, Any] = {}
+        self._agent: Optional[RefundAgent] = None
+
+    @classmethod
+    def from_env(cls, api_key: Optional[str]) -> "ComponentRegistry":
+        """Pick implementations from REFUND_<ROLE> variables, e.g. REFUND_POLICY_FETCHER=openai"""
+        config: Dict[str, Any] = {"api_key": api_key}
+        for role in FACTORIES:
+            if os.getenv(f"REFUND_{role.upper()}"):
+                config[role] = os.environ[f"REFUND_{role.upper()}"]
+        if os.getenv("EVIDENCE_STORE_PATH"):
+            config["evidence_store_path"] = os.environ["EVIDENCE_STORE_PATH"]
+        if os.getenv("PLATFORMS_FILE"):
+            config["platforms_file"] = os.environ["PLATFORMS_FILE"]
+        if os.getenv("POLICY_REFRESH_SECONDS"):
+            config["policy_refresh_interval"] = float(os.environ["POLICY_REFRESH_SECONDS"])
+        if os.getenv("ANALYSIS_BATCH_SIZE"):
+            config["analysis_batch_size"] = int(os.environ["ANALYSIS_BATCH_SIZE"])
+        if os.getenv("ANALYSIS_BATCH_WINDOW_MS"):
+            config["analysis_batch_window"] = float(os.environ["ANALYSIS_BATCH_WINDOW_MS"]) / 1000
+        if os.getenv("MAX_CONCURRENT_REFUNDS"):
+            config["max_concurrent_refunds"] = int(os.environ["MAX_CONCURRENT_REFUNDS"])
+        if os.getenv("QUEUE_PROMOTE_SECONDS"):
+            config["queue_promote_seconds"] = float(os.environ["QUEUE_PROMOTE_SECONDS"])
+        if os.getenv("PERSONALIZE_MESSAGES"):
+            config["personalize_messages"] = os.environ["PERSONALIZE_MESSAGES"].lower() in ("1", "true", "yes")
+        return cls(config)
+
+    def register(self, role: str, name: str, factory: Factory) -> None:
+        self.factories.setdefault(role, {})[name] = factory
+
+    def get(self, role: str) -> Any:
+        """Return the configured component for ``role``, building it on first use"""
+        instance = self._instances.get(role)
+        if instance is None:
+            name = self.config[role]
+            if name not in self.factories.get(role, {}):
+                raise KeyError(f"No {role} implementation named {name!r}")
+            started = time.perf_counter()
+            instance = self.factories[role][name](self.config)
+            self.build_seconds[role] = time.perf_counter() - started
+            COMPONENT_BUILD.labels(role).observe(self.build_seconds[role])
+            self._instances[role] = instance
+        return instance
+
+    def is_built(self, role: str) -> bool:
+        return role in self._instances
+
+    def agent(self) -> RefundAgent:
+        if self._agent is None:
+            self._agent = RefundAgent(
+                policy_fetcher=self.get("policy_fetcher"),
+                message_generator=self.get("message_generator"),
+                response_analyzer=self.get("response_analyzer"),
+                evidence_processor=self.get("evidence_processor"),
+                scheduler=PriorityScheduler(
+                    capacity=self.config["max_concurrent_refunds"],
+                    promote_after=self.config["queue_promote_seconds"]
+                ),
+                evidence_store=self.get("evidence_store")
+            )
+        return self._agent
@@ -0,0 +1,3 @@
+"""
+Offline benchmarking tools for the refund automation agent
+"""
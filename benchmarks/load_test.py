@@ -0,0 +1,282 @@
+"""
+End-to-end HTTP load test for main.py.
+
+Starts the FastAPI app, the mock LLM and the mock policy site on local
+ports, then drives ``/process-refund`` and ``/handle-response/{order_id}``
+with a closed-loop workload at stepped concurrency levels.
+
+Usage:
+    python -m benchmarks.load_test --levels 1 4 16 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+from pydantic import BaseModel
+
+from benchmarks.mock_llm import create_mock_llm_app
+from benchmarks.mock_policy_server import create_mock_policy_app
+
+DEFAULT_RECEIPT = os.path.join("tests", "test_data", "amazon_order.png")
+PLATFORMS = ["amazon", "ubereats", "airbnb"]
+ISSUES = [
+    "Item arrived damaged and is not usable.",
+    "Order never arrived even though it is marked as delivered.",
+    "Item is not as described in the listing.",
+]
+REPLIES = [
+    "Unfortunately we cannot process your refund as this is outside our policy.",
+    "Could you please provide photos of the damaged item?",
+    "We have approved your request and processed a full refund to your card.",
+]
+
+
+class LevelResult(BaseModel):
+    """Aggregated measurements for one concurrency level"""
+    concurrency: int
+    requests: int
+    errors: int
+    throughput_rps: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    error_rate: float
+    loop_lag_p99_ms: float
+    loop_lag_max_ms: float
+
+
+class ServerThread:
+    """Owns an event loop running in a daemon thread"""
+
+    def __init__(self, name: str):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+
+    def run(self, coro, timeout: Optional[float] = None) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def submit(self, coro) -> "asyncio.Future":
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def _start_aiohttp(app: web.Application) -> web.AppRunner:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+async def _probe_loop_lag(samples: List[float], stop: threading.Event, interval: float = 0.01):
+    """Record how late the app's event loop wakes up from short sleeps"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - started - interval))
+
+
+class LoadTest:
+    def __init__(self, llm_latency: float, policy_latency: float,
+                 receipt_ratio: float, reply_ratio: float, receipt_path: str):
+        self.llm_latency = llm_latency
+        self.policy_latency = policy_latency
+        self.receipt_ratio = receipt_ratio
+        self.reply_ratio = reply_ratio
+        with open(receipt_path, "rb") as f:
+            self.receipt = f.read()
+        self.mocks = ServerThread("mock-servers")
+        self.app_thread = ServerThread("refund-app")
+        self.base_url = ""
+        self._server = None
+        self._serving = None
+        self._runners: List[web.AppRunner] = []
+
+    def start(self) -> None:
+        llm = self.mocks.run(_start_aiohttp(create_mock_llm_app(self.llm_latency)))
+        site = self.mocks.run(_start_aiohttp(create_mock_policy_app(self.policy_latency)))
+        self._runners = [llm, site]
+        llm_host, llm_port = llm.addresses[0][:2]
+        site_host, site_port = site.addresses[0][:2]
+
+        os.environ["OPENAI_BASE_URL"] = f"http://{llm_host}:{llm_port}/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+
+        import uvicorn
+        import main
+        platforms = main.registry.get("policy_fetcher").platforms
+        for platform in platforms.names():
+            platforms.set_url(platform, f"http://{site_host}:{site_port}/policy/{platform}")
+
+        port = _free_port()
+        config = uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning")
+        self._server = uvicorn.Server(config)
+        self._serving = self.app_thread.submit(self._server.serve())
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Refund app did not start")
+            time.sleep(0.05)
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.should_exit = True
+            self._serving.result(timeout=10)
+        for runner in self._runners:
+            self.mocks.run(runner.cleanup(), timeout=10)
+        self.app_thread.stop()
+        self.mocks.stop()
+
+    async def _initiate(self, session: aiohttp.ClientSession, pending: List[Dict[str, str]]) -> bool:
+        order = {"platform": random.choice(PLATFORMS), "order_id": f"LT-{uuid.uuid4().hex[:10]}"}
+        form = aiohttp.FormData()
+        form.add_field("platform", order["platform"])
+        form.add_field("order_id", order["order_id"])
+        form.add_field("issue_description", random.choice(ISSUES))
+        if random.random() < self.receipt_ratio:
+            form.add_field("receipt", self.receipt, filename="receipt.png", content_type="image/png")
+        async with session.post(f"{self.base_url}/process-refund", data=form) as resp:
+            body = await resp.json()
+        ok = resp.status == 200 and body.get("status") != "error"
+        if ok:
+            pending.append(order)
+        return ok
+
+    async def _reply(self, session: aiohttp.ClientSession, pending: List[Dict[str, str]]) -> bool:
+        order = pending.pop(random.randrange(len(pending)))
+        form = aiohttp.FormData()
+        form.add_field("platform", order["platform"])
+        form.add_field("response", random.choice(REPLIES))
+        async with session.post(f"{self.base_url}/handle-response/{order['order_id']}", data=form) as resp:
+            body = await resp.json()
+        if body.get("status") == "escalated":
+            pending.append(order)
+        return resp.status == 200 and body.get("status") != "error"
+
+    async def _worker(self, session, stop_at: float, latencies: List[float], errors: List[int]):
+        pending: List[Dict[str, str]] = []
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                if pending and random.random() < self.reply_ratio:
+                    ok = await self._reply(session, pending)
+                else:
+                    ok = await self._initiate(session, pending)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors.append(1)
+
+    async def run_level(self, concurrency: int, duration: float) -> LevelResult:
+        latencies: List[float] = []
+        errors: List[int] = []
+        lag_samples: List[float] = []
+        stop_probe = threading.Event()
+        probe = self.app_thread.submit(_probe_loop_lag(lag_samples, stop_probe))
+
+        timeout = aiohttp.ClientTimeout(total=120)
+        connector = aiohttp.TCPConnector(limit=concurrency)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            started = time.perf_counter()
+            stop_at = time.monotonic() + duration
+            await asyncio.gather(*(
+                self._worker(session, stop_at, latencies, errors) for _ in range(concurrency)
+            ))
+            elapsed = time.perf_counter() - started
+
+        stop_probe.set()
+        await asyncio.wrap_future(probe)
+        latencies.sort()
+        lag_samples.sort()
+        total = len(latencies)
+        return LevelResult(
+            concurrency=concurrency,
+            requests=total,
+            errors=len(errors),
+            throughput_rps=total / elapsed if elapsed else 0.0,
+            p50_ms=_percentile(latencies, 50) * 1000,
+            p95_ms=_percentile(latencies, 95) * 1000,
+            p99_ms=_percentile(latencies, 99) * 1000,
+            error_rate=len(errors) / total if total else 0.0,
+            loop_lag_p99_ms=_percentile(lag_samples, 99) * 1000,
+            loop_lag_max_ms=(lag_samples[-1] if lag_samples else 0.0) * 1000,
+        )
+
+
+def format_results(results: List[LevelResult]) -> str:
+    header = f"{'conc':>5} {'reqs':>6} {'rps':>8} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} {'err%':>6} {'lag99':>8} {'lagmax':>8}"
+    rows = [header]
+    for r in results:
+        rows.append(
+            f"{r.concurrency:>5} {r.requests:>6} {r.throughput_rps:>8.1f} {r.p50_ms:>8.1f} "
+            f"{r.p95_ms:>8.1f} {r.p99_ms:>8.1f} {r.error_rate * 100:>6.1f} "
+            f"{r.loop_lag_p99_ms:>8.1f} {r.loop_lag_max_ms:>8.1f}"
+        )
+    return "\n".join(rows)
+
+
+def run_load_test(levels: List[int], duration: float, llm_latency: float = 0.2,
+                  policy_latency: float = 0.05, receipt_ratio: float = 0.3,
+                  reply_ratio: float = 0.4, receipt_path: str = DEFAULT_RECEIPT) -> List[LevelResult]:
+    """Run every concurrency level in order against a freshly started app"""
+    test = LoadTest(llm_latency, policy_latency, receipt_ratio, reply_ratio, receipt_path)
+    test.start()
+    try:
+        return [asyncio.run(test.run_level(level, duration)) for level in levels]
+    finally:
+        test.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the refund automation API")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--policy-latency", type=float, default=0.05)
+    parser.add_argument("--receipt-ratio", type=float, default=0.3)
+    parser.add_argument("--reply-ratio", type=float, default=0.4)
+    parser.add_argument("--receipt", default=DEFAULT_RECEIPT)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = run_load_test(
+        args.levels, args.duration, args.llm_latency, args.policy_latency,
+        args.receipt_ratio, args.reply_ratio, args.receipt
+    )
+    print(format_results(results))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([r.model_dump() for r in results], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Minimal OpenAI-compatible chat completions server for offline benchmarking.
+
+Point the components at it with ``OPENAI_BASE_URL=http://host:port/v1``.
+Responses are canned per call site, recognised from the prompt wording.
+"""
+import asyncio
+import json
+import re
+import time
+import uuid
+from typing import Any, Dict, List
+
+from aiohttp import web
+
+POLICY_ANALYSIS = {
+    "eligibility_criteria": {
+        "damaged": "Item received damaged or defective",
+        "not_as_described": "Item differs from its description",
+    },
+    "time_limits": {"standard": 30 * 24, "damaged": 48},
+    "required_evidence": ["Order number", "Description of issue"],
+}
+
+RECEIPT_INFO = {
+    "order_id": "112-0308297-0519429",
+    "date": "2025-03-09",
+    "total_amount": 25.99,
+    "merchant": "Amazon.com",
+    "items": [{"name": "Detox Organic Body Scrub", "price": 25.99}],
+    "payment_method": "Visa ending in 3066",
+    "delivery_status": "Delivered",
+}
+
+EVIDENCE_VALIDATION = {
+    "meets_requirements": True,
+    "missing_items": [],
+    "time_valid": True,
+    "validation_notes": ["Mock validation"],
+}
+
+MESSAGE_TEXT = (
+    "Dear Customer Service,\n\nI am writing to request a refund for my order, "
+    "which arrived damaged. Per your returns policy, damaged items are eligible "
+    "for a full refund. Please process the refund to my original payment method."
+    "\n\nKind regards"
+)
+
+
+def _merchant_reply(prompt: str) -> str:
+    """The quoted reply of an analyze_response prompt; its instructions mention "approved" too"""
+    match = re.search(r"Response: (.*?)\n\s*Relevant Policy Sections:", prompt, re.S)
+    return match.group(1) if match else prompt
+
+
+def _analysis_for(reply: str) -> Dict[str, Any]:
+    """Approve or escalate depending on the merchant reply"""
+    approved = "approved" in reply.lower() or "processed a full refund" in reply.lower()
+    return {
+        "approved": approved,
+        "needs_escalation": not approved,
+        "key_points": ["Mock analysis"],
+        "policy_violations": [],
+        "suggested_action": "None needed" if approved else "Escalate",
+        "confidence": 0.9,
+    }
+
+
+def _batch_analysis_for(prompt: str) -> List[Dict[str, Any]]:
+    """One analysis per item of a batched analyze_response prompt"""
+    items = json.loads(prompt.split("Items:", 1)[1].split("Respond with", 1)[0])
+    return [{"id": item["id"], **_analysis_for(item["response"])} for item in items]
+
+
+def _section_analysis_for(prompt: str) -> Dict[str, Any]:
+    """The canned policy analysis for the first section of an analyze_policy prompt, empty for the rest"""
+    ids = re.findall(r"^\s*\[(s\d+)\]", prompt, re.M)
+    empty = {"eligibility_criteria": {}, "time_limits": {}, "required_evidence": []}
+    return {section_id: POLICY_ANALYSIS if i == 0 else empty for i, section_id in enumerate(ids)}
+
+
+def canned_completion(prompt: str) -> str:
+    """Pick the canned completion for the call site that produced ``prompt``"""
+    if "Analyze each of these responses to refund requests" in prompt:
+        return json.dumps(_batch_analysis_for(prompt))
+    if "sections of the" in prompt and "refund policy and extract" in prompt:
+        return json.dumps(_section_analysis_for(prompt))
+    if "Extract key information from this receipt" in prompt:
+        return json.dumps(RECEIPT_INFO)
+    if "evidence meets the refund policy requirements" in prompt:
+        return json.dumps(EVIDENCE_VALIDATION)
+    if "Analyze this response to a refund request" in prompt:
+        return json.dumps(_analysis_for(_merchant_reply(prompt)))
+    return MESSAGE_TEXT
+
+
+def _text_of(content: Any) -> str:
+    """Message text; image parts of multimodal messages are skipped"""
+    if isinstance(content, list):
+        return "\n".join(part.get("text", "") for part in content if part.get("type") == "text")
+    return str(content)
+
+
+def create_mock_llm_app(latency: float = 0.0) -> web.Application:
+    """Build the mock server; ``latency`` seconds are added to every call"""
+
+    async def chat_completions(request: web.Request) -> web.Response:
+        body = await request.json()
+        prompt = "\n".join(_text_of(m.get("content", "")) for m in body.get("messages", []))
+        if latency:
+            await asyncio.sleep(latency)
+        content = canned_completion(prompt)
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        return web.json_response({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", chat_completions)
+    return app
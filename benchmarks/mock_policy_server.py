@@ -0,0 +1,53 @@
+"""
+Local stand-in for the merchants' refund policy pages.
+
+Serves ``/policy/{platform}`` as an HTML page shaped like the real help
+articles (navigation, scripts and several policy sections).
+"""
+import asyncio
+
+from aiohttp import web
+
+POLICY_HTML = """
+<html>
+<head><title>{platform} returns and refunds</title>
+<script>window.analytics = {{}};</script>
+<style>body {{ font-family: sans-serif; }}</style>
+</head>
+<body>
+<nav>Help home | Your orders | Contact us</nav>
+<h1>{platform} Returns and Refunds Policy</h1>
+<h2>Return window</h2>
+<p>Most items can be returned within 30 days of delivery for a full refund.</p>
+<h2>Damaged or defective items</h2>
+<p>If an item arrives damaged or defective, contact us within 48 hours of
+delivery. We may ask for photos of the damaged item and the packaging.</p>
+<h2>Items not received</h2>
+<p>If your order has not arrived within 7 days of the estimated delivery
+date, you are eligible for a refund or replacement.</p>
+<h2>Refund timing</h2>
+<p>Refunds are issued to the original payment method within 3-5 business days
+after the return is processed.</p>
+<h2>Non-returnable items</h2>
+<p>Gift cards, downloadable software and perishable goods cannot be returned.</p>
+<footer>Conditions of use | Privacy notice</footer>
+</body>
+</html>
+"""
+
+
+def create_mock_policy_app(latency: float = 0.0) -> web.Application:
+    """Build the mock policy site; ``latency`` seconds are added to every page"""
+
+    async def policy_page(request: web.Request) -> web.Response:
+        if latency:
+            await asyncio.sleep(latency)
+        platform = request.match_info["platform"]
+        return web.Response(
+            text=POLICY_HTML.format(platform=platform.title()),
+            content_type="text/html"
+        )
+
+    app = web.Application()
+    app.router.add_get("/policy/{platform}", policy_page)
+    return app
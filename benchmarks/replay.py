@@ -0,0 +1,134 @@
+"""
+Deterministic, offline benchmark of full refund workflows.
+
+Each workflow runs the real ``OpenAI*`` components: it initiates a refund
+with a receipt, then handles a rejection reply and an approval reply.
+LLM calls go through an ``LLM_CASSETTE`` (``utils/cassette.py``). Record one
+once against the live API, or against the mock LLM with ``--mock-llm``.
+After that the same workflows replay without a key or network, with the
+same replies every run. Policies are analyzed from the mock site's text,
+so nothing is scraped. Reports latency per workflow and, with
+``--profile``, the top functions by cumulative time.
+
+Usage:
+    python -m benchmarks.replay --record --mock-llm --cassette workflows.jsonl.gz
+    python -m benchmarks.replay --cassette workflows.jsonl.gz --workflows 50 --profile 25
+"""
+import argparse
+import asyncio
+import cProfile
+import os
+import pstats
+import re
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.load_test import DEFAULT_RECEIPT, ServerThread, _percentile, _start_aiohttp
+from benchmarks.mock_llm import create_mock_llm_app
+from benchmarks.mock_policy_server import POLICY_HTML
+
+ISSUE = "Item arrived damaged and is not usable."
+REJECTION = "Unfortunately we cannot process your refund as this is outside our policy."
+APPROVAL = "We have approved your request and processed a full refund to your card."
+
+
+def policy_text(platform: str) -> str:
+    """The mock policy page as the scraper would extract it: one line per heading or paragraph"""
+    body = POLICY_HTML.format(platform=platform).split("<h1>", 1)[1].split("<footer>", 1)[0]
+    blocks = re.findall(r">([^<]+)<", "<h1>" + body)
+    return "\n".join(" ".join(block.split()) for block in blocks if block.strip())
+
+
+def build_agent():
+    from agents.implementations.evidence_processor import OpenAIEvidenceProcessor
+    from agents.implementations.openai_message_gen import OpenAIMessageGenerator
+    from agents.implementations.policy_fetcher import OpenAIPolicyFetcher
+    from agents.implementations.response_analyzer import OpenAIResponseAnalyzer
+    from agents.platforms import PlatformRegistry, PlatformSpec
+    from agents.refund_agent import RefundAgent
+
+    api_key = os.getenv("OPENAI_API_KEY", "sk-replay")
+    platforms = PlatformRegistry([PlatformSpec(name="amazon", policy_text=policy_text("amazon"))])
+    return RefundAgent(
+        policy_fetcher=OpenAIPolicyFetcher(api_key=api_key, platforms=platforms),
+        message_generator=OpenAIMessageGenerator(api_key=api_key),
+        response_analyzer=OpenAIResponseAnalyzer(api_key=api_key),
+        evidence_processor=OpenAIEvidenceProcessor(api_key=api_key)
+    )
+
+
+async def run_workflows(workflows: int, receipt: Optional[bytes]) -> List[Dict[str, Any]]:
+    """Run the workflows one after another so replies match the recording order"""
+    agent = build_agent()
+    results = []
+    for i in range(workflows):
+        order_id = f"REPLAY-{i:04d}"
+        started = time.perf_counter()
+        statuses = [(await agent.initiate_refund(
+            platform="amazon", order_id=order_id, issue_description=ISSUE, receipt_data=receipt
+        ))["status"]]
+        for reply in (REJECTION, APPROVAL):
+            result = await agent.handle_response(order_id=order_id, response=reply, platform="amazon")
+            statuses.append(result["status"])
+        results.append({"seconds": time.perf_counter() - started, "statuses": statuses})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay full refund workflows from an LLM cassette")
+    parser.add_argument("--cassette", required=True)
+    parser.add_argument("--record", action="store_true", help="record the cassette instead of replaying it")
+    parser.add_argument("--mock-llm", action="store_true", help="record against the local mock LLM")
+    parser.add_argument("--workflows", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="replay recorded LLM latency scaled by this factor")
+    parser.add_argument("--receipt", default=DEFAULT_RECEIPT, help="receipt image; empty for none")
+    parser.add_argument("--profile", type=int, default=0, help="print the top N functions by cumulative time")
+    args = parser.parse_args()
+
+    os.environ["LLM_CASSETTE"] = args.cassette
+    os.environ["LLM_CASSETTE_MODE"] = "record" if args.record else "replay"
+    os.environ["LLM_CASSETTE_LATENCY"] = str(args.latency)
+    mocks = None
+    if args.mock_llm:
+        mocks = ServerThread("mock-llm")
+        llm = mocks.run(_start_aiohttp(create_mock_llm_app()))
+        os.environ["OPENAI_BASE_URL"] = "http://%s:%s/v1" % llm.addresses[0][:2]
+        os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+
+    receipt = None
+    if args.receipt:
+        with open(args.receipt, "rb") as f:
+            receipt = f.read()
+
+    from prometheus_client import REGISTRY
+    from utils.cassette import save_cassette
+
+    profiler = cProfile.Profile() if args.profile else None
+    try:
+        if profiler:
+            profiler.enable()
+        results = asyncio.run(run_workflows(args.workflows, receipt))
+        if profiler:
+            profiler.disable()
+    finally:
+        save_cassette()
+        if mocks is not None:
+            mocks.run(llm.cleanup())
+            mocks.stop()
+
+    seconds = sorted(r["seconds"] * 1000 for r in results)
+    calls = {(mode, result): REGISTRY.get_sample_value("refund_llm_cassette_calls_total",
+                                                       {"mode": mode, "result": result}) or 0
+             for mode, result in [("record", "recorded"), ("replay", "replayed"), ("replay", "miss")]}
+    print(f"workflows {len(results)}  statuses {results[0]['statuses'] if results else []}")
+    print(f"ms per workflow  p50 {statistics.median(seconds):.1f}  p95 {_percentile(seconds, 95):.1f}  "
+          f"max {seconds[-1]:.1f}")
+    print("llm calls  " + "  ".join(f"{result} {int(n)}" for (_, result), n in calls.items()))
+    if profiler:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(args.profile)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Cold-start benchmark for main.py.
+
+Measures, in fresh interpreters:
+- import time of ``main`` (what a worker pays before it can accept a socket)
+- time until the app is serving (lifespan policy warm-up included)
+- latency of the first /process-refund (with receipt) and /handle-response,
+  which include building the lazily registered components, and of a second
+  warm request for comparison
+
+Usage:
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import main; "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def measure_import_ms() -> float:
+    env = {**os.environ, "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "sk-mock")}
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], env=env, check=True, capture_output=True, text=True
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _child() -> Dict[str, Any]:
+    """Runs inside a fresh interpreter: start the app and time the first requests"""
+    import aiohttp
+    from benchmarks.load_test import LoadTest
+
+    test = LoadTest(llm_latency=0.0, policy_latency=0.0, receipt_ratio=1.0,
+                    reply_ratio=1.0, receipt_path=os.path.join("tests", "test_data", "amazon_order.png"))
+    started = time.perf_counter()
+    test.start()
+    ready_ms = (time.perf_counter() - started) * 1000
+
+    async def timed_requests() -> Dict[str, float]:
+        timings: Dict[str, float] = {}
+        pending: List[Dict[str, str]] = []
+        async with aiohttp.ClientSession() as session:
+            for label, call in [
+                ("first_process_refund_ms", test._initiate),
+                ("first_handle_response_ms", test._reply),
+                ("warm_process_refund_ms", test._initiate),
+                ("warm_handle_response_ms", test._reply),
+            ]:
+                t = time.perf_counter()
+                await call(session, pending)
+                timings[label] = (time.perf_counter() - t) * 1000
+        return timings
+
+    try:
+        timings = asyncio.run(timed_requests())
+        import main
+        build_ms = {role: s * 1000 for role, s in main.registry.build_seconds.items()}
+    finally:
+        test.stop()
+    return {"app_ready_ms": ready_ms, **timings, "component_build_ms": build_ms}
+
+
+def run_startup_benchmark(runs: int) -> Dict[str, Any]:
+    samples: Dict[str, List[float]] = {"import_main_ms": []}
+    for _ in range(runs):
+        samples["import_main_ms"].append(measure_import_ms())
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--child"],
+            check=True, capture_output=True, text=True
+        )
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        for key, value in result.items():
+            if key == "component_build_ms":
+                for role, ms in value.items():
+                    samples.setdefault(f"build_{role}_ms", []).append(ms)
+            else:
+                samples.setdefault(key, []).append(value)
+    return {key: statistics.median(values) for key, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time and first-request latency")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(_child()))
+        return
+
+    for key, value in run_startup_benchmark(args.runs).items():
+        print(f"{key:>32}: {value:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
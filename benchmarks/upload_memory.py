@@ -0,0 +1,145 @@
+"""
+Peak Python heap per /process-refund request, by receipt size.
+
+Requests are fed straight into the ASGI app from a pre-built multipart
+body, so only server-side allocations (form parsing, upload buffering,
+decoding, OCR hand-off, prompts) count towards the tracemalloc peak. The
+LLM and policy site are the local mocks.
+
+Usage:
+    python -m benchmarks.upload_memory --sizes 0.3 2 8 --requests 5
+"""
+import argparse
+import asyncio
+import io
+import os
+import shutil
+import statistics
+import tempfile
+import tracemalloc
+import uuid
+from typing import Dict, List, Tuple
+
+from benchmarks.load_test import ServerThread, _start_aiohttp
+from benchmarks.mock_llm import create_mock_llm_app
+from benchmarks.mock_policy_server import create_mock_policy_app
+
+BOUNDARY = "refundbenchboundary"
+
+
+def make_receipt(megabytes: float) -> bytes:
+    """A PNG of roughly the requested size (noise compresses poorly)"""
+    from PIL import Image
+    side = max(64, int((megabytes * 1024 * 1024 / 3) ** 0.5))
+    image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+    out = io.BytesIO()
+    image.save(out, format="PNG", compress_level=1)
+    return out.getvalue()
+
+
+def multipart_body(fields: Dict[str, str], receipt: bytes) -> bytes:
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    parts.append(
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="receipt"; filename="receipt.png"\r\n'
+        f"Content-Type: image/png\r\n\r\n".encode()
+    )
+    parts.append(receipt)
+    parts.append(f"\r\n--{BOUNDARY}--\r\n".encode())
+    return b"".join(parts)
+
+
+async def post_asgi(app, path: str, body: bytes, chunk_size: int = 64 * 1024) -> int:
+    """Send one request through the ASGI app and return the status code"""
+    view = memoryview(body)
+    offsets = iter(range(0, len(body), chunk_size))
+    status: List[int] = []
+    responded = asyncio.Event()
+
+    async def receive():
+        offset = next(offsets, None)
+        if offset is None:
+            # Like a real client, stay connected until the response has been sent
+            await responded.wait()
+            return {"type": "http.disconnect"}
+        end = offset + chunk_size
+        return {"type": "http.request", "body": bytes(view[offset:end]), "more_body": end < len(body)}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+        elif message["type"] == "http.response.body" and not message.get("more_body"):
+            responded.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [
+            (b"content-type", f"multipart/form-data; boundary={BOUNDARY}".encode()),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    await app(scope, receive, send)
+    return status[0]
+
+
+def run_upload_memory(sizes_mb: List[float], requests: int) -> List[Tuple[float, int, float, float]]:
+    mocks = ServerThread("mock-servers")
+    llm = mocks.run(_start_aiohttp(create_mock_llm_app()))
+    site = mocks.run(_start_aiohttp(create_mock_policy_app()))
+    os.environ["OPENAI_BASE_URL"] = "http://%s:%s/v1" % llm.addresses[0][:2]
+    os.environ.setdefault("OPENAI_API_KEY", "sk-mock")
+
+    import main
+    evidence_dir = tempfile.mkdtemp(prefix="upload-memory-")
+    main.registry.config["evidence_store_path"] = evidence_dir
+    platforms = main.registry.get("policy_fetcher").platforms
+    for platform in platforms.names():
+        platforms.set_url(platform, "http://%s:%s/policy/%s" % (*site.addresses[0][:2], platform))
+
+    async def measure() -> List[Tuple[float, int, float, float]]:
+        rows = []
+        tracemalloc.start()
+        for size in sizes_mb:
+            receipt = make_receipt(size)
+            peaks, status = [], 0
+            for _ in range(requests):
+                body = multipart_body({
+                    "platform": "amazon",
+                    "order_id": f"MEM-{uuid.uuid4().hex[:8]}",
+                    "issue_description": "Item arrived damaged",
+                }, receipt)
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                status = await post_asgi(main.app, "/process-refund", body)
+                peaks.append((tracemalloc.get_traced_memory()[1] - baseline) / 2**20)
+            rows.append((len(receipt) / 2**20, status, statistics.median(peaks), max(peaks)))
+        tracemalloc.stop()
+        return rows
+
+    try:
+        return asyncio.run(measure())
+    finally:
+        for runner in (llm, site):
+            mocks.run(runner.cleanup())
+        mocks.stop()
+        shutil.rmtree(evidence_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory per /process-refund request")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[0.3, 2.0, 8.0], help="receipt MB")
+    parser.add_argument("--requests", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'receipt MB':>10} {'status':>6} {'peak MB p50':>12} {'peak MB max':>12}")
+    for size, status, p50, peak in run_upload_memory(args.sizes, args.requests):
+        print(f"{size:>10.2f} {status:>6} {p50:>12.2f} {peak:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
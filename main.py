@@ -1,30 +1,106 @@
+import asyncio
+import json
+import math
 import os
-from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import Optional
-import uvicorn
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Form, Request
+from fastapi.responses import FileResponse, JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional
 from loguru import logger
 import secrets
 
-from agents.refund_agent import RefundAgent
-from agents.implementations.openai_message_gen import OpenAIMessageGenerator
-# Import other implementations as they're created
+from agents.consolidation import PendingOrder, group_orders
+from agents.mail_ingest import MailIngestor
+from agents.registry import ComponentRegistry
+from utils.cassette import save_cassette
+from utils.deadlines import Deadline, record_cancelled
+from utils.metrics import IN_FLIGHT
+from utils.outcomes import outcomes
+from utils.tokens import ledger
+from utils.uploads import MAX_RECEIPT_BYTES, UploadRejected, sniff_type, store_receipt
+
+# Prefer the local secrets.py, fall back to the environment (benchmarks, CI)
+api_key = getattr(secrets, "OPENAI_API_KEY", None) or os.getenv("OPENAI_API_KEY")
+
+# Components are built on first use, so importing this module stays cheap
+registry = ComponentRegistry.from_env(api_key)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    policy_fetcher = registry.get("policy_fetcher")
+    if hasattr(policy_fetcher, "warm_up"):
+        # Analyze every known platform's policy before serving traffic
+        await policy_fetcher.warm_up(timeout=float(os.getenv("POLICY_WARMUP_TIMEOUT", 60)))
+        policy_fetcher.start_refresh()
+    # Merchant replies delivered to a local Maildir or mbox are handled without the HTTP API
+    ingestor = None
+    if os.getenv("MAILBOX_PATH"):
+        ingestor = MailIngestor(
+            registry.agent(),
+            os.environ["MAILBOX_PATH"],
+            concurrency=int(os.getenv("MAILBOX_CONCURRENCY", 8))
+        )
+        ingestor.start()
+    yield
+    if ingestor is not None:
+        await ingestor.stop()
+    if hasattr(policy_fetcher, "stop_refresh"):
+        await policy_fetcher.stop_refresh()
+    outcomes.flush()
+    save_cassette()
 
 # Initialize FastAPI app
-app = FastAPI(title="Refund Automation Agent")
+app = FastAPI(title="Refund Automation Agent", lifespan=lifespan)
+
+# Room for the text fields and multipart framing around the receipt
+FORM_OVERHEAD_BYTES = 64 * 1024
+# Orders (and receipts) accepted in one /process-refunds call
+MAX_BULK_ORDERS = 20
 
-# Initialize components
-message_generator = OpenAIMessageGenerator(api_key=secrets.OPENAI_API_KEY)
-# Initialize other components (policy_fetcher, response_analyzer, evidence_processor)
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Refuse declared-oversize bodies before the multipart parser spools them"""
+    receipts = {"/process-refund": 1, "/process-refunds": MAX_BULK_ORDERS}.get(request.url.path)
+    if receipts:
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > receipts * MAX_RECEIPT_BYTES + FORM_OVERHEAD_BYTES:
+            return JSONResponse(
+                status_code=413,
+                content={"status": "error", "message": f"Receipt exceeds {MAX_RECEIPT_BYTES} bytes"}
+            )
+    return await call_next(request)
 
-# Initialize RefundAgent
-agent = RefundAgent(
-    policy_fetcher=None,  # TODO: Add implementation
-    message_generator=message_generator,
-    response_analyzer=None,  # TODO: Add implementation
-    evidence_processor=None  # TODO: Add implementation
-)
+# Clients may ask for a shorter deadline with an X-Request-Timeout header (seconds)
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT_SECONDS", 60))
+DISCONNECT_POLL_SECONDS = 0.5
+
+def request_deadline(request: Request) -> Deadline:
+    header = request.headers.get("x-request-timeout", "")
+    try:
+        seconds = float(header)
+    except ValueError:
+        seconds = DEFAULT_REQUEST_TIMEOUT
+    # "nan" and "inf" parse as floats, and NaN would pass through min/max untouched
+    if not math.isfinite(seconds):
+        seconds = DEFAULT_REQUEST_TIMEOUT
+    return Deadline(min(max(seconds, 0.0), DEFAULT_REQUEST_TIMEOUT))
+
+async def until_disconnect(request: Request, endpoint: str, work) -> Optional[dict]:
+    """Run ``work``, cancelling it (and its LLM/OCR calls) if the client goes away; None then"""
+    task = asyncio.ensure_future(work)
+    while not task.done():
+        await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+        if not task.done() and await request.is_disconnected():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            record_cancelled(endpoint)
+            return None
+    return task.result()
 
 class RefundRequest(BaseModel):
     platform: str
@@ -34,6 +110,7 @@ class RefundRequest(BaseModel):
 
 @app.post("/process-refund")
 async def process_refund(
+    request: Request,
     platform: str = Form(...),
     order_id: str = Form(...),
     issue_description: str = Form(...),
@@ -41,18 +118,29 @@ async def process_refund(
     email: Optional[str] = Form(None)
 ):
     try:
-        receipt_data = await receipt.read() if receipt else None
-        result = await agent.initiate_refund(
-            platform=platform,
-            order_id=order_id,
-            issue_description=issue_description,
-            receipt_data=receipt_data
-        )
+        with IN_FLIGHT.labels("process_refund").track_inprogress():
+            deadline = request_deadline(request)
+            # Streamed to the evidence store; the agent reads it back memory-mapped
+            receipt_data = await store_receipt(receipt, registry.get("evidence_store")) if receipt else None
+            result = await until_disconnect(request, "process_refund", registry.agent().initiate_refund(
+                platform=platform,
+                order_id=order_id,
+                issue_description=issue_description,
+                receipt_data=receipt_data,
+                deadline=deadline
+            ))
+        if result is None:
+            return Response(status_code=499)
         
         return JSONResponse(
             status_code=200,
             content=result
         )
+    except UploadRejected as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"status": "error", "message": str(e)}
+        )
     except Exception as e:
         logger.error(f"Error processing refund request: {str(e)}")
         return JSONResponse(
@@ -63,18 +151,88 @@ async def process_refund(
             }
         )
 
+@app.post("/process-refunds")
+async def process_refunds(
+    request: Request,
+    orders: str = Form(...),
+    receipts: Optional[List[UploadFile]] = File(None)
+):
+    """Several orders at once; orders of the same customer and platform share one request.
+
+    ``orders`` is a JSON list of {platform, order_id, issue_description, email}; each
+    receipt file is matched to its order by file name (``<order_id>.png``).
+    """
+    try:
+        with IN_FLIGHT.labels("process_refunds").track_inprogress():
+            deadline = request_deadline(request)
+            try:
+                pending = [PendingOrder(**order) for order in json.loads(orders)]
+            except (json.JSONDecodeError, TypeError, ValidationError) as e:
+                return JSONResponse(
+                    status_code=400,
+                    content={"status": "error", "message": f"Invalid orders: {str(e)}"}
+                )
+            if not pending or len(pending) > MAX_BULK_ORDERS:
+                return JSONResponse(
+                    status_code=400,
+                    content={"status": "error", "message": f"Send between 1 and {MAX_BULK_ORDERS} orders"}
+                )
+            receipt_data = {}
+            evidence_store = registry.get("evidence_store")
+            for receipt in receipts or []:
+                receipt_data[os.path.splitext(receipt.filename or "")[0]] = await store_receipt(receipt, evidence_store)
+
+            agent = registry.agent()
+            groups = [
+                agent.initiate_consolidated_refund(
+                    platform=platform,
+                    orders=[
+                        {"order_id": o.order_id, "issue_description": o.issue_description,
+                         "receipt_data": receipt_data.get(o.order_id)}
+                        for o in group
+                    ],
+                    deadline=deadline
+                )
+                for (_, platform), group in group_orders(
+                    pending, getattr(registry.get("policy_fetcher"), "platforms", None)
+                ).items()
+            ]
+            results = await until_disconnect(request, "process_refunds", asyncio.gather(*groups))
+        if results is None:
+            return Response(status_code=499)
+        return JSONResponse(status_code=200, content={"requests": results})
+    except UploadRejected as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"status": "error", "message": str(e)}
+        )
+    except Exception as e:
+        logger.error(f"Error processing bulk refund request: {str(e)}")
+        return JSONResponse(
+            status_code=500,
+            content={
+                "status": "error",
+                "message": "Failed to process refund requests"
+            }
+        )
+
 @app.post("/handle-response/{order_id}")
 async def handle_response(
+    request: Request,
     order_id: str,
     platform: str = Form(...),
     response: str = Form(...)
 ):
     try:
-        result = await agent.handle_response(
-            order_id=order_id,
-            response=response,
-            platform=platform
-        )
+        with IN_FLIGHT.labels("handle_response").track_inprogress():
+            result = await until_disconnect(request, "handle_response", registry.agent().handle_response(
+                order_id=order_id,
+                response=response,
+                platform=platform,
+                deadline=request_deadline(request)
+            ))
+        if result is None:
+            return Response(status_code=499)
         return JSONResponse(status_code=200, content=result)
     except Exception as e:
         logger.error(f"Error handling response: {str(e)}")
@@ -86,7 +244,55 @@ async def handle_response(
             }
         )
 
+@app.get("/evidence/{digest}")
+async def evidence(digest: str):
+    """A stored receipt by its SHA-256, e.g. to attach to an escalation"""
+    evidence_store = registry.get("evidence_store")
+    try:
+        path = evidence_store.path(digest)
+        with open(path, "rb") as f:
+            content_type = sniff_type(f.read(16))
+    except (ValueError, FileNotFoundError):
+        return JSONResponse(status_code=404, content={"status": "error", "message": "No such evidence"})
+    return FileResponse(path, media_type=content_type or "application/octet-stream")
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/usage")
+async def usage_summary():
+    """Token usage and LLM latency per platform and call site, most expensive first"""
+    return ledger.summary()
+
+@app.get("/usage/{order_id}")
+async def order_usage(order_id: str):
+    usage = ledger.order_usage(order_id)
+    if usage is None:
+        return JSONResponse(status_code=404, content={"status": "error", "message": "No usage recorded"})
+    return usage
+
+@app.get("/policies/{platform}/history")
+async def policy_history(platform: str):
+    """Versions of a platform's analyzed policy, oldest first, with what each changed"""
+    policy_fetcher = registry.get("policy_fetcher")
+    if not hasattr(policy_fetcher, "history"):
+        return []
+    return [version.model_dump() for version in policy_fetcher.history(platform)]
+
+@app.get("/outcomes")
+async def outcome_summary(platform: Optional[str] = None):
+    """Reply success rate per platform and week, and median time to approval; ``platform`` narrows both"""
+    return {
+        "rows": len(outcomes),
+        "success_rate": outcomes.success_rate(platform=platform),
+        "median_time_to_approval_seconds": outcomes.median_time_to_approval(platform)
+    }
+
 def main():
+    import uvicorn
+
     # Configure logging
     logger.add("data/response_logs/app.log", rotation="500 MB")
     
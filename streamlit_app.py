@@ -1,10 +1,10 @@
 import streamlit as st
 import asyncio
+import hashlib
+import threading
 from tests.test_case_simple_email import SimpleRefundContext, test_simple_email_refund
-from agents.implementations.evidence_processor import OpenAIEvidenceProcessor
+from agents.registry import ComponentRegistry
 import os
-from PIL import Image
-import io
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -60,14 +60,41 @@ def get_api_key():
             
     return api_key
 
-async def process_image(image_bytes, api_key):
-    """Process the uploaded image using OpenAI Evidence Processor"""
-    if not api_key:
-        raise ValueError("OpenAI API Key is required")
-    
-    processor = OpenAIEvidenceProcessor(api_key=api_key)
-    result = await processor.process_receipt(image_bytes)
-    return result
+class BackgroundLoop:
+    """One event loop for the whole process, so cached async clients outlive reruns"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="refund-demo-loop", daemon=True).start()
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+@st.cache_resource
+def get_event_loop() -> BackgroundLoop:
+    return BackgroundLoop()
+
+@st.cache_resource
+def get_registry(api_key: str) -> ComponentRegistry:
+    """Process-wide components; built once per API key instead of on every click"""
+    return ComponentRegistry({"api_key": api_key})
+
+class ReceiptNotRead(Exception):
+    """The processor fell back to empty details; raised so the failed read is not cached"""
+
+    def __init__(self, details: dict):
+        super().__init__("Could not read the order details from this image")
+        self.details = details
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def extract_order_details(upload_digest: str, _image_bytes: bytes, api_key: str):
+    """OCR + extraction memoized per upload content, so reruns don't repeat it"""
+    processor = get_registry(api_key).get("evidence_processor")
+    details = get_event_loop().run(processor.process_receipt(_image_bytes))
+    # st.cache_data does not memoize exceptions, so the next rerun tries again
+    if details.get("processing_error"):
+        raise ReceiptNotRead(details)
+    return details
 
 def main():
     st.title("🔄 Refund Automation Demo")
@@ -90,25 +117,20 @@ def main():
     uploaded_file = st.file_uploader("Upload Order Screenshot", type=['png', 'jpg', 'jpeg'])
     
     if uploaded_file:
-        # Display the uploaded image
-        image = Image.open(uploaded_file)
-        st.image(image, caption="Uploaded Order Screenshot", use_column_width=True)
+        # The raw upload is displayed and processed as-is, without decoding or re-encoding
+        image_bytes = uploaded_file.getvalue()
+        st.image(image_bytes, caption="Uploaded Order Screenshot", use_column_width=True)
         
-        # Process the image if not already processed
-        if not st.session_state.order_details:
-            with st.spinner("Processing order details from image..."):
-                try:
-                    # Convert image to bytes
-                    img_byte_arr = io.BytesIO()
-                    image.save(img_byte_arr, format=image.format)
-                    img_byte_arr = img_byte_arr.getvalue()
-                    
-                    # Process the image
-                    result = asyncio.run(process_image(img_byte_arr, api_key))
-                    st.session_state.order_details = result
-                except Exception as e:
-                    st.error(f"Error processing image: {str(e)}")
-                    st.stop()
+        with st.spinner("Processing order details from image..."):
+            try:
+                digest = hashlib.sha256(image_bytes).hexdigest()
+                st.session_state.order_details = extract_order_details(digest, image_bytes, api_key)
+            except ReceiptNotRead as e:
+                st.warning(f"{str(e)}. Fill them in below, or rerun to try again.")
+                st.session_state.order_details = e.details
+            except Exception as e:
+                st.error(f"Error processing image: {str(e)}")
+                st.stop()
 
     # Create two columns for the layout
     col1, col2 = st.columns([1, 1])
@@ -159,8 +181,11 @@ def main():
             if st.button("Process Refund Request"):
                 with st.spinner("Processing refund request..."):
                     try:
-                        # Run the async function with context
-                        result_context = asyncio.run(test_simple_email_refund(st.session_state.context))
+                        # Run on the shared loop with the cached agent
+                        agent = get_registry(api_key).agent()
+                        result_context = get_event_loop().run(
+                            test_simple_email_refund(st.session_state.context, agent=agent)
+                        )
                         st.session_state.refund_status = "success"
                         st.session_state.result = result_context
                     except Exception as e:
@@ -0,0 +1,15 @@
+import pytest
+
+from agents.refund_agent import RefundAgent
+from fakes import FakeEvidenceProcessor, FakeMessageGenerator, FakePolicyFetcher, FakeResponseAnalyzer
+
+
+@pytest.fixture
+def fake_agent() -> RefundAgent:
+    """RefundAgent wired to in-memory components (no network or LLM)"""
+    return RefundAgent(
+        policy_fetcher=FakePolicyFetcher(),
+        message_generator=FakeMessageGenerator(),
+        response_analyzer=FakeResponseAnalyzer(),
+        evidence_processor=FakeEvidenceProcessor()
+    )
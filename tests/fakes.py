@@ -0,0 +1,93 @@
+"""In-memory implementations of the agent interfaces, the OpenAI client and uploads for offline tests"""
+import asyncio
+import io
+from types import SimpleNamespace
+
+from agents.interfaces import (
+    IPolicyFetcher,
+    IMessageGenerator,
+    IResponseAnalyzer,
+    IEvidenceProcessor,
+    RefundPolicy
+)
+
+
+def make_policy(platform: str = "amazon") -> RefundPolicy:
+    return RefundPolicy(
+        platform=platform,
+        policy_text="Damaged items can be returned within 30 days for a full refund.",
+        eligibility_criteria={"damaged": "Item received damaged"},
+        time_limits={"standard": 30 * 24},
+        required_evidence=["Order number"]
+    )
+
+
+class FakePolicyFetcher(IPolicyFetcher):
+    async def fetch_policy(self, platform: str) -> RefundPolicy:
+        return make_policy(platform)
+
+
+class FakeMessageGenerator(IMessageGenerator):
+    async def generate_request(self, issue_description, policy, order_details, order_id=None) -> str:
+        return f"Refund request: {issue_description}"
+
+    async def generate_escalation(self, previous_response, policy, history) -> str:
+        return "Please escalate to a supervisor."
+
+
+class FakeResponseAnalyzer(IResponseAnalyzer):
+    async def analyze_response(self, response, policy):
+        approved = "approved" in response.lower()
+        return {"approved": approved, "needs_escalation": not approved, "confidence": 0.9}
+
+
+class FakeEvidenceProcessor(IEvidenceProcessor):
+    async def process_receipt(self, receipt_data: bytes):
+        return {"order_id": "123-456-789", "total_amount": 26.99}
+
+    async def validate_evidence(self, evidence, policy) -> bool:
+        return True
+
+
+class FakeOpenAIClient:
+    """Stand-in for ``AsyncOpenAI``: ``client.chat.completions.create(...)``
+
+    ``reply`` is the completion text, or a function of (model, prompt) returning it.
+    Every call is counted and its model and prompt kept; ``delay`` sleeps before
+    answering, and ``error`` is raised instead of answering.
+    """
+
+    def __init__(self, reply="ok", delay: float = 0.0, error: Exception = None, usage=None):
+        self.reply = reply
+        self.delay = delay
+        self.error = error
+        self.usage = usage
+        self.calls = 0
+        self.models = []
+        self.prompts = []
+        self.chat = self.completions = self
+
+    async def create(self, model, messages, temperature=None, **kwargs):
+        self.calls += 1
+        self.models.append(model)
+        self.prompts.append(messages[0]["content"])
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        content = self.reply(model, messages[0]["content"]) if callable(self.reply) else self.reply
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(**self.usage) if self.usage else None
+        )
+
+
+class FakeUpload:
+    """Minimal stand-in for starlette's UploadFile"""
+
+    def __init__(self, data: bytes, size=None):
+        self._file = io.BytesIO(data)
+        self.size = size
+
+    async def read(self, n: int = -1) -> bytes:
+        return self._file.read(n)
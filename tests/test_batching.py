@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+from agents.implementations.response_analyzer import OpenAIResponseAnalyzer
+from benchmarks.mock_llm import canned_completion
+from fakes import FakeOpenAIClient, make_policy
+from utils.batching import MicroBatcher
+from utils.tokens import TokenLedger, usage_scope
+import utils.tokens
+
+
+def test_concurrent_analyses_share_provider_requests(monkeypatch):
+    monkeypatch.setattr(utils.tokens, "ledger", TokenLedger())
+    analyzer = OpenAIResponseAnalyzer(api_key="test", batch_size=8, batch_window=0.05)
+    analyzer.client = FakeOpenAIClient(lambda model, prompt: canned_completion(prompt),
+                                       usage={"prompt_tokens": 100, "completion_tokens": 40})
+    replies = ["We have approved your refund" if i % 2 else "Your claim is denied" for i in range(10)]
+
+    async def analyze(i, reply):
+        with usage_scope(f"ORD-{i}", "amazon"):
+            return await analyzer.analyze_response(reply, make_policy())
+
+    async def scenario():
+        return await asyncio.gather(*(analyze(i, reply) for i, reply in enumerate(replies)))
+
+    results = asyncio.run(scenario())
+    assert analyzer.client.calls == 2  # a full batch of 8, then the 2 stragglers after the window
+    assert [r["approved"] for r in results] == [i % 2 == 1 for i in range(10)]
+    assert all(r["analysis_version"] == "1.0" for r in results)
+
+
+def test_batch_usage_is_split_across_orders():
+    ledger = TokenLedger()
+
+    async def flush(items):
+        ledger.record("analyze_response_batch", 100, 40, 0.1)
+        return items
+
+    batcher = MicroBatcher("test", flush, max_items=2, max_wait=1.0)
+
+    async def submit(order_id):
+        with usage_scope(order_id, "amazon"):
+            return await batcher.submit(order_id)
+
+    async def scenario():
+        return await asyncio.gather(submit("A"), submit("B"))
+
+    assert asyncio.run(scenario()) == ["A", "B"]
+    assert ledger.order_usage("A")["prompt_tokens"] == 50
+    assert ledger.order_usage("B")["completion_tokens"] == 20
+
+
+def test_caller_that_gives_up_is_dropped_from_the_batch():
+    flushed = []
+
+    async def flush(items):
+        flushed.append(list(items))
+        return items
+
+    batcher = MicroBatcher("test", flush, max_items=10, max_wait=0.05)
+
+    async def scenario():
+        quitter = asyncio.ensure_future(batcher.submit("gone"))
+        stayer = asyncio.ensure_future(batcher.submit("kept"))
+        await asyncio.sleep(0)
+        quitter.cancel()
+        return await stayer
+
+    assert asyncio.run(scenario()) == "kept"
+    assert flushed == [["kept"]]
+
+
+def test_short_batch_answer_fails_only_the_missing_items():
+    analyzer = OpenAIResponseAnalyzer(api_key="test", batch_size=4)
+
+    async def partial_chat(call_site, prompt, temperature, **kwargs):
+        return json.dumps([{"id": 0, "approved": True, "needs_escalation": False, "confidence": 0.9}])
+
+    analyzer._chat = partial_chat
+    results = asyncio.run(analyzer._analyze_batch([("ok", make_policy()), ("lost", make_policy())]))
+    assert results[0]["approved"] is True and "id" not in results[0]
+    assert results[1] is None
@@ -0,0 +1,89 @@
+import asyncio
+import os
+
+import pytest
+
+from agents.refund_agent import RefundAgent
+from fakes import (
+    FakeEvidenceProcessor,
+    FakeMessageGenerator,
+    FakePolicyFetcher,
+    FakeResponseAnalyzer,
+    FakeUpload,
+)
+from utils.blobs import BlobStore
+from utils.uploads import UploadRejected, store_receipt
+
+RECEIPT = b"\x89PNG\r\n\x1a\n" + os.urandom(200_000)
+
+
+class RecordingEvidenceProcessor(FakeEvidenceProcessor):
+    def __init__(self):
+        self.received = []
+
+    async def process_receipt(self, receipt_data):
+        self.received.append(bytes(receipt_data))
+        return await super().process_receipt(receipt_data)
+
+
+def _stored_files(root):
+    return sorted(os.path.relpath(os.path.join(d, f), root) for d, _, files in os.walk(root) for f in files)
+
+
+def test_put_is_content_addressed_sharded_and_deduplicated(tmp_path):
+    store = BlobStore(str(tmp_path))
+
+    first = store.put(RECEIPT, "image/png")
+    second = store.put(bytearray(RECEIPT))
+
+    assert first.digest == second.digest and first.size == len(RECEIPT)
+    assert _stored_files(tmp_path) == [os.path.join(first.digest[:2], first.digest[2:4], first.digest)]
+
+
+def test_read_maps_the_stored_bytes(tmp_path):
+    store = BlobStore(str(tmp_path))
+    ref = store.put(RECEIPT)
+
+    view = store.read(ref)
+
+    assert view.readonly
+    assert view.obj.__class__.__name__ == "mmap"
+    assert view == RECEIPT
+    with pytest.raises(FileNotFoundError):
+        store.read("0" * 64)
+    with pytest.raises(ValueError):
+        store.read("../../etc/passwd")
+
+
+def test_rejected_upload_leaves_nothing_behind(tmp_path):
+    store = BlobStore(str(tmp_path))
+
+    with pytest.raises(UploadRejected):
+        asyncio.run(store_receipt(FakeUpload(RECEIPT), store, max_bytes=100_000))
+
+    assert _stored_files(tmp_path) == []
+
+
+def test_agent_reads_receipt_by_reference_and_escalation_cites_it(tmp_path):
+    store = BlobStore(str(tmp_path))
+    processor = RecordingEvidenceProcessor()
+    agent = RefundAgent(
+        policy_fetcher=FakePolicyFetcher(),
+        message_generator=FakeMessageGenerator(),
+        response_analyzer=FakeResponseAnalyzer(),
+        evidence_processor=processor,
+        evidence_store=store
+    )
+
+    async def run():
+        ref = await store_receipt(FakeUpload(RECEIPT), store)
+        await agent.initiate_refund(platform="amazon", order_id="A1",
+                                    issue_description="Item arrived damaged", receipt_data=ref)
+        return ref, await agent.handle_response(order_id="A1", response="We cannot help", platform="amazon")
+
+    ref, result = asyncio.run(run())
+
+    assert ref.content_type == "image/png"
+    assert processor.received == [RECEIPT]
+    assert result["status"] == "escalated"
+    assert result["evidence"] == [ref.model_dump()]
@@ -25,33 +25,34 @@ class SimpleRefundContext(BaseModel):
     refund_status: str = "pending"
     issue_description: Optional[str] = None
 
-async def test_simple_email_refund(context: SimpleRefundContext):
+async def test_simple_email_refund(context: SimpleRefundContext, agent: Optional[RefundAgent] = None):
     """Test refund workflow for a simple email-based return system"""
     
-    # Get API key from environment
-    api_key = os.getenv('OPENAI_API_KEY')
-    if not api_key:
-        raise ValueError("OpenAI API Key not found in environment variables")
-    
     # Generate a conversation ID
     conversation_id = uuid.uuid4().hex[:16]
     
     try:
         print("\n=== Starting Simple Email Refund Test Case ===")
         
-        # Initialize components
-        policy_fetcher = OpenAIPolicyFetcher(api_key=api_key)
-        message_generator = OpenAIMessageGenerator(api_key=api_key)
-        response_analyzer = OpenAIResponseAnalyzer(api_key=api_key)
-        evidence_processor = OpenAIEvidenceProcessor(api_key=api_key)
-
-        # Initialize the agent
-        agent = RefundAgent(
-            policy_fetcher=policy_fetcher,
-            message_generator=message_generator,
-            response_analyzer=response_analyzer,
-            evidence_processor=evidence_processor
-        )
+        if agent is None:
+            # Get API key from environment
+            api_key = os.getenv('OPENAI_API_KEY')
+            if not api_key:
+                raise ValueError("OpenAI API Key not found in environment variables")
+
+            # Initialize components
+            policy_fetcher = OpenAIPolicyFetcher(api_key=api_key)
+            message_generator = OpenAIMessageGenerator(api_key=api_key)
+            response_analyzer = OpenAIResponseAnalyzer(api_key=api_key)
+            evidence_processor = OpenAIEvidenceProcessor(api_key=api_key)
+
+            # Initialize the agent
+            agent = RefundAgent(
+                policy_fetcher=policy_fetcher,
+                message_generator=message_generator,
+                response_analyzer=response_analyzer,
+                evidence_processor=evidence_processor
+            )
 
         print("\n1. Preparing refund request...")
         # Prepare issue description if not provided
@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import pytest
+
+import utils.cassette as cassette_module
+from agents.implementations.response_analyzer import OpenAIResponseAnalyzer
+from fakes import FakeOpenAIClient, make_policy
+from utils.cassette import Cassette, CassetteMiss
+
+
+ANALYSIS = ('{"approved": true, "needs_escalation": false, "key_points": [], '
+            '"policy_violations": [], "suggested_action": "None", "confidence": 0.95}')
+
+
+def _counting_client(delay: float = 0.0) -> FakeOpenAIClient:
+    """Numbers its replies"""
+    client = FakeOpenAIClient(lambda model, prompt: f"reply {client.calls}", delay=delay,
+                              usage={"prompt_tokens": 10, "completion_tokens": 3})
+    return client
+
+
+def _messages(text):
+    return [{"role": "user", "content": text}]
+
+
+def test_replay_returns_recorded_replies_in_order(tmp_path):
+    path = str(tmp_path / "calls.jsonl.gz")
+    recorder = Cassette(path, mode="record", client=_counting_client())
+
+    async def record():
+        for _ in range(2):
+            await recorder.create("gpt-4", _messages("Evidence at 2025-03-09T10:15:00.123456"), 0.3)
+        await recorder.create("gpt-4", _messages("Something else"), 0.3)
+
+    asyncio.run(record())
+    recorder.save()
+    player = Cassette(path)
+
+    async def replay():
+        # A different timestamp in the prompt still matches
+        same = [await player.create("gpt-4", _messages("Evidence at 2026-10-19T08:00:00.5"), 0.3)
+                for _ in range(3)]
+        return same, await player.create("gpt-4", _messages("Something else"), 0.3)
+
+    same, other = asyncio.run(replay())
+
+    assert len(player) == 3
+    assert [r.choices[0].message.content for r in same] == ["reply 1", "reply 2", "reply 2"]
+    assert other.choices[0].message.content == "reply 3"
+    assert other.usage.completion_tokens == 3
+
+
+def test_unrecorded_request_misses(tmp_path):
+    path = str(tmp_path / "calls.jsonl.gz")
+    recorder = Cassette(path, mode="record", client=_counting_client())
+    asyncio.run(recorder.create("gpt-4", _messages("Known"), 0.3))
+    recorder.save()
+
+    with pytest.raises(CassetteMiss):
+        asyncio.run(Cassette(path).create("gpt-4o-mini", _messages("Known"), 0.3))
+
+
+def test_replay_can_reproduce_recorded_latency(tmp_path):
+    path = str(tmp_path / "calls.jsonl.gz")
+    recorder = Cassette(path, mode="record", client=_counting_client(delay=0.1))
+    asyncio.run(recorder.create("gpt-4", _messages("Slow"), 0.3))
+    recorder.save()
+
+    def timed(factor):
+        started = time.perf_counter()
+        asyncio.run(Cassette(path, latency_factor=factor).create("gpt-4", _messages("Slow"), 0.3))
+        return time.perf_counter() - started
+
+    assert timed(0) < 0.05
+    assert timed(0.5) >= 0.05
+
+
+def test_components_replay_from_env_cassette(tmp_path, monkeypatch):
+    path = str(tmp_path / "calls.jsonl.gz")
+    monkeypatch.setattr(cassette_module, "_cassette", None)
+    monkeypatch.setenv("LLM_CASSETTE", path)
+    monkeypatch.setenv("LLM_CASSETTE_MODE", "record")
+    analyzer = OpenAIResponseAnalyzer(api_key="sk-test")
+    monkeypatch.setattr(analyzer, "_openai_client", lambda: FakeOpenAIClient(ANALYSIS))
+    recorded = asyncio.run(analyzer.analyze_response("Your refund has been approved", make_policy()))
+    cassette_module.save_cassette()
+
+    monkeypatch.setattr(cassette_module, "_cassette", None)
+    monkeypatch.setenv("LLM_CASSETTE_MODE", "replay")
+    replaying = OpenAIResponseAnalyzer(api_key="sk-test")
+    replayed = asyncio.run(replaying.analyze_response("Your refund has been approved", make_policy()))
+
+    assert isinstance(replaying.client, Cassette)
+    assert replayed["approved"] is True
+    assert replayed["key_points"] == recorded["key_points"]
+
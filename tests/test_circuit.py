@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+import pytest
+
+from agents.implementations.openai_message_gen import OpenAIMessageGenerator
+from agents.implementations.response_analyzer import OpenAIResponseAnalyzer
+from fakes import FakeOpenAIClient, make_policy
+from utils import circuit
+from utils.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, CircuitTimeout
+
+
+async def _ok():
+    return "ok"
+
+
+async def _fail():
+    raise RuntimeError("provider error")
+
+
+async def _slow(seconds: float):
+    await asyncio.sleep(seconds)
+    return "late"
+
+
+def test_breaker_opens_on_error_rate_and_rejects_without_calling():
+    breaker = CircuitBreaker("test", latency_slo=1.0, min_calls=4, failure_rate=0.5)
+
+    async def scenario():
+        for work in (_ok, _fail, _ok, _fail):
+            try:
+                await breaker.call(work())
+            except RuntimeError:
+                pass
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpen):
+            await breaker.call(_ok())
+
+    asyncio.run(scenario())
+
+
+def test_latency_slo_breach_counts_as_failure_and_timeout_cuts_calls():
+    breaker = CircuitBreaker("slow", latency_slo=0.01, timeout=0.05, min_calls=2, failure_rate=1.0)
+
+    async def scenario():
+        assert await breaker.call(_slow(0.02)) == "late"  # answered, but over the SLO
+        started = time.monotonic()
+        with pytest.raises(CircuitTimeout):
+            await breaker.call(_slow(1.0))
+        assert time.monotonic() - started < 0.5
+
+    asyncio.run(scenario())
+    assert breaker.state == OPEN
+
+
+def test_breaker_timeout_is_not_reported_as_the_deadline():
+    from utils.deadlines import WORK_SKIPPED, Deadline, deadline_scope, within_deadline
+
+    breaker = CircuitBreaker("cutoff", latency_slo=0.01, timeout=0.05)
+    skipped = WORK_SKIPPED.labels("cutoff", "timeout")
+    before = skipped._value.get()
+
+    async def scenario():
+        with deadline_scope(Deadline(30)):
+            await within_deadline("cutoff", breaker.call(_slow(1.0)))
+
+    with pytest.raises(CircuitTimeout):
+        asyncio.run(scenario())
+    assert skipped._value.get() == before
+
+
+def test_half_open_allows_one_probe_then_closes():
+    breaker = CircuitBreaker("probe", latency_slo=1.0, min_calls=1, open_seconds=0.0)
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await breaker.call(_fail())
+        assert breaker.allow() and breaker.state == HALF_OPEN
+        assert not breaker.allow()  # probe already in flight
+        breaker.record(True)
+        assert breaker.state == CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_brownout_falls_back_without_waiting_on_the_provider(monkeypatch):
+    monkeypatch.setattr(circuit, "_breakers", {})
+    monkeypatch.setitem(circuit.LLM_LATENCY_SLOS, "analyze_response", 0.05)
+
+    analyzer = OpenAIResponseAnalyzer(api_key="test")
+    analyzer.client = FakeOpenAIClient(delay=5)
+
+    async def scenario():
+        latencies = []
+        for _ in range(20):
+            started = time.monotonic()
+            analysis = await analyzer.analyze_response("Your request is under review", make_policy())
+            latencies.append(time.monotonic() - started)
+            assert "approved" in analysis
+        return latencies
+
+    latencies = asyncio.run(scenario())
+    assert analyzer.client.calls == 5  # min_calls failures trip it; the rest never reach the provider
+    assert max(latencies) < 0.5
+    assert sum(latencies[5:]) < 0.1
+
+
+def test_open_breaker_on_generation_still_sends_a_request(monkeypatch, fake_agent):
+    monkeypatch.setattr(circuit, "_breakers", {})
+    for call_site in ("generate_request", "generate_escalation"):
+        breaker = circuit.llm_breaker(call_site)
+        for _ in range(breaker.min_calls):
+            breaker.record(False)
+        assert breaker.state == OPEN
+
+    generator = OpenAIMessageGenerator(api_key="test")
+    generator.client = FakeOpenAIClient(error=AssertionError("an open breaker must not call the provider"))
+    fake_agent.message_generator = generator
+
+    async def scenario():
+        # No template category matches, so this would normally be written by the LLM
+        initiated = await fake_agent.initiate_refund("amazon", "ORD-9", "Please call me about this order")
+        escalated = await fake_agent.handle_response("ORD-9", "We cannot help", "amazon")
+        return initiated, escalated
+
+    initiated, escalated = asyncio.run(scenario())
+    assert initiated["status"] == "initiated" and "order ORD-9" in initiated["message"]
+    assert escalated["status"] == "escalated" and "supervisor" in escalated["message"]
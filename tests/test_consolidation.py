@@ -0,0 +1,105 @@
+import asyncio
+
+from agents.consolidation import PendingOrder, group_orders
+from agents.implementations.message_templates import render_consolidated
+from agents.implementations.openai_message_gen import OpenAIMessageGenerator
+from agents.platforms import PlatformRegistry
+from fakes import FakeEvidenceProcessor, FakeMessageGenerator, make_policy
+
+ORDERS = [
+    {"order_id": "111", "issue_description": "Item arrived damaged",
+     "order_details": {"date": "2024-03-04", "total_amount": 26.99}},
+    {"order_id": "222", "issue_description": "Package never arrived",
+     "order_details": {"items": [{"name": "Desk Lamp"}]}},
+]
+
+
+class RejectingEvidenceProcessor(FakeEvidenceProcessor):
+    async def validate_evidence(self, evidence, policy) -> bool:
+        return False
+
+
+def test_orders_grouped_by_customer_and_platform():
+    groups = group_orders([
+        PendingOrder(platform="amazon", order_id="1", issue_description="x", email="Ann@example.com"),
+        PendingOrder(platform="amazon", order_id="2", issue_description="y", email="ann@example.com"),
+        PendingOrder(platform="ubereats", order_id="3", issue_description="z", email="ann@example.com"),
+        PendingOrder(platform="amazon", order_id="4", issue_description="w"),
+    ])
+    assert [[o.order_id for o in group] for group in groups.values()] == [["1", "2"], ["3"], ["4"]]
+
+
+def test_platform_spellings_of_one_customer_share_a_group():
+    orders = [
+        PendingOrder(platform="Amazon", order_id="1", issue_description="x", email="ann@example.com"),
+        PendingOrder(platform="amazon.com", order_id="2", issue_description="y", email="ann@example.com"),
+        PendingOrder(platform="amazon", order_id="3", issue_description="z", email="ann@example.com"),
+    ]
+
+    groups = group_orders(orders, PlatformRegistry.from_file())
+
+    assert list(groups) == [("ann@example.com", "amazon")]
+    assert [o.order_id for o in groups[("ann@example.com", "amazon")]] == ["1", "2", "3"]
+    # Without a registry, case and spacing still do not split a customer's orders
+    assert len(group_orders(orders[:1] + orders[2:])) == 1
+
+
+def test_consolidated_request_is_rendered_without_llm():
+    generator = OpenAIMessageGenerator(api_key="test")
+    generator.client = None  # any LLM call would fail
+
+    message = asyncio.run(generator.generate_consolidated_request(ORDERS, make_policy()))
+
+    assert "Order 111: Item arrived damaged." in message
+    assert "Placed on 2024-03-04 for $26.99." in message
+    assert "Order 222: Package never arrived." in message and "Desk Lamp" in message
+    assert "Item received damaged." in message
+    assert "full refunds" in message and "None" not in message
+
+
+def test_unclassified_issue_is_not_templated():
+    orders = ORDERS + [{"order_id": "333", "issue_description": "Please call me", "order_details": {}}]
+    assert render_consolidated("amazon", orders, {}) is None
+
+
+def test_default_interface_folds_orders_into_one_request():
+    message = asyncio.run(FakeMessageGenerator().generate_consolidated_request(ORDERS, make_policy()))
+    assert message == "Refund request: Order 111: Item arrived damaged; Order 222: Package never arrived"
+
+
+def test_reply_resolves_every_order_in_the_request(fake_agent):
+    orders = [{"order_id": order["order_id"], "issue_description": order["issue_description"]}
+              for order in ORDERS]
+    result = asyncio.run(fake_agent.initiate_consolidated_refund(platform="amazon", orders=orders))
+    assert result["status"] == "initiated"
+    assert result["tracking_ids"] == ["111", "222"]
+
+    reply = asyncio.run(fake_agent.handle_response("222", "Your refund is approved", "amazon"))
+
+    assert reply["status"] == "success"
+    assert reply["tracking_ids"] == ["111", "222"]
+    assert fake_agent.conversation_history["111"][-1] == "Your refund is approved"
+
+
+def test_orders_failing_validation_are_excluded(fake_agent):
+    fake_agent.evidence_processor = RejectingEvidenceProcessor()
+    orders = [
+        {"order_id": "111", "issue_description": "Item arrived damaged", "receipt_data": b"receipt"},
+        {"order_id": "222", "issue_description": "Package never arrived"},
+    ]
+    result = asyncio.run(fake_agent.initiate_consolidated_refund(platform="amazon", orders=orders))
+    assert result["tracking_ids"] == ["222"]
+    assert result["excluded"] == ["111"]
+    assert "111" not in fake_agent.conversation_history
+
+
+def test_malformed_bulk_orders_are_rejected_with_400():
+    import main
+
+    class FormRequest:
+        headers = {}
+
+    for orders in ("not json", "5", '{"order_id": "1"}', '[{"platform": "amazon"}]', '["111"]'):
+        response = asyncio.run(main.process_refunds(FormRequest(), orders=orders, receipts=None))
+        assert response.status_code == 400, orders
+        assert b"Invalid orders" in response.body
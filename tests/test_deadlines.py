@@ -0,0 +1,108 @@
+import asyncio
+import time
+
+import pytest
+
+from agents.implementations.response_analyzer import OpenAIResponseAnalyzer
+from fakes import FakeMessageGenerator, FakeOpenAIClient, make_policy
+from utils.deadlines import (
+    WORK_SKIPPED,
+    Deadline,
+    DeadlineExceeded,
+    current_deadline,
+    deadline_scope,
+    ensure_budget,
+    within_deadline,
+)
+
+
+def _count(stage: str, reason: str) -> float:
+    return WORK_SKIPPED.labels(stage, reason)._value.get()
+
+
+def test_ensure_budget_only_applies_inside_a_deadline():
+    ensure_budget("analyze_response")
+    before = _count("analyze_response", "deadline")
+    with deadline_scope(Deadline(0.5)):
+        with pytest.raises(DeadlineExceeded):
+            ensure_budget("analyze_response")
+    assert _count("analyze_response", "deadline") == before + 1
+
+
+def test_llm_stage_is_skipped_when_budget_is_short():
+    analyzer = OpenAIResponseAnalyzer(api_key="test")
+    analyzer.client = FakeOpenAIClient(delay=10)
+
+    async def scenario():
+        with deadline_scope(Deadline(0.5)):
+            return await analyzer.analyze_response("We have approved your refund", make_policy())
+
+    analysis = asyncio.run(scenario())
+    assert analyzer.client.calls == 0
+    assert "approved" in analysis  # local fallback answer
+
+
+def test_in_flight_call_is_cut_off_at_the_deadline():
+    analyzer = OpenAIResponseAnalyzer(api_key="test")
+    analyzer.client = FakeOpenAIClient(delay=10)
+    before = _count("analyze_response", "timeout")
+
+    async def scenario():
+        with deadline_scope(Deadline(1.7)):
+            return await analyzer.analyze_response("Your request is under review", make_policy())
+
+    started = time.perf_counter()
+    asyncio.run(scenario())
+    assert time.perf_counter() - started < 3
+    assert analyzer.client.calls == 1
+    assert _count("analyze_response", "timeout") == before + 1
+
+
+def test_agent_runs_components_under_the_given_deadline(fake_agent):
+    seen = []
+
+    class DeadlineAwareGenerator(FakeMessageGenerator):
+        async def generate_request(self, issue_description, policy, order_details, order_id=None) -> str:
+            seen.append(current_deadline())
+            return "request"
+
+    fake_agent.message_generator = DeadlineAwareGenerator()
+    deadline = Deadline(30)
+    asyncio.run(fake_agent.initiate_refund("amazon", "ORD-1", "Item arrived damaged", deadline=deadline))
+    assert seen == [deadline]
+    assert current_deadline() is None
+
+
+def test_client_disconnect_cancels_the_work(monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "DISCONNECT_POLL_SECONDS", 0.01)
+    cancelled = []
+
+    class GoneRequest:
+        async def is_disconnected(self) -> bool:
+            return True
+
+    async def work():
+        try:
+            await within_deadline("analyze_response", asyncio.sleep(10))
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    before = _count("analyze_response", "cancelled")
+    result = asyncio.run(main.until_disconnect(GoneRequest(), "process_refund", work()))
+    assert result is None
+    assert cancelled == [True]
+    assert _count("analyze_response", "cancelled") == before + 1
+
+
+@pytest.mark.parametrize("header", ["nan", "inf", "-inf", "soon"])
+def test_unusable_timeout_header_gets_the_default_deadline(header):
+    import main
+
+    class TimeoutRequest:
+        headers = {"x-request-timeout": header}
+
+    remaining = main.request_deadline(TimeoutRequest()).remaining()
+    assert main.DEFAULT_REQUEST_TIMEOUT - 1 < remaining <= main.DEFAULT_REQUEST_TIMEOUT
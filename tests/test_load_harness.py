@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+from agents.implementations.response_analyzer import OpenAIResponseAnalyzer
+from benchmarks.load_test import run_load_test, _percentile
+from benchmarks.mock_llm import canned_completion
+from benchmarks.replay import APPROVAL, REJECTION
+from fakes import FakeOpenAIClient, make_policy
+
+
+def test_mock_llm_recognises_call_sites():
+    """Each component prompt gets a parseable canned answer"""
+    policy = json.loads(canned_completion(
+        "Analyze these sections of the amazon refund policy and extract:\n[s1] Returns\n[s2] Shipping"
+    ))
+    assert "time_limits" in policy["s1"] and set(policy) == {"s1", "s2"}
+
+    analysis = json.loads(canned_completion(
+        "Analyze this response to a refund request\nResponse: We have approved your refund"
+    ))
+    assert analysis["approved"] is True
+
+
+def test_mock_llm_judges_only_the_merchant_reply():
+    analyzer = OpenAIResponseAnalyzer(api_key="sk-test")
+    analyzer.client = FakeOpenAIClient(lambda model, prompt: canned_completion(prompt))
+
+    async def run():
+        return [await analyzer.analyze_response(reply, make_policy()) for reply in (REJECTION, APPROVAL)]
+
+    rejected, approved = asyncio.run(run())
+
+    assert rejected["approved"] is False and rejected["needs_escalation"] is True
+    assert approved["approved"] is True
+
+
+def test_percentile_nearest_rank():
+    values = sorted(float(v) for v in range(1, 101))
+    assert _percentile(values, 50) == 50.0
+    assert _percentile(values, 99) == 99.0
+    assert _percentile([], 99) == 0.0
+
+
+def test_load_test_smoke():
+    """A short run against the mocks completes without errors"""
+    results = run_load_test(levels=[2], duration=1.0, llm_latency=0.0, policy_latency=0.0)
+
+    assert len(results) == 1
+    assert results[0].requests > 0
+    assert results[0].error_rate == 0.0
+    assert results[0].p50_ms <= results[0].p99_ms
@@ -0,0 +1,155 @@
+import asyncio
+import mailbox
+import os
+from email.message import EmailMessage
+
+import pytest
+
+from agents.mail_ingest import MailIngestor, platform_for_sender, reply_text
+
+
+def _reply(message_id, body, subject="Re: Refund request", sender="support@amazon.com", in_reply_to=None):
+    message = EmailMessage()
+    message["From"] = sender
+    message["Subject"] = subject
+    message["Message-ID"] = message_id
+    if in_reply_to:
+        message["In-Reply-To"] = in_reply_to
+    message.set_content(body)
+    return message
+
+
+def _start(agent, *order_ids):
+    for order_id in order_ids:
+        asyncio.run(agent.initiate_refund("amazon", order_id, "Item arrived damaged"))
+
+
+def test_reply_text_drops_quoted_history():
+    message = _reply("<1@amazon.com>", "Your refund is approved.\n\nOn Mon, Jane wrote:\n> Please refund")
+    assert reply_text(message) == "Your refund is approved."
+    assert platform_for_sender("Amazon <returns@mail.amazon.co.uk>") == "amazon"
+    assert platform_for_sender("someone@example.com") is None
+
+
+def test_maildir_replies_are_threaded_deduped_and_checkpointed(tmp_path, fake_agent):
+    _start(fake_agent, "111-222", "333-444")
+    box = mailbox.Maildir(str(tmp_path / "inbox"))
+    box.add(_reply("<a@amazon.com>", "Order 111-222: your refund is approved."))
+    box.add(_reply("<a@amazon.com>", "Order 111-222: your refund is approved."))
+    box.add(_reply("<b@amazon.com>", "We cannot help with order 333-444."))
+    box.add(_reply("<c@amazon.com>", "Following up: refund approved after all.", in_reply_to="<b@amazon.com>"))
+    box.add(_reply("<d@amazon.com>", "Thanks for shopping with us."))
+
+    ingestor = MailIngestor(fake_agent, str(tmp_path / "inbox"))
+    counts = asyncio.run(ingestor.ingest())
+
+    assert counts == {"read": 5, "handled": 3, "duplicate": 1, "unmatched": 1}
+    assert fake_agent.conversation_history["333-444"][1:3] == [
+        "We cannot help with order 333-444.",
+        "Please escalate to a supervisor.",
+    ]
+    assert fake_agent.conversation_history["333-444"][3] == "Following up: refund approved after all."
+    assert os.listdir(tmp_path / "inbox" / "new") == []
+    assert len(os.listdir(tmp_path / "inbox" / ".unmatched" / "new")) == 1
+
+    # A restart picks up where the checkpoint left off
+    box.add(_reply("<a@amazon.com>", "Order 111-222: your refund is approved."))
+    restarted = MailIngestor(fake_agent, str(tmp_path / "inbox"))
+    assert asyncio.run(restarted.ingest()) == {"read": 1, "duplicate": 1}
+
+
+def test_mbox_cursor_survives_restart(tmp_path, fake_agent):
+    _start(fake_agent, "555-666")
+    path = str(tmp_path / "replies.mbox")
+    box = mailbox.mbox(path)
+    for i in range(3):
+        box.add(_reply(f"<{i}@amazon.com>", f"Update {i} on order 555-666."))
+    box.flush()
+
+    ingestor = MailIngestor(fake_agent, path, batch_size=2)
+    assert asyncio.run(ingestor.ingest())["handled"] == 2
+    assert asyncio.run(MailIngestor(fake_agent, path).ingest()) == {"read": 1, "handled": 1}
+    assert asyncio.run(MailIngestor(fake_agent, path).ingest()) == {"read": 0}
+    assert len(fake_agent.conversation_history["555-666"]) == 1 + 3 * 2
+
+
+def test_mbox_is_read_from_the_saved_offset(tmp_path, fake_agent):
+    _start(fake_agent, "555-666")
+    path = str(tmp_path / "replies.mbox")
+    box = mailbox.mbox(path)
+    box.add(_reply("<0@amazon.com>", "Update 0 on order 555-666."))
+    box.flush()
+    ingestor = MailIngestor(fake_agent, path)
+    asyncio.run(ingestor.ingest())
+    assert ingestor.mbox_offset == os.path.getsize(path)
+
+    # Earlier messages are never parsed again, even if they no longer are valid mail
+    with open(path, "r+b") as f:
+        f.write(b"X" * 5)
+    box.add(_reply("<1@amazon.com>", "Update 1 on order 555-666."))
+    box.add(_reply("<2@amazon.com>", "Nothing to do with any order."))
+    box.flush()
+
+    assert asyncio.run(MailIngestor(fake_agent, path).ingest()) == {"read": 2, "handled": 1, "unmatched": 1}
+    with open(path + ".unmatched", "rb") as f:
+        assert b"Nothing to do with any order." in f.read()
+
+
+def _flaky(agent, failures):
+    """Make the agent's handle_response raise for its first ``failures`` calls"""
+    handle_response = agent.handle_response
+    calls = []
+
+    async def flaky(**kwargs):
+        calls.append(kwargs["order_id"])
+        if len(calls) <= failures:
+            raise RuntimeError("provider down")
+        return await handle_response(**kwargs)
+
+    agent.handle_response = flaky
+    return calls
+
+
+@pytest.mark.parametrize("kind", ["maildir", "mbox"])
+def test_failed_reply_is_retried_then_parked(tmp_path, fake_agent, monkeypatch, kind):
+    monkeypatch.setattr("agents.mail_ingest.MAX_ATTEMPTS", 3)
+    _start(fake_agent, "777-888", "999-000")
+    path = str(tmp_path / ("inbox" if kind == "maildir" else "replies.mbox"))
+    box = mailbox.Maildir(path) if kind == "maildir" else mailbox.mbox(path)
+    box.add(_reply("<r@amazon.com>", "Your refund for order 777-888 is approved."))
+    box.flush()
+    calls = _flaky(fake_agent, failures=1)
+
+    assert asyncio.run(MailIngestor(fake_agent, path).ingest()) == {"read": 1, "retry": 1}
+    # The retry survives a restart and is not mistaken for a duplicate
+    assert asyncio.run(MailIngestor(fake_agent, path).ingest()) == {"read": 1, "handled": 1}
+    assert calls == ["777-888", "777-888"]
+
+    box.add(_reply("<s@amazon.com>", "We cannot refund order 999-000."))
+    box.flush()
+    _flaky(fake_agent, failures=10)
+    ingestor = MailIngestor(fake_agent, path)
+    counts = [asyncio.run(ingestor.ingest()) for _ in range(4)]
+
+    assert counts == [{"read": 1, "retry": 1}, {"read": 1, "retry": 1}, {"read": 1, "failed": 1}, {"read": 0}]
+    if kind == "maildir":
+        assert len(os.listdir(os.path.join(path, ".failed", "new"))) == 1
+    else:
+        with open(path + ".failed", "rb") as f:
+            assert b"We cannot refund order 999-000." in f.read()
+
+
+def test_replies_to_one_order_keep_their_order_under_concurrency(tmp_path, fake_agent):
+    _start(fake_agent, *[f"900-{i}" for i in range(20)])
+    box = mailbox.Maildir(str(tmp_path / "inbox"))
+    for i in range(20):
+        for n in range(3):
+            box.add(_reply(f"<{i}-{n}@amazon.com>", f"Reply {n} for order 900-{i}."))
+
+    counts = asyncio.run(MailIngestor(fake_agent, str(tmp_path / "inbox"), concurrency=4).ingest())
+
+    assert counts["handled"] == 60
+    history = fake_agent.conversation_history["900-7"]
+    assert [line for line in history if line.startswith("Reply")] == [
+        f"Reply {n} for order 900-7." for n in range(3)
+    ]
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from agents.implementations.message_templates import MessageTemplate, classify_issue, find_template
+from agents.implementations.openai_message_gen import OpenAIMessageGenerator
+from fakes import FakeOpenAIClient, make_policy
+
+ORDER = {
+    "order_id": "123-456-789",
+    "date": "2024-03-04",
+    "total_amount": 26.99,
+    "merchant": "Amazon.com",
+    "items": [{"name": "Ceramic Coffee Mug", "price": 24.99}],
+}
+
+
+def _generator(personalize: bool = False):
+    generator = OpenAIMessageGenerator(api_key="test", personalize=personalize)
+    generator.client = FakeOpenAIClient("The mug was in pieces when I opened the box.")
+    return generator
+
+
+def test_issue_categories():
+    assert classify_issue("Item arrived damaged") == "damaged"
+    assert classify_issue("My package never arrived") == "not_received"
+    assert classify_issue("I was sent the wrong size") == "wrong_item"
+    assert classify_issue("Please call me") is None
+
+
+def test_platform_template_takes_precedence_over_generic():
+    _, ubereats = find_template("ubereats", "Order never arrived")
+    _, amazon = find_template("amazon", "Order never arrived")
+    assert ubereats is not amazon
+
+
+def test_common_request_is_rendered_without_llm():
+    generator = _generator()
+    policy = make_policy()
+    policy.eligibility_criteria = {"damaged_items": "Items damaged in transit are refundable in full."}
+
+    message = asyncio.run(generator.generate_request("Item arrived damaged.", policy, ORDER))
+
+    assert generator.client.prompts == []
+    assert "order 123-456-789" in message
+    assert "$26.99" in message and "Ceramic Coffee Mug" in message
+    assert "Items damaged in transit are refundable in full." in message
+
+
+def test_missing_order_fields_drop_their_lines():
+    generator = _generator()
+    # No receipt: only the claimed order ID is known
+    message = asyncio.run(generator.generate_request("Item arrived damaged", make_policy(), {}, order_id="A-1"))
+    assert generator.client.prompts == []
+    assert "order A-1" in message
+    assert "{" not in message and "None" not in message
+    assert "Details: Item arrived damaged." in message
+
+
+def test_request_without_order_id_is_not_templated():
+    generator = _generator()
+    asyncio.run(generator.generate_request("Item arrived damaged", make_policy(), {}))
+    assert "Generate a professional refund request" in generator.client.prompts[0]
+
+
+def test_personalization_adds_one_short_llm_note():
+    generator = _generator(personalize=True)
+    message = asyncio.run(generator.generate_request("Item arrived damaged", make_policy(), ORDER))
+    assert len(generator.client.prompts) == 1
+    assert "The mug was in pieces" in message
+
+
+def test_unmatched_issue_falls_back_to_llm():
+    generator = _generator()
+    asyncio.run(generator.generate_request("Please call me", make_policy(), ORDER))
+    assert "Generate a professional refund request" in generator.client.prompts[0]
+
+
+def test_unknown_template_field_is_rejected():
+    with pytest.raises(ValueError):
+        MessageTemplate("Hello {customer_name}")
@@ -0,0 +1,44 @@
+import asyncio
+
+from prometheus_client import REGISTRY
+
+from agents.implementations.openai_base import OpenAIComponent
+from agents.implementations.response_analyzer import OpenAIResponseAnalyzer
+from fakes import FakeOpenAIClient
+
+
+def _sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_workflow_latency_is_labelled_by_status(fake_agent):
+    labels = {"operation": "initiate_refund", "status": "initiated"}
+    before = _sample("refund_workflow_duration_seconds_count", labels)
+
+    result = asyncio.run(fake_agent.initiate_refund("amazon", "123", "Item damaged"))
+
+    assert result["status"] == "initiated"
+    assert _sample("refund_workflow_duration_seconds_count", labels) == before + 1
+
+
+def test_chat_records_latency_and_tokens():
+    component = OpenAIComponent(api_key="sk-test")
+    component.client = FakeOpenAIClient(usage={"prompt_tokens": 12, "completion_tokens": 3})
+    prompt_labels = {"call_site": "unit_test", "kind": "prompt"}
+    before = _sample("refund_llm_tokens_total", prompt_labels)
+
+    assert asyncio.run(component._chat("unit_test", "hello", temperature=0.0)) == "ok"
+
+    assert _sample("refund_llm_tokens_total", prompt_labels) == before + 12
+    assert _sample("refund_llm_call_duration_seconds_count", {"call_site": "unit_test"}) >= 1
+
+
+def test_fallback_is_counted():
+    analyzer = OpenAIResponseAnalyzer(api_key="sk-test")
+    labels = {"fallback": "response_analysis"}
+    before = _sample("refund_fallbacks_total", labels)
+
+    analysis = analyzer._get_fallback_analysis("Your refund was approved")
+
+    assert analysis["approved"] is True
+    assert _sample("refund_fallbacks_total", labels) == before + 1
@@ -0,0 +1,42 @@
+import asyncio
+import json
+
+from agents.implementations.response_analyzer import OpenAIResponseAnalyzer
+from fakes import FakeOpenAIClient, make_policy
+from utils.model_routing import MODEL_TIERS, route_model
+
+
+def test_short_classification_goes_small_and_generation_large():
+    assert route_model("analyze_response", 300) == ("small", MODEL_TIERS["small"])
+    assert route_model("analyze_response", 5000) == ("large", MODEL_TIERS["large"])
+    assert route_model("generate_request", 300) == ("large", MODEL_TIERS["large"])
+
+
+def test_route_can_be_pinned(monkeypatch):
+    monkeypatch.setenv("MODEL_ROUTE_ANALYZE_RESPONSE", "large")
+    assert route_model("analyze_response", 300)[0] == "large"
+
+
+def _tiered_client(confidence_by_model):
+    """Answers with a per-model confidence"""
+    return FakeOpenAIClient(lambda model, prompt: json.dumps(
+        {"approved": True, "needs_escalation": False, "confidence": confidence_by_model[model]}
+    ))
+
+
+def _analyze(client):
+    analyzer = OpenAIResponseAnalyzer(api_key="test")
+    analyzer.client = client
+    return asyncio.run(analyzer.analyze_response("We have approved your refund", make_policy()))
+
+
+def test_confident_small_model_answer_is_kept():
+    client = _tiered_client({MODEL_TIERS["small"]: 0.95, MODEL_TIERS["large"]: 0.99})
+    assert _analyze(client)["confidence"] == 0.95
+    assert client.models == [MODEL_TIERS["small"]]
+
+
+def test_low_confidence_answer_is_upgraded_to_large_model():
+    client = _tiered_client({MODEL_TIERS["small"]: 0.4, MODEL_TIERS["large"]: 0.9})
+    assert _analyze(client)["confidence"] == 0.9
+    assert client.models == [MODEL_TIERS["small"], MODEL_TIERS["large"]]
@@ -0,0 +1,122 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from utils.outcomes import OutcomeStore, outcomes
+
+MONDAY = datetime(2024, 3, 4, tzinfo=timezone.utc).timestamp()
+DAY = 24 * 3600
+
+
+def _store(path=None):
+    store = OutcomeStore(path)
+    for day, platform, status, since_start in [
+        (0, "amazon", "success", 3600.0),
+        (1, "amazon", "rejected", None),
+        (2, "amazon", "escalated", None),
+        (8, "amazon", "success", 7200.0),
+        (1, "ubereats", "success", 600.0),
+    ]:
+        store.append(platform, "handle_response", status, since_start=since_start, ts=MONDAY + day * DAY)
+    store.append("amazon", "initiate_refund", "initiated", amount=26.99, ts=MONDAY)
+    return store
+
+
+def test_success_rate_by_platform_and_week():
+    rates = {(row["platform"], row["week"]): row for row in _store().success_rate()}
+
+    assert rates[("amazon", "2024-03-04")]["success_rate"] == 0.5
+    assert rates[("amazon", "2024-03-04")]["decided"] == 2
+    assert rates[("amazon", "2024-03-11")]["success_rate"] == 1.0
+    assert rates[("ubereats", "2024-03-04")]["approved"] == 1
+
+
+def test_success_rate_for_one_platform():
+    rates = _store().success_rate(platform="ubereats")
+
+    assert [(row["platform"], row["decided"]) for row in rates] == [("ubereats", 1)]
+    assert _store().success_rate(platform="airbnb") == []
+
+
+def test_platforms_past_the_cap_are_counted_as_other(monkeypatch):
+    monkeypatch.setattr("utils.outcomes.MAX_CATEGORIES", 4)
+    store = OutcomeStore()
+    for i in range(6):
+        store.append(f"shop-{i}", "handle_response", "success", ts=MONDAY)
+
+    assert len(store) == 6
+    assert list(store.codes["platform"]) == ["shop-0", "shop-1", "shop-2", "other"]
+    rates = {row["platform"]: row["decided"] for row in store.success_rate()}
+    assert rates == {"shop-0": 1, "shop-1": 1, "shop-2": 1, "other": 3}
+
+
+def test_median_time_to_approval():
+    store = _store()
+    assert store.median_time_to_approval() == 3600.0
+    assert store.median_time_to_approval("ubereats") == 600.0
+    assert store.median_time_to_approval("airbnb") is None
+
+
+def test_columns_persist_and_reload(tmp_path):
+    store = _store(str(tmp_path))
+    store.flush()
+    store.append("airbnb", "handle_response", "success", since_start=60.0)
+    store.flush()
+
+    reloaded = OutcomeStore(str(tmp_path))
+    assert len(reloaded) == 7
+    assert reloaded.median_time_to_approval("airbnb") == 60.0
+
+
+def test_partial_flush_is_dropped_on_reload(tmp_path):
+    _store(str(tmp_path)).flush()
+    with open(tmp_path / "ts.bin", "ab") as f:
+        f.write(b"\0" * 8)  # crashed after writing one column
+
+    reloaded = OutcomeStore(str(tmp_path))
+    reloaded.append("amazon", "handle_response", "success", since_start=1.0)
+    reloaded.flush()
+
+    assert len(OutcomeStore(str(tmp_path))) == 7
+
+
+def test_queries_stay_fast_over_a_million_rows():
+    import numpy as np
+
+    store = OutcomeStore()
+    n = 1_000_000
+    rng = np.random.default_rng(0)
+    store.columns["ts"].frombytes((MONDAY + rng.random(n) * 52 * 7 * DAY).tobytes())
+    store.columns["platform"].frombytes(rng.integers(0, 3, n, dtype=np.uint16).tobytes())
+    store.columns["operation"].frombytes(np.zeros(n, dtype=np.uint8).tobytes())
+    store.columns["status"].frombytes(rng.integers(0, 3, n, dtype=np.uint8).tobytes())
+    store.columns["since_start"].frombytes((rng.random(n) * DAY).astype(np.float32).tobytes())
+    for name in ("escalation_depth", "latency", "tokens", "amount"):
+        store.columns[name].frombytes(bytes(n * store.columns[name].itemsize))
+    store.codes = {"platform": {"amazon": 0, "ubereats": 1, "airbnb": 2}, "operation": {"handle_response": 0},
+                   "status": {"success": 0, "rejected": 1, "escalated": 2}}
+
+    started = time.perf_counter()
+    rates = store.success_rate()
+    median = store.median_time_to_approval("amazon")
+    elapsed = time.perf_counter() - started
+
+    assert len(rates) == 3 * 52
+    assert median == pytest.approx(DAY / 2, rel=0.05)
+    assert elapsed < 0.5
+    store.append("amazon", "handle_response", "success")  # query views were released
+
+
+def test_agent_results_are_recorded(fake_agent):
+    before = len(outcomes)
+    asyncio.run(fake_agent.initiate_refund("amazon", "OUT-1", "Item arrived damaged", b"receipt"))
+    asyncio.run(fake_agent.handle_response("OUT-1", "We cannot do that", "amazon"))
+    asyncio.run(fake_agent.handle_response("OUT-1", "Your refund is approved", "amazon"))
+
+    assert len(outcomes) == before + 3
+    depth = outcomes.columns["escalation_depth"][-3:].tolist()
+    assert depth == [0, 1, 1]
+    assert outcomes.columns["amount"][-3] == 26.99
+    assert outcomes.median_time_to_approval() is not None
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from agents.implementations.policy_cache import WarmPolicyCache
+from agents.implementations.policy_fetcher import OpenAIPolicyFetcher
+from agents.platforms import DEFAULT_POLICY, PlatformRegistry, PlatformSpec
+
+
+class OfflineFetcher(OpenAIPolicyFetcher):
+    """Policy fetcher that fails any download and answers analysis from a stub"""
+
+    def __init__(self, platforms=None):
+        super().__init__(api_key="sk-test", platforms=platforms)
+        self.downloads = 0
+        self.analyzed = []
+
+    async def _download(self, url):
+        self.downloads += 1
+        raise RuntimeError("network disabled")
+
+    async def _analyze_policy(self, platform, sections):
+        self.analyzed.extend(text for _, text in sections)
+        return {h: {"time_limits": {"standard": 14 * 24}} for h, _ in sections}
+
+
+def test_aliases_resolve_to_canonical_platform():
+    registry = PlatformRegistry.from_file()
+
+    assert registry.canonical("Uber Eats") == "ubereats"
+    assert registry.canonical("uber-eats") == "ubereats"
+    assert registry.canonical("Amazon.com") == "amazon"
+    assert registry.resolve("email") is None
+
+
+def test_unknown_platform_gets_default_policy_without_network():
+    fetcher = OfflineFetcher()
+
+    async def run():
+        return [await fetcher.fetch_policy("email") for _ in range(3)]
+
+    policies = asyncio.run(run())
+
+    assert fetcher.downloads == 0 and fetcher.analyzed == []
+    assert all(p is policies[0] for p in policies)
+    assert policies[0].platform == "email"
+    assert policies[0].time_limits == DEFAULT_POLICY.time_limits
+
+
+def test_static_policy_text_is_analyzed_without_download(tmp_path):
+    path = tmp_path / "platforms.json"
+    path.write_text('[{"name": "etsy", "aliases": ["etsy.com"], '
+                    '"policy_text": "Items can be returned within 14 days of delivery."}]')
+    fetcher = OfflineFetcher(PlatformRegistry.from_file(str(path)))
+
+    policy = asyncio.run(fetcher.fetch_policy("Etsy.com"))
+
+    assert fetcher.downloads == 0
+    assert fetcher.analyzed == ["Items can be returned within 14 days of delivery."]
+    assert policy.platform == "etsy"
+    assert policy.time_limits == {"standard": 336}
+
+
+def test_register_needs_exactly_one_source():
+    registry = PlatformRegistry()
+    with pytest.raises(ValueError):
+        registry.register(PlatformSpec(name="etsy"))
+    with pytest.raises(ValueError):
+        registry.register(PlatformSpec(name="etsy", url="https://etsy.com", policy_text="30 days"))
+
+
+def test_registering_a_platform_clears_its_negative_entry():
+    registry = PlatformRegistry()
+    default = registry.default_policy("Etsy")
+    registry.register(PlatformSpec(name="etsy", policy_text="30 days"))
+
+    assert registry.resolve("etsy") is not None
+    assert registry.default_policy("etsy") is not default
+
+
+def test_warm_cache_shares_one_entry_across_aliases():
+    fetcher = OfflineFetcher()
+    fetcher.platforms.register(PlatformSpec(name="ubereats", aliases=["uber eats"], policy_text="Refunds within 14 days."))
+    cache = WarmPolicyCache(fetcher)
+
+    async def run():
+        first = await cache.fetch_policy("Uber Eats")
+        return first, await cache.fetch_policy("ubereats"), await cache.fetch_policy("email")
+
+    first, second, unknown = asyncio.run(run())
+
+    assert first is second
+    assert fetcher.analyzed == ["Refunds within 14 days."]
+    assert unknown.policy_text == DEFAULT_POLICY.policy_text
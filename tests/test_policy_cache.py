@@ -0,0 +1,79 @@
+import asyncio
+
+from agents.implementations.policy_cache import WarmPolicyCache
+from agents.implementations.policy_fetcher import OpenAIPolicyFetcher
+from agents.interfaces import RefundPolicy
+
+
+class CountingFetcher(OpenAIPolicyFetcher):
+    """Policy fetcher whose scrape + analysis is replaced by a counter"""
+
+    def __init__(self, fail: bool = False):
+        super().__init__(api_key="sk-test")
+        self.loads = 0
+        self.fail = fail
+
+    async def load_policy(self, platform: str) -> RefundPolicy:
+        self.loads += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise RuntimeError("policy site down")
+        return RefundPolicy(
+            platform=platform,
+            policy_text=f"{platform} policy v{self.loads}",
+            eligibility_criteria={},
+            time_limits={"standard": 720},
+            required_evidence=[]
+        )
+
+
+def test_warm_up_loads_every_platform_once():
+    fetcher = CountingFetcher()
+    cache = WarmPolicyCache(fetcher)
+
+    async def run():
+        await cache.warm_up()
+        return await asyncio.gather(*(cache.fetch_policy("amazon") for _ in range(5)))
+
+    policies = asyncio.run(run())
+
+    assert fetcher.loads == len(fetcher.policy_urls)
+    assert all(p is policies[0] for p in policies)
+
+
+def test_cold_misses_share_one_load():
+    fetcher = CountingFetcher()
+    cache = WarmPolicyCache(fetcher)
+
+    async def run():
+        return await asyncio.gather(*(cache.fetch_policy("airbnb") for _ in range(10)))
+
+    asyncio.run(run())
+
+    assert fetcher.loads == 1
+
+
+def test_failed_refresh_keeps_previous_policy():
+    fetcher = CountingFetcher()
+    cache = WarmPolicyCache(fetcher)
+
+    async def run():
+        await cache.refresh("amazon")
+        fetcher.fail = True
+        refreshed = await cache.refresh("amazon")
+        return refreshed, await cache.fetch_policy("amazon")
+
+    refreshed, policy = asyncio.run(run())
+
+    assert refreshed is False
+    assert policy.policy_text == "amazon policy v1"
+
+
+def test_failed_cold_load_falls_back_without_caching():
+    fetcher = CountingFetcher(fail=True)
+    cache = WarmPolicyCache(fetcher)
+
+    policy = asyncio.run(cache.fetch_policy("amazon"))
+
+    assert policy.policy_text == "Standard refund policy applies"
+    assert "amazon" not in cache._policies
@@ -0,0 +1,47 @@
+from bs4 import BeautifulSoup
+
+from agents.interfaces import RefundPolicy
+from agents.policy_index import PolicyIndex, split_sections
+from benchmarks.mock_policy_server import POLICY_HTML
+from utils.tokens import estimate_tokens
+
+
+def _policy_text() -> str:
+    return BeautifulSoup(POLICY_HTML.format(platform="Amazon"), "html.parser").get_text()
+
+
+def test_split_sections_starts_at_headings():
+    sections = split_sections(_policy_text())
+
+    assert any(s.startswith("Damaged or defective items") for s in sections)
+    assert any(s.startswith("Non-returnable items") for s in sections)
+
+
+def test_excerpt_ranks_relevant_section_first():
+    index = PolicyIndex.from_text(_policy_text())
+
+    excerpt = index.excerpt("my package never arrived, order not received", max_tokens=40)
+
+    assert "not arrived within 7 days" in excerpt
+    assert "Gift cards" not in excerpt
+
+
+def test_excerpt_respects_budget_and_page_order():
+    index = PolicyIndex.from_text(_policy_text())
+
+    excerpt = index.excerpt("damaged item refund timing", max_tokens=80)
+
+    assert estimate_tokens(excerpt) <= 80
+    assert excerpt.index("Damaged") < excerpt.index("Refund timing")
+
+
+def test_excerpt_without_matches_keeps_leading_text():
+    policy = RefundPolicy(
+        platform="email",
+        policy_text="Standard refund policy applies",
+        eligibility_criteria={},
+        time_limits={},
+        required_evidence=[]
+    )
+
+    assert policy.excerpt("zzz", max_tokens=100) == policy.policy_text
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import re
+
+from agents.implementations.policy_fetcher import OpenAIPolicyFetcher
+from agents.policy_sections import diff_analysis, merge_analyses
+from fakes import FakeOpenAIClient
+
+PAGE = """
+Returns
+Most items can be returned within 30 days of delivery for a full refund.
+Damaged items
+Items that arrive damaged or defective are refundable within 48 hours of delivery. Photos are required.
+Missing orders
+Orders that are not received are refunded once the carrier confirms the loss.
+"""
+
+
+SECTION = re.compile(r"^\s*\[(s\d+)\] (.*)$", re.M)
+
+
+def _analyze_sections(model, prompt):
+    """Answers a section analysis prompt from the section text"""
+    return json.dumps({section_id: _analyze(text) for section_id, text in SECTION.findall(prompt)})
+
+
+def _analyze(text):
+    analysis = {"eligibility_criteria": {}, "time_limits": {}, "required_evidence": []}
+    hours = re.search(r"within (\d+) (days|hours)", text)
+    if hours:
+        key = "damaged" if "damaged" in text else "standard"
+        analysis["time_limits"][key] = int(hours.group(1)) * (24 if hours.group(2) == "days" else 1)
+        analysis["eligibility_criteria"][key] = text.split(". ")[0]
+    if "Photos" in text:
+        analysis["required_evidence"].append("Photos")
+    return analysis
+
+
+def _analyzed_sections(client):
+    return [text for prompt in client.prompts for _, text in SECTION.findall(prompt)]
+
+
+class PageFetcher(OpenAIPolicyFetcher):
+    def __init__(self, page):
+        super().__init__(api_key="sk-test")
+        self.page = page
+        self.client = FakeOpenAIClient(_analyze_sections)
+
+    async def _fetch_policy_text(self, platform):
+        return self.page
+
+
+def test_unchanged_page_is_not_reanalyzed():
+    fetcher = PageFetcher(PAGE)
+    first = asyncio.run(fetcher.load_policy("amazon"))
+    analyzed = len(_analyzed_sections(fetcher.client))
+
+    second = asyncio.run(fetcher.load_policy("amazon"))
+
+    assert second is first
+    assert len(_analyzed_sections(fetcher.client)) == analyzed
+    assert first.time_limits == {"standard": 720, "damaged": 48}
+    assert first.required_evidence == ["Photos"]
+
+
+def test_edited_section_alone_is_reanalyzed_and_merged():
+    fetcher = PageFetcher(PAGE)
+    asyncio.run(fetcher.load_policy("amazon"))
+    fetcher.client.prompts.clear()
+
+    fetcher.page = PAGE.replace("within 48 hours", "within 72 hours")
+    policy = asyncio.run(fetcher.load_policy("amazon"))
+
+    sections = _analyzed_sections(fetcher.client)
+    assert len(sections) == 1 and "72 hours" in sections[0]
+    assert policy.time_limits == {"standard": 720, "damaged": 72}
+    versions = fetcher.history("amazon")
+    assert [v.version for v in versions] == [1, 2]
+    assert versions[1].analyzed_sections == 1
+    assert len(versions[1].added_sections) == len(versions[1].removed_sections) == 1
+    assert versions[1].changes["time_limits"]["changed"] == {"damaged": {"from": 48, "to": 72}}
+
+
+def test_failed_analysis_is_retried_on_next_refresh():
+    fetcher = PageFetcher(PAGE)
+    fetcher.client.reply = "not json"
+    fallback = asyncio.run(fetcher.load_policy("amazon"))
+    assert fallback.time_limits == fetcher._get_fallback_analysis()["time_limits"]
+
+    fetcher.client.reply = _analyze_sections
+    policy = asyncio.run(fetcher.load_policy("amazon"))
+
+    assert policy.time_limits == {"standard": 720, "damaged": 48}
+
+
+def test_merge_and_diff():
+    merged = merge_analyses([
+        {"time_limits": {"standard": 720}, "required_evidence": ["Order number"]},
+        {"time_limits": {"standard": 360}, "required_evidence": ["Order number", "Photos"],
+         "eligibility_criteria": ["not a dict"]},
+    ])
+    assert merged == {"eligibility_criteria": {}, "time_limits": {"standard": 360},
+                      "required_evidence": ["Order number", "Photos"]}
+    assert diff_analysis({}, merged)["required_evidence"]["added"] == ["Order number", "Photos"]
@@ -0,0 +1,69 @@
+import asyncio
+import io
+
+from PIL import Image, ImageDraw
+
+from agents.implementations.evidence_processor import OpenAIEvidenceProcessor
+from agents.implementations.receipt_extractors import MIN_WORD_CONFIDENCE, extract_receipt
+from fakes import FakeOpenAIClient
+
+AMAZON_RECEIPT = """AMAZON.COM
+Order Date: 2024-03-04
+Order #: 123-456-789
+1x Ceramic Coffee Mug
+$24.99
+Subtotal: $24.99
+Tax: $2.00
+Total: $26.99
+Payment Method:
+VISA ***1234
+Thank you for shopping at Amazon.com!"""
+
+
+def _confident(text: str, score: float = 95.0):
+    return {word: score for word in text.split()}
+
+
+def test_amazon_layout_is_read_locally():
+    merchant, fields = extract_receipt(AMAZON_RECEIPT, _confident(AMAZON_RECEIPT))
+    assert merchant == "amazon"
+    assert fields == {
+        "merchant": "amazon",
+        "order_id": "123-456-789",
+        "date": "2024-03-04",
+        "total_amount": 26.99,
+        "payment_method": "VISA ***1234",
+    }
+
+
+def test_low_confidence_field_defers_to_llm():
+    confidence = _confident(AMAZON_RECEIPT)
+    confidence["$26.99"] = MIN_WORD_CONFIDENCE - 1
+    assert extract_receipt(AMAZON_RECEIPT, confidence) == ("amazon", None)
+
+
+def test_missing_field_or_unknown_layout_defers_to_llm():
+    without_total = AMAZON_RECEIPT.replace("Total: $26.99", "")
+    assert extract_receipt(without_total) == ("amazon", None)
+    assert extract_receipt("Corner Shop\nTotal: $3.00") == (None, None)
+
+
+def test_process_receipt_skips_llm_for_known_layout(monkeypatch):
+    processor = OpenAIEvidenceProcessor(api_key="test")
+    processor.client = FakeOpenAIClient(
+        error=AssertionError("LLM should not be called for a locally read receipt")
+    )
+
+    async def fake_ocr(data):
+        return AMAZON_RECEIPT, _confident(AMAZON_RECEIPT)
+
+    scan = Image.new("RGB", (800, 1200), "white")
+    ImageDraw.Draw(scan).rectangle((40, 40, 600, 600), fill="black")
+    receipt = io.BytesIO()
+    scan.save(receipt, format="PNG")
+
+    monkeypatch.setattr(processor, "_perform_ocr", fake_ocr)
+    info = asyncio.run(processor.process_receipt(receipt.getvalue()))
+    assert info["order_id"] == "123-456-789"
+    assert info["extraction"] == "local"
+    assert "processing_error" not in info
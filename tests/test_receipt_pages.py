@@ -0,0 +1,146 @@
+import asyncio
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageDraw
+
+from agents.implementations.evidence_processor import OpenAIEvidenceProcessor
+from agents.implementations.receipt_pages import MAX_TILE_HEIGHT, iter_pages
+from fakes import FakeOpenAIClient
+from utils.tokens import estimate_tokens, prompt_budget
+
+
+def _pdf(pages: int) -> bytes:
+    images = [Image.new("RGB", (200, 100), "white") for _ in range(pages)]
+    out = io.BytesIO()
+    images[0].save(out, format="PDF", save_all=True, append_images=images[1:])
+    return out.getvalue()
+
+
+def _tall_screenshot(height: int) -> Image.Image:
+    """White image with a black text-like band every 40px"""
+    image = Image.new("RGB", (100, height), "white")
+    draw = ImageDraw.Draw(image)
+    for top in range(0, height, 40):
+        draw.rectangle((0, top, 99, top + 20), fill="black")
+    return image
+
+
+def _png(image: Image.Image) -> bytes:
+    out = io.BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_pdf_renders_one_image_per_page():
+    pages = list(iter_pages(memoryview(_pdf(3))))
+    assert len(pages) == 3
+    assert all(page.width > 200 for page in pages)  # rendered above 72 dpi
+
+
+def test_long_pdf_is_cut_at_max_pages(monkeypatch):
+    monkeypatch.setattr("agents.implementations.receipt_pages.MAX_PAGES", 2)
+    assert len(list(iter_pages(_pdf(5)))) == 2
+
+
+def test_concurrent_pdf_renders_do_not_overlap(monkeypatch):
+    import pypdfium2
+
+    render = pypdfium2.PdfPage.render
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def tracking_render(self, *args, **kwargs):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.01)
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    monkeypatch.setattr(pypdfium2.PdfPage, "render", tracking_render)
+    data = _pdf(3)
+    # A consumer that stops after the first page must not hold up the others
+    abandoned = iter_pages(data)
+    next(abandoned)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        counts = list(pool.map(lambda _: len(list(iter_pages(data))), range(4)))
+
+    assert counts == [3, 3, 3, 3]
+    assert peak[0] == 1
+
+
+def test_short_image_is_a_single_page():
+    assert len(list(iter_pages(_png(_tall_screenshot(300))))) == 1
+
+
+def test_tall_screenshot_is_cut_between_text_lines():
+    height = MAX_TILE_HEIGHT * 2 + 500
+    tiles = list(iter_pages(_png(_tall_screenshot(height))))
+
+    assert len(tiles) == 3
+    assert sum(tile.height for tile in tiles) == height
+    for tile in tiles[:-1]:
+        assert tile.height <= MAX_TILE_HEIGHT
+        # the last row of each cut is blank, so no line is split
+        darkest, _ = tile.convert("L").crop((0, tile.height - 1, 100, tile.height)).getextrema()
+        assert darkest == 255
+
+
+def test_ocr_stitches_page_text_in_order(monkeypatch):
+    widths = [100, 200, 300]
+    monkeypatch.setattr(
+        "agents.implementations.receipt_pages.iter_pages",
+        lambda data: (Image.new("L", (w, 10)) for w in widths),
+    )
+    monkeypatch.setattr(
+        "agents.implementations.receipt_pages.ocr_page",
+        lambda page: (f"page of width {page.width}", {"page": 90.0 - page.width / 10}),
+    )
+
+    text, confidence = asyncio.run(OpenAIEvidenceProcessor(api_key="test")._perform_ocr(b"ignored"))
+    assert text == "\n\n".join(f"page of width {w}" for w in widths)
+    assert confidence == {"page": 60.0}
+
+
+def test_pages_are_rendered_only_as_ocr_workers_free_up(monkeypatch):
+    monkeypatch.setattr("agents.implementations.evidence_processor.OCR_WORKERS", 2)
+    waiting, peak, lock = [0], [0], threading.Lock()
+
+    def render(data):
+        for width in range(1, 9):
+            with lock:
+                waiting[0] += 1
+                peak[0] = max(peak[0], waiting[0])
+            yield Image.new("L", (width, 10))
+
+    def ocr(page):
+        time.sleep(0.01)
+        with lock:
+            waiting[0] -= 1
+        return f"page {page.width}", {}
+
+    monkeypatch.setattr("agents.implementations.receipt_pages.iter_pages", render)
+    monkeypatch.setattr("agents.implementations.receipt_pages.ocr_page", ocr)
+
+    text, _ = asyncio.run(OpenAIEvidenceProcessor(api_key="test")._perform_ocr(b"ignored"))
+    assert text == "\n\n".join(f"page {w}" for w in range(1, 9))
+    assert peak[0] <= 2
+
+
+def test_long_receipt_text_is_trimmed_to_the_prompt_budget():
+    processor = OpenAIEvidenceProcessor(api_key="test")
+    processor.client = FakeOpenAIClient('{"order_id": "123-456-789", "total_amount": 26.99}')
+    lines = ["Order #: 123-456-789"] + [f"1x Item number {i} $1.00" for i in range(5000)] + ["Total: $26.99"]
+
+    info = asyncio.run(processor._extract_from_text("\n".join(lines)))
+
+    prompt = processor.client.prompts[0]
+    assert info["order_id"] == "123-456-789"
+    assert estimate_tokens(prompt) <= prompt_budget("process_receipt")
+    assert "Order #: 123-456-789" in prompt and "Total: $26.99" in prompt
@@ -0,0 +1,91 @@
+import asyncio
+import io
+import os
+
+from PIL import Image, ImageDraw
+
+from agents.implementations.evidence_processor import OpenAIEvidenceProcessor
+from agents.implementations.receipt_router import choose_route, ocr_usable
+from benchmarks.load_test import _start_aiohttp
+from benchmarks.mock_llm import RECEIPT_INFO, create_mock_llm_app
+from utils.tokens import image_tokens
+
+
+def _encode(image: Image.Image, fmt: str = "PNG") -> bytes:
+    out = io.BytesIO()
+    image.save(out, format=fmt)
+    return out.getvalue()
+
+
+def _scan(width: int = 800, height: int = 1200, ink="black") -> Image.Image:
+    """Text-like lines on white, like a screenshot or flatbed scan"""
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for top in range(40, height - 40, 30):
+        draw.rectangle((40, top, width - 200, top + 12), fill=ink)
+    return image
+
+
+def test_clean_scan_goes_to_ocr():
+    assert choose_route(_encode(_scan())) == ("ocr", "clean_scan")
+
+
+def test_sample_screenshot_goes_to_ocr():
+    with open(os.path.join(os.path.dirname(__file__), "test_data", "amazon_order.png"), "rb") as f:
+        assert choose_route(f.read()) == ("ocr", "clean_scan")
+
+
+def test_poor_images_go_to_vision():
+    assert choose_route(_encode(_scan(300, 400))) == ("vision", "low_resolution")
+    assert choose_route(_encode(Image.new("RGB", (800, 1200), (200, 200, 195)))) == ("vision", "low_contrast")
+    assert choose_route(_encode(_scan(ink=(215, 215, 215)))) == ("vision", "low_contrast")
+
+    photo = _scan()
+    ImageDraw.Draw(photo).rectangle((0, 0, 800, 1200), outline=(180, 40, 30), width=300)
+    assert choose_route(_encode(photo, "JPEG")) == ("vision", "photo")
+
+
+def test_ocr_usable_needs_enough_confident_words():
+    text = "Order Date 2024-03-04 Order # 123 Total $26.99"
+    assert ocr_usable(text, {word: 90.0 for word in text.split()})
+    assert not ocr_usable(text, {word: 20.0 for word in text.split()})
+    assert not ocr_usable("Total $3", {"Total": 95.0, "$3": 95.0})
+
+
+def test_image_tokens_follow_tile_pricing():
+    assert image_tokens(1024, 1024) == 85 + 170 * 4
+    assert image_tokens(512, 512) == 85 + 170
+
+
+def test_low_resolution_receipt_is_read_by_vision_call():
+    """End to end against the mock OpenAI endpoint: no OCR, one multimodal request"""
+    seen = []
+
+    async def scenario():
+        from openai import AsyncOpenAI
+        from aiohttp import web
+
+        app = create_mock_llm_app()
+
+        @web.middleware
+        async def capture(request, handler):
+            seen.append(await request.json())
+            return await handler(request)
+
+        app.middlewares.append(capture)
+        runner = await _start_aiohttp(app)
+        try:
+            host, port = runner.addresses[0][:2]
+            processor = OpenAIEvidenceProcessor(api_key="test")
+            processor.client = AsyncOpenAI(api_key="test", base_url=f"http://{host}:{port}/v1")
+            return await processor.process_receipt(_encode(_scan(300, 400)))
+        finally:
+            await runner.cleanup()
+
+    info = asyncio.run(scenario())
+    assert info["extraction"] == "vision"
+    assert info["order_id"] == RECEIPT_INFO["order_id"]
+    assert len(seen) == 1
+    parts = seen[0]["messages"][0]["content"]
+    assert [part["type"] for part in parts] == ["text", "image_url"]
+    assert parts[1]["image_url"]["url"].startswith("data:image/jpeg;base64,")
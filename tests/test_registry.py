@@ -0,0 +1,57 @@
+import subprocess
+import sys
+
+import pytest
+
+from agents.registry import ComponentRegistry
+from fakes import FakeEvidenceProcessor, FakeMessageGenerator, FakePolicyFetcher, FakeResponseAnalyzer
+
+
+def test_importing_main_defers_heavy_modules():
+    heavy = ["openai", "pytesseract", "PIL", "bs4", "aiohttp", "numpy"]
+    code = (
+        "import sys, main; "
+        f"print([m for m in {heavy!r} if m in sys.modules])"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert out.stdout.strip() == "[]"
+
+
+def test_components_are_built_once_on_first_use():
+    registry = ComponentRegistry({"api_key": "sk-test", "message_generator": "fake"})
+    built = []
+    registry.register("message_generator", "fake", lambda config: built.append(1) or FakeMessageGenerator())
+
+    assert not registry.is_built("message_generator")
+    first = registry.get("message_generator")
+
+    assert registry.get("message_generator") is first
+    assert built == [1]
+    assert "message_generator" in registry.build_seconds
+
+
+def test_agent_uses_configured_implementations():
+    registry = ComponentRegistry({
+        "api_key": "sk-test",
+        "policy_fetcher": "fake",
+        "message_generator": "fake",
+        "response_analyzer": "fake",
+        "evidence_processor": "fake",
+    })
+    registry.register("policy_fetcher", "fake", lambda config: FakePolicyFetcher())
+    registry.register("message_generator", "fake", lambda config: FakeMessageGenerator())
+    registry.register("response_analyzer", "fake", lambda config: FakeResponseAnalyzer())
+    registry.register("evidence_processor", "fake", lambda config: FakeEvidenceProcessor())
+
+    agent = registry.agent()
+
+    assert isinstance(agent.policy_fetcher, FakePolicyFetcher)
+    assert registry.agent() is agent
+
+
+def test_unknown_implementation_is_rejected():
+    registry = ComponentRegistry({"api_key": "sk-test", "response_analyzer": "missing"})
+
+    with pytest.raises(KeyError):
+        registry.get("response_analyzer")
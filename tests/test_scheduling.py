@@ -0,0 +1,143 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from prometheus_client import REGISTRY
+
+from agents.prioritization import priority_class
+from fakes import make_policy
+from utils.deadlines import Deadline, DeadlineExceeded, deadline_scope
+from utils.scheduling import PriorityScheduler
+
+NOW = datetime(2024, 3, 30)
+
+
+def _waits(priority: str) -> float:
+    return REGISTRY.get_sample_value("refund_queue_wait_seconds_count", {"priority": priority}) or 0.0
+
+
+async def _run_backlog(scheduler, jobs):
+    """Hold the only slot while ``jobs`` queue up, then release it; return completion order"""
+    order = []
+    gate = asyncio.Event()
+
+    async def blocker():
+        async with scheduler.slot("amazon", "low"):
+            await gate.wait()
+
+    async def job(name, platform, priority):
+        async with scheduler.slot(platform, priority):
+            order.append(name)
+
+    first = asyncio.ensure_future(blocker())
+    await asyncio.sleep(0)
+    tasks = []
+    for name, platform, priority in jobs:
+        tasks.append(asyncio.ensure_future(job(name, platform, priority)))
+        await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(first, *tasks)
+    return order
+
+
+def test_priority_classes():
+    policy = make_policy()  # 30-day window
+    assert priority_class("amazon", {"total_amount": 2000, "date": "2024-03-25"}, policy, NOW) == "high"
+    assert priority_class("amazon", {"total_amount": 5, "date": "2024-03-25"}, policy, NOW) == "low"
+    assert priority_class("amazon", {"total_amount": 5, "date": "2024-03-01"}, policy, NOW) == "urgent"
+    assert priority_class("amazon", {"total_amount": 2000, "date": "2024-02-01"}, policy, NOW) == "expired"
+    assert priority_class("amazon", {}, policy, NOW) == "normal"
+    assert priority_class("airbnb", {"total_amount": 5}, policy, NOW) == "normal"
+
+
+def test_priority_class_accepts_dates_with_timezone():
+    policy = make_policy()
+    assert priority_class("amazon", {"total_amount": 5, "date": "2024-03-01T00:00:00Z"}, policy, NOW) == "urgent"
+    assert priority_class("amazon", {"total_amount": 5, "date": "2024-02-27T23:00:00-02:00"}, policy, NOW) == "expired"
+    assert priority_class("amazon", {"total_amount": 5, "date": "2024-03-25T10:00:00+02:00"}, policy, NOW) == "low"
+
+
+def test_backlog_is_served_by_priority():
+    scheduler = PriorityScheduler(capacity=1)
+    order = asyncio.run(_run_backlog(scheduler, [
+        ("lapsed", "amazon", "expired"),
+        ("mug", "amazon", "low"),
+        ("laptop", "amazon", "high"),
+        ("expiring", "amazon", "urgent"),
+    ]))
+    assert order == ["expiring", "laptop", "mug", "lapsed"]
+
+
+def test_platforms_share_a_class_fairly():
+    scheduler = PriorityScheduler(capacity=1)
+    jobs = [(f"amazon-{i}", "amazon", "normal") for i in range(3)] + [("ubereats-0", "ubereats", "normal")]
+    order = asyncio.run(_run_backlog(scheduler, jobs))
+    # The blocker just ran for amazon, so ubereats goes first
+    assert order[0] == "ubereats-0"
+
+
+def test_long_waiters_are_promoted():
+    scheduler = PriorityScheduler(capacity=1, promote_after=0.01)
+
+    async def main():
+        gate = asyncio.Event()
+        order = []
+
+        async def blocker():
+            async with scheduler.slot("amazon", "normal"):
+                await gate.wait()
+
+        async def job(name, priority):
+            async with scheduler.slot("amazon", priority):
+                order.append(name)
+
+        first = asyncio.ensure_future(blocker())
+        await asyncio.sleep(0)
+        old = asyncio.ensure_future(job("old-low", "low"))
+        await asyncio.sleep(0.05)
+        new = asyncio.ensure_future(job("new-high", "high"))
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(first, old, new)
+        return order
+
+    assert asyncio.run(main()) == ["old-low", "new-high"]
+
+
+def test_waiter_past_its_deadline_leaves_the_queue():
+    scheduler = PriorityScheduler(capacity=1)
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def blocker():
+            async with scheduler.slot("amazon", "normal"):
+                await gate.wait()
+
+        first = asyncio.ensure_future(blocker())
+        await asyncio.sleep(0)
+        with deadline_scope(Deadline(0.05)):
+            with pytest.raises(DeadlineExceeded):
+                async with scheduler.slot("amazon", "high"):
+                    pass
+        assert scheduler.waiting() == 0
+        gate.set()
+        await first
+        assert scheduler.active == 0
+
+    asyncio.run(main())
+
+
+def test_agent_records_queue_wait_by_class(fake_agent):
+    before = _waits("high")
+
+    class ExpensiveReceipt(type(fake_agent.evidence_processor)):
+        async def process_receipt(self, receipt_data):
+            return {"order_id": "A1", "total_amount": 2000.0,
+                    "date": (datetime.utcnow() - timedelta(days=1)).isoformat()}
+
+    fake_agent.evidence_processor = ExpensiveReceipt()
+    result = asyncio.run(fake_agent.initiate_refund("amazon", "A1", "Item arrived damaged", b"receipt"))
+
+    assert result["status"] == "initiated"
+    assert _waits("high") == before + 1
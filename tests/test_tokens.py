@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from agents.implementations.openai_base import OpenAIComponent
+from fakes import FakeOpenAIClient
+from utils.tokens import (
+    PROMPT_OVERHEAD_TOKENS,
+    TokenLedger,
+    allocate,
+    estimate_tokens,
+    fit_history,
+    fit_text,
+    ledger,
+    prompt_budget,
+    shared_usage_scope,
+    usage_scope,
+)
+
+
+def test_estimate_tokens_is_close_to_word_count():
+    text = "Please refund my order, the item arrived damaged."
+    assert 8 <= estimate_tokens(text) <= 14
+    assert estimate_tokens("") == 0
+
+
+def test_fit_history_drops_oldest_first():
+    history = ["first " * 50, "second " * 50, "third"]
+
+    kept = fit_history(history, max_tokens=60)
+
+    assert kept == ["second " * 50, "third"]
+
+
+def test_allocate_cuts_history_before_policy():
+    budget = prompt_budget("generate_escalation") - PROMPT_OVERHEAD_TOKENS
+    history = ["older message " * 400, "latest rejection"]
+
+    policy_tokens, kept = allocate("generate_escalation", "latest rejection", 600, history)
+
+    assert policy_tokens == 600
+    assert kept[-1] == "latest rejection"
+    assert sum(estimate_tokens(m) for m in kept) <= budget - 600
+
+
+def test_allocate_shrinks_policy_but_never_fixed_text():
+    details = "order detail " * 1500
+
+    policy_tokens, _ = allocate("generate_request", details, 600)
+
+    assert policy_tokens == 0
+
+
+def test_ledger_attributes_calls_to_order_and_platform():
+    local = TokenLedger(max_orders=1)
+    with usage_scope("A", "amazon"):
+        local.record("analyze_response", 100, 20, 0.5)
+    with usage_scope("B", "amazon"):
+        local.record("generate_escalation", 300, 80, 1.5)
+
+    assert local.order_usage("A") is None  # evicted
+    assert local.order_usage("B")["prompt_tokens"] == 300
+    assert local.summary()[0]["call_site"] == "generate_escalation"
+
+
+def test_chat_records_usage_in_scope():
+    component = OpenAIComponent(api_key="sk-test")
+    component.client = FakeOpenAIClient("done")
+
+    async def run():
+        with usage_scope("ORD-T", "ubereats"):
+            return await component._chat("analyze_response", "Was it approved?", temperature=0.3)
+
+    assert asyncio.run(run()) == "done"
+    usage = ledger.order_usage("ORD-T")
+    assert usage["platform"] == "ubereats"
+    assert usage["prompt_tokens"] == estimate_tokens("Was it approved?")
+
+
+def test_fit_text_keeps_both_ends():
+    text = "\n".join(["Order 123"] + [f"line {i}" for i in range(100)] + ["Total 9.99"])
+
+    fitted = fit_text(text, 20)
+
+    assert estimate_tokens(fitted) <= 20
+    assert fitted.startswith("Order 123") and fitted.endswith("Total 9.99")
+    assert "..." in fitted
+    assert fit_text("short", 20) == "short"
+
+
+def test_shared_call_is_counted_once_and_tokens_add_up():
+    local = TokenLedger()
+
+    with shared_usage_scope([("A", "amazon"), ("B", "amazon"), ("C", "amazon")]):
+        local.record("analyze_response_batch", 100, 41, 0.9)
+
+    row = local.summary()[0]
+    assert row["calls"] == 1
+    assert row["latency_seconds"] == pytest.approx(0.9)
+    assert (row["prompt_tokens"], row["completion_tokens"]) == (100, 41)
+    assert [local.order_usage(o)["prompt_tokens"] for o in "ABC"] == [34, 33, 33]
+    assert local.order_usage("A")["calls"][0]["share"] == 0.3333
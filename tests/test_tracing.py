@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from utils.tracing import SpanExporter, Tracer, tracer
+
+
+class MemoryExporter(SpanExporter):
+    def __init__(self):
+        self.traces = []
+        super().__init__()
+
+    def export(self, spans):
+        self.traces.append(spans)
+
+
+def test_child_spans_share_the_trace():
+    exporter = MemoryExporter()
+    local = Tracer(exporter, sample_rate=1.0)
+
+    with local.start_trace("initiate_refund", order_id="123"):
+        with local.span("policy_fetch", cache="miss"):
+            with local.span("llm.analyze_policy", prompt_chars=42):
+                pass
+    exporter.flush()
+
+    spans = {s["name"]: s for s in exporter.traces[0]}
+    assert spans["initiate_refund"]["attributes"]["order_id"] == "123"
+    assert spans["policy_fetch"]["parent_span_id"] == spans["initiate_refund"]["span_id"]
+    assert spans["llm.analyze_policy"]["parent_span_id"] == spans["policy_fetch"]["span_id"]
+    assert len({s["trace_id"] for s in spans.values()}) == 1
+
+
+def test_unsampled_traces_record_nothing():
+    exporter = MemoryExporter()
+    local = Tracer(exporter, sample_rate=0.0)
+
+    with local.start_trace("handle_response") as root:
+        with local.span("llm.analyze_response") as child:
+            assert root is None and child is None
+    exporter.flush()
+
+    assert exporter.traces == []
+
+
+def test_agent_workflow_is_traced(fake_agent, monkeypatch):
+    exporter = MemoryExporter()
+    monkeypatch.setattr(tracer, "exporter", exporter)
+    monkeypatch.setattr(tracer, "sample_rate", 1.0)
+
+    asyncio.run(fake_agent.initiate_refund("amazon", "ORD-1", "Item damaged"))
+    exporter.flush()
+
+    root = exporter.traces[0][-1]
+    assert root["name"] == "initiate_refund"
+    assert root["attributes"] == {"order_id": "ORD-1", "platform": "amazon", "result_status": "initiated"}
+
+
+def test_exporter_without_export_cannot_be_built():
+    class NoExport(SpanExporter):
+        pass
+
+    with pytest.raises(TypeError):
+        NoExport()
@@ -0,0 +1,56 @@
+import asyncio
+import io
+
+import pytest
+from PIL import Image
+
+from fakes import FakeUpload
+from utils.blobs import BlobStore
+from utils.uploads import BufferReader, UploadRejected, sniff_type, store_receipt
+
+
+def _png(width: int = 32, height: int = 16) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), "white").save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_sniff_type_recognises_receipt_formats():
+    assert sniff_type(_png()) == "image/png"
+    assert sniff_type(b"\xff\xd8\xff\xe0rest") == "image/jpeg"
+    assert sniff_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "image/webp"
+    assert sniff_type(b"<html>") is None
+
+
+def test_store_receipt_streams_upload_into_the_store(tmp_path):
+    store = BlobStore(str(tmp_path))
+    data = _png(400, 400)
+
+    ref = asyncio.run(store_receipt(FakeUpload(data, size=len(data)), store))
+
+    assert (ref.size, ref.content_type) == (len(data), "image/png")
+    assert store.read(ref) == data
+
+
+def test_store_receipt_rejects_wrong_type_and_oversize(tmp_path):
+    store = BlobStore(str(tmp_path))
+    with pytest.raises(UploadRejected) as wrong_type:
+        asyncio.run(store_receipt(FakeUpload(b"%!PS-Adobe-3.0 not an image"), store))
+    assert wrong_type.value.status_code == 415
+
+    data = _png(400, 400)
+    with pytest.raises(UploadRejected) as declared_too_big:
+        asyncio.run(store_receipt(FakeUpload(data, size=len(data)), store, max_bytes=len(data) - 1))
+    assert declared_too_big.value.status_code == 413
+
+    with pytest.raises(UploadRejected) as too_big:
+        asyncio.run(store_receipt(FakeUpload(data), store, max_bytes=len(data) - 1))
+    assert too_big.value.status_code == 413
+
+
+def test_pil_decodes_from_buffer_reader():
+    view = memoryview(bytearray(_png(20, 10)))
+
+    image = Image.open(BufferReader(view))
+
+    assert image.size == (20, 10)
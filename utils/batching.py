@@ -0,0 +1,76 @@
+"""
+Micro-batching of concurrent async calls.
+
+Callers ``submit`` one item each and await their own result. Items are
+collected until ``max_items`` are pending or ``max_wait`` seconds have
+passed since the first one arrived, then handed to ``flush`` as a list;
+its results are fanned back out in order. A caller that gives up while
+waiting (deadline, disconnect) is dropped from the batch if it has not
+been sent yet.
+"""
+import asyncio
+from typing import Awaitable, Callable, Generic, List, Optional, Tuple, TypeVar
+
+from prometheus_client import Histogram
+
+from utils.deadlines import deadline_scope
+from utils.tokens import current_usage_scope, shared_usage_scope
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+BATCH_SIZE = Histogram(
+    "refund_batch_size",
+    "Items per flushed micro-batch",
+    ["batcher"],
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+
+class MicroBatcher(Generic[T, R]):
+    def __init__(self, name: str, flush: Callable[[List[T]], Awaitable[List[R]]],
+                 max_items: int = 8, max_wait: float = 0.05):
+        self.name = name
+        self.flush = flush
+        self.max_items = max_items
+        self.max_wait = max_wait
+        self._pending: List[Tuple[T, asyncio.Future, Optional[Tuple[str, str]]]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, current_usage_scope()))
+        if len(self._pending) >= self.max_items:
+            self._flush_pending()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush_pending)
+        return await future
+
+    def _flush_pending(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = [entry for entry in self._pending if not entry[1].done()]
+        self._pending = []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[T, asyncio.Future, Optional[Tuple[str, str]]]]) -> None:
+        BATCH_SIZE.labels(self.name).observe(len(batch))
+        # Shared by every caller in the batch; each caller bounds its own wait instead,
+        # and token usage is split across the callers' orders
+        with deadline_scope(None), shared_usage_scope([scope for _, _, scope in batch]):
+            try:
+                results = await self.flush([item for item, _, _ in batch])
+            except Exception as e:
+                results, error = [], e
+            else:
+                error = RuntimeError(f"{self.name} batch returned {len(results)} results for {len(batch)} items")
+        for index, (_, future, _) in enumerate(batch):
+            if future.done():
+                continue
+            if index < len(results):
+                future.set_result(results[index])
+            else:
+                future.set_exception(error)
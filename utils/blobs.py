@@ -0,0 +1,102 @@
+"""
+Content-addressed store for evidence files on local disk.
+
+A blob is stored once under the SHA-256 of its bytes, in two levels of
+shard directories (``ab/cd/abcd...``) so no directory grows too large.
+Uploading the same receipt again finds the existing file and writes
+nothing. Writers stream chunks to a temporary file while hashing, then
+fsync and rename it into place, so a blob on disk is always complete and
+the upload never has to be held in memory. Readers get a ``memoryview``
+over a read-only mmap: the bytes stay in the page cache rather than the
+Python heap, and are unmapped when the last view is dropped.
+
+The pipeline passes ``BlobRef`` objects (digest, size, content type)
+instead of receipt bytes, and keeps them so escalations can point to
+the original evidence.
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+from typing import Optional, Union
+
+from pydantic import BaseModel
+
+from utils.metrics import record_cache
+
+
+class BlobRef(BaseModel):
+    digest: str
+    size: int
+    content_type: Optional[str] = None
+
+
+class BlobWriter:
+    """Incoming blob: ``write`` chunks, then ``commit`` once (or leave the block to discard it)"""
+
+    def __init__(self, store: "BlobStore"):
+        self.store = store
+        self.size = 0
+        self._hash = hashlib.sha256()
+        os.makedirs(store.root, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=store.root, prefix=".incoming-", delete=False)
+
+    def __enter__(self) -> "BlobWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if not self._file.closed:
+            self._file.close()
+            os.unlink(self._file.name)
+
+    def write(self, chunk) -> None:
+        self._hash.update(chunk)
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self, content_type: Optional[str] = None) -> BlobRef:
+        """Move the file into place under its digest; blocks on fsync, so call it off the event loop"""
+        digest = self._hash.hexdigest()
+        path = self.store.path(digest)
+        exists = os.path.exists(path)
+        record_cache("evidence_blob", exists)
+        if exists:
+            self._file.close()
+            os.unlink(self._file.name)
+        else:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Concurrent writers of the same content race harmlessly: both files are identical
+            os.replace(self._file.name, path)
+        return BlobRef(digest=digest, size=self.size, content_type=content_type)
+
+
+class BlobStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, digest: str) -> str:
+        if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+            raise ValueError(f"Not a blob digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def writer(self) -> BlobWriter:
+        return BlobWriter(self)
+
+    def put(self, data, content_type: Optional[str] = None) -> BlobRef:
+        with self.writer() as writer:
+            writer.write(data)
+            return writer.commit(content_type)
+
+    def exists(self, ref: Union[BlobRef, str]) -> bool:
+        return os.path.exists(self.path(ref.digest if isinstance(ref, BlobRef) else ref))
+
+    def read(self, ref: Union[BlobRef, str]) -> memoryview:
+        """Zero-copy, read-only view of a blob; FileNotFoundError if it is not stored"""
+        with open(self.path(ref.digest if isinstance(ref, BlobRef) else ref), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"")
+            # The mapping outlives the file object and is released with the last view of it
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
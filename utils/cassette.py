@@ -0,0 +1,167 @@
+"""
+Record/replay transport for the OpenAI chat completions client.
+
+Set ``LLM_CASSETTE`` to a file path and ``LLM_CASSETTE_MODE`` to ``record``
+or ``replay``. When recording, every chat completion made by an
+``OpenAIComponent`` goes to the real client. Its reply text, token usage
+and latency are kept under a hash of the request and written as a
+gzipped JSON-lines cassette on ``save``. Prompts and images are not
+stored, so a cassette of a full workflow is a few kilobytes.
+
+When replaying, no client is created and no network is touched: the
+reply for an identical request is returned, optionally after sleeping
+its recorded latency times ``LLM_CASSETTE_LATENCY`` (default 0). This
+makes refund workflows reproducible for benchmarks and profiling on a
+machine without an API key. Timestamps in prompts are masked before
+hashing, so prompts that embed the current time still match. A request
+made several times replays its recordings in order and then repeats the
+last one. A request that was never recorded raises ``CassetteMiss``, and
+the calling component falls back as it would for any other LLM failure.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from prometheus_client import Counter
+
+MODES = ("record", "replay")
+# ISO-8601 times (e.g. processing_timestamp in evidence JSON) differ on every run
+_TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?")
+
+CASSETTE_CALLS = Counter(
+    "refund_llm_cassette_calls_total",
+    "LLM calls served by the cassette transport, by mode and result (recorded/replayed/miss)",
+    ["mode", "result"],
+)
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+def request_key(model: str, messages: List[Dict[str, Any]], temperature: float) -> str:
+    canonical = json.dumps({"model": model, "messages": messages, "temperature": temperature},
+                           sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(_TIMESTAMP.sub("<time>", canonical).encode()).hexdigest()[:32]
+
+
+def _response(content: str, usage: Optional[Dict[str, int]]) -> SimpleNamespace:
+    """Just the parts of a ChatCompletion that OpenAIComponent reads"""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(**usage) if usage else None
+    )
+
+
+class Cassette:
+    """Stands in for ``AsyncOpenAI``: ``cassette.chat.completions.create(...)``"""
+
+    def __init__(self, path: str, mode: str = "replay", client: Any = None, latency_factor: float = 0.0):
+        if mode not in MODES:
+            raise ValueError(f"Cassette mode must be one of {MODES}, not {mode!r}")
+        if mode == "record" and client is None:
+            raise ValueError("Recording needs a client to record from")
+        self.path = path
+        self.mode = mode
+        self.inner = client
+        self.latency_factor = latency_factor
+        self.entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._replayed: Dict[str, int] = defaultdict(int)
+        self.chat = self.completions = self
+        if mode == "replay":
+            self._load()
+
+    def __len__(self) -> int:
+        return sum(len(recorded) for recorded in self.entries.values())
+
+    async def create(self, model: str, messages: List[Dict[str, Any]], temperature: float, **kwargs) -> Any:
+        key = request_key(model, messages, temperature)
+        if self.mode == "record":
+            return await self._record(key, model, messages, temperature, **kwargs)
+        return await self._replay(key, model)
+
+    async def _record(self, key: str, model: str, messages: List[Dict[str, Any]],
+                      temperature: float, **kwargs) -> Any:
+        started = time.perf_counter()
+        response = await self.inner.chat.completions.create(
+            model=model, messages=messages, temperature=temperature, **kwargs
+        )
+        usage = response.usage
+        self.entries[key].append({
+            "key": key,
+            "model": model,
+            "latency": round(time.perf_counter() - started, 4),
+            "content": response.choices[0].message.content,
+            "usage": {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+            if usage else None,
+        })
+        CASSETTE_CALLS.labels("record", "recorded").inc()
+        return response
+
+    async def _replay(self, key: str, model: str) -> Any:
+        recorded = self.entries.get(key)
+        if not recorded:
+            CASSETTE_CALLS.labels("replay", "miss").inc()
+            raise CassetteMiss(f"No {model} call recorded for request {key} in {self.path}")
+        entry = recorded[min(self._replayed[key], len(recorded) - 1)]
+        self._replayed[key] += 1
+        if self.latency_factor > 0:
+            await asyncio.sleep(entry["latency"] * self.latency_factor)
+        CASSETTE_CALLS.labels("replay", "replayed").inc()
+        return _response(entry["content"], entry["usage"])
+
+    def save(self) -> None:
+        """Write every recorded call; a no-op when replaying"""
+        if self.mode != "record":
+            return
+        try:
+            tmp = self.path + ".tmp"
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                for recorded in self.entries.values():
+                    for entry in recorded:
+                        f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            os.replace(tmp, self.path)
+        except Exception as e:
+            logger.error(f"Error saving LLM cassette {self.path}: {str(e)}")
+
+    def _load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                self.entries[entry["key"]].append(entry)
+
+
+_cassette: Optional[Cassette] = None
+
+
+def cassette_from_env(make_client) -> Optional[Cassette]:
+    """The process-wide cassette configured by LLM_CASSETTE, shared by every component.
+
+    ``make_client`` builds the real client and is only called when recording.
+    """
+    global _cassette
+    path = os.getenv("LLM_CASSETTE")
+    if not path:
+        return None
+    if _cassette is None or _cassette.path != path:
+        mode = os.getenv("LLM_CASSETTE_MODE", "replay")
+        _cassette = Cassette(
+            path,
+            mode=mode,
+            client=make_client() if mode == "record" else None,
+            latency_factor=float(os.getenv("LLM_CASSETTE_LATENCY", 0))
+        )
+    return _cassette
+
+
+def save_cassette() -> None:
+    if _cassette is not None:
+        _cassette.save()
@@ -0,0 +1,160 @@
+"""
+Latency-SLO circuit breakers for LLM call sites and policy hosts.
+
+A breaker counts a call as failed when it raises or takes longer than its
+latency SLO, and every call is cut off at ``timeout`` with ``CircuitTimeout``
+(not ``asyncio.TimeoutError``, so it is never mistaken for the request's
+own deadline passing). When the failure
+rate over the last ``window`` calls reaches ``failure_rate`` the breaker
+opens: calls are rejected at once with ``CircuitOpen``, which components
+already handle by answering from their local fallbacks. After
+``open_seconds`` a single probe call is let through (half-open); it
+closes the breaker on success and re-opens it on failure.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Deque, Dict, Optional, TypeVar
+
+from prometheus_client import Counter, Gauge
+
+T = TypeVar("T")
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+CIRCUIT_STATE = Gauge(
+    "refund_circuit_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["breaker"],
+)
+CIRCUIT_REJECTIONS = Counter(
+    "refund_circuit_rejections_total",
+    "Calls answered by a local fallback because the breaker was open",
+    ["breaker"],
+)
+CIRCUIT_TIMEOUTS = Counter(
+    "refund_circuit_timeouts_total",
+    "Calls cut off at the breaker's timeout",
+    ["breaker"],
+)
+
+# Latency SLO per LLM call site (seconds); calls are cut off at 3x the SLO
+LLM_LATENCY_SLOS: Dict[str, float] = {
+    "analyze_policy": 20.0,
+    "process_receipt": 10.0,
+    "process_receipt_image": 15.0,
+    "validate_evidence": 8.0,
+    "generate_request": 20.0,
+    "generate_escalation": 20.0,
+    "generate_consolidated_request": 25.0,
+    "personalize_request": 5.0,
+    "analyze_response": 8.0,
+    "analyze_response_batch": 12.0,
+}
+DEFAULT_LATENCY_SLO = 10.0
+POLICY_HOST_SLO = 5.0
+
+
+class CircuitOpen(Exception):
+    def __init__(self, name: str):
+        super().__init__(f"circuit {name} is open")
+        self.name = name
+
+
+class CircuitTimeout(Exception):
+    def __init__(self, name: str, timeout: float):
+        super().__init__(f"circuit {name} call took longer than {timeout:.1f}s")
+        self.name = name
+        self.timeout = timeout
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, latency_slo: float, timeout: Optional[float] = None,
+                 failure_rate: float = 0.5, window: int = 20, min_calls: int = 5,
+                 open_seconds: float = 30.0):
+        self.name = name
+        self.latency_slo = latency_slo
+        self.timeout = timeout if timeout is not None else latency_slo * 3
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+        CIRCUIT_STATE.labels(name).set(0)
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; in half-open state only one probe at a time"""
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._set_state(HALF_OPEN)
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record(self, ok: bool) -> None:
+        if self.state == HALF_OPEN:
+            self._probing = False
+            if ok:
+                self._outcomes.clear()
+                self._set_state(CLOSED)
+            else:
+                self._trip()
+            return
+        self._outcomes.append(ok)
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+            self._trip()
+
+    async def call(self, work: Awaitable[T]) -> T:
+        """Run ``work`` through the breaker, or raise CircuitOpen without starting it"""
+        if not self.allow():
+            if asyncio.iscoroutine(work):
+                work.close()
+            CIRCUIT_REJECTIONS.labels(self.name).inc()
+            raise CircuitOpen(self.name)
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(work, timeout=self.timeout)
+        except asyncio.CancelledError:
+            # Our caller gave up (deadline, disconnect); that says nothing about the dependency
+            self._probing = False
+            raise
+        except asyncio.TimeoutError:
+            self.record(False)
+            CIRCUIT_TIMEOUTS.labels(self.name).inc()
+            raise CircuitTimeout(self.name, self.timeout) from None
+        except Exception:
+            self.record(False)
+            raise
+        self.record(time.monotonic() - started <= self.latency_slo)
+        return result
+
+    def _trip(self) -> None:
+        self._opened_at = time.monotonic()
+        self._set_state(OPEN)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        CIRCUIT_STATE.labels(self.name).set(_STATE_VALUES[state])
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def llm_breaker(call_site: str) -> CircuitBreaker:
+    name = f"llm:{call_site}"
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(name, LLM_LATENCY_SLOS.get(call_site, DEFAULT_LATENCY_SLO))
+    return _breakers[name]
+
+
+def host_breaker(host: str) -> CircuitBreaker:
+    name = f"policy_host:{host}"
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker(name, POLICY_HOST_SLO)
+    return _breakers[name]
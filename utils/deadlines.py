@@ -0,0 +1,137 @@
+"""
+Per-request deadlines and cancellation accounting.
+
+A ``Deadline`` is set for the duration of a RefundAgent call and carried in
+a context variable, the same way usage scopes and trace spans are, so
+every component sees it without an extra parameter on each interface
+method. LLM and OCR stages call ``ensure_budget`` before starting; if too
+little time remains they raise ``DeadlineExceeded`` and the component
+falls back to its local answer. In-flight work is bounded with
+``within_deadline``; work cancelled because the client went away is
+counted with ``record_cancelled``.
+"""
+import asyncio
+import functools
+import inspect
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+from prometheus_client import Counter
+
+T = TypeVar("T")
+
+# Time a stage needs to be worth starting; below this it is skipped
+STAGE_MIN_SECONDS = {
+    "ocr": 1.0,
+    "analyze_policy": 2.0,
+    "process_receipt": 2.0,
+    "process_receipt_image": 3.0,
+    "validate_evidence": 1.5,
+    "generate_request": 3.0,
+    "generate_escalation": 3.0,
+    "generate_consolidated_request": 3.0,
+    "personalize_request": 1.0,
+    "analyze_response": 1.5,
+    "analyze_response_batch": 2.0,
+}
+DEFAULT_STAGE_MIN_SECONDS = 1.0
+
+WORK_SKIPPED = Counter(
+    "refund_work_skipped_total",
+    "Stages not run or cut short: deadline (skipped), timeout (cut short), cancelled (client gone)",
+    ["stage", "reason"],
+)
+TOKENS_SAVED = Counter(
+    "refund_tokens_saved_total",
+    "Estimated prompt tokens not spent because an LLM call was skipped or cancelled",
+    ["call_site"],
+)
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, stage: str, remaining: float):
+        super().__init__(f"{stage} skipped: {max(remaining, 0.0):.2f}s left before the deadline")
+        self.stage = stage
+        self.remaining = remaining
+
+
+class Deadline:
+    """Absolute point in time by which a request must have answered"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("refund_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def remaining() -> float:
+    """Seconds left for the current request; infinite outside a deadline"""
+    deadline = _current.get()
+    return math.inf if deadline is None else deadline.remaining()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]) -> Iterator[None]:
+    """Run a block under ``deadline``; ``None`` detaches shared background work from it"""
+    token = _current.set(deadline)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def bind_deadline(func):
+    """Run an async RefundAgent method under the ``deadline`` argument it was given"""
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        deadline = signature.bind(*args, **kwargs).arguments.get("deadline")
+        if deadline is None:
+            return await func(*args, **kwargs)
+        with deadline_scope(deadline):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+def ensure_budget(stage: str, estimated_tokens: int = 0) -> None:
+    """Raise DeadlineExceeded if too little time is left to start ``stage``"""
+    left = remaining()
+    if left >= STAGE_MIN_SECONDS.get(stage, DEFAULT_STAGE_MIN_SECONDS):
+        return
+    WORK_SKIPPED.labels(stage, "deadline").inc()
+    if estimated_tokens:
+        TOKENS_SAVED.labels(stage).inc(estimated_tokens)
+    raise DeadlineExceeded(stage, left)
+
+
+async def within_deadline(stage: str, work: Awaitable[T], estimated_tokens: int = 0) -> T:
+    """Await ``work`` but give up, cancelling it, when the deadline passes"""
+    left = remaining()
+    try:
+        if math.isinf(left):
+            return await work
+        return await asyncio.wait_for(work, timeout=max(left, 0.0))
+    except asyncio.TimeoutError:
+        WORK_SKIPPED.labels(stage, "timeout").inc()
+        raise DeadlineExceeded(stage, remaining())
+    except asyncio.CancelledError:
+        record_cancelled(stage, estimated_tokens)
+        raise
+
+
+def record_cancelled(stage: str, estimated_tokens: int = 0, count: int = 1) -> None:
+    WORK_SKIPPED.labels(stage, "cancelled").inc(count)
+    if estimated_tokens:
+        TOKENS_SAVED.labels(stage).inc(estimated_tokens)
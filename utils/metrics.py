@@ -0,0 +1,110 @@
+"""
+Prometheus metrics for the refund pipeline.
+
+Every stage records into the default registry; ``main.py`` exposes it on
+``/metrics``.
+"""
+import functools
+import time
+from typing import Any, Dict
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Buckets span local work (ms) up to slow GPT-4 completions (tens of seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+STAGE_LATENCY = Histogram(
+    "refund_stage_duration_seconds",
+    "Time spent in a pipeline stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_LATENCY = Histogram(
+    "refund_llm_call_duration_seconds",
+    "Time spent waiting on an LLM call",
+    ["call_site"],
+    buckets=LATENCY_BUCKETS,
+)
+WORKFLOW_LATENCY = Histogram(
+    "refund_workflow_duration_seconds",
+    "End-to-end duration of RefundAgent operations",
+    ["operation", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "refund_llm_tokens_total",
+    "Tokens sent to and received from the LLM",
+    ["call_site", "kind"],
+)
+CACHE_LOOKUPS = Counter(
+    "refund_cache_lookups_total",
+    "Cache lookups by cache and result (hit/miss)",
+    ["cache", "result"],
+)
+FALLBACKS = Counter(
+    "refund_fallbacks_total",
+    "Times a local fallback was used instead of the normal path",
+    ["fallback"],
+)
+RECEIPT_EXTRACTIONS = Counter(
+    "refund_receipt_extractions_total",
+    "Receipt field extractions by merchant layout and path (local/llm/vision)",
+    ["merchant", "path"],
+)
+RECEIPT_ROUTES = Counter(
+    "refund_receipt_routes_total",
+    "Receipt extraction route chosen (ocr/vision) and why",
+    ["route", "reason"],
+)
+MESSAGE_PATHS = Counter(
+    "refund_message_generations_total",
+    "Messages generated, by kind and path (template/template+llm/llm)",
+    ["kind", "path"],
+)
+IN_FLIGHT = Gauge(
+    "refund_requests_in_flight",
+    "HTTP requests currently being processed",
+    ["endpoint"],
+)
+
+
+def record_llm_usage(call_site: str, prompt_tokens: int, completion_tokens: int) -> None:
+    LLM_TOKENS.labels(call_site, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(call_site, "completion").inc(completion_tokens)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_fallback(fallback: str) -> None:
+    FALLBACKS.labels(fallback).inc()
+
+
+def record_receipt_extraction(merchant: str, path: str) -> None:
+    RECEIPT_EXTRACTIONS.labels(merchant, path).inc()
+
+
+def record_receipt_route(route: str, reason: str) -> None:
+    RECEIPT_ROUTES.labels(route, reason).inc()
+
+
+def record_message_path(kind: str, path: str) -> None:
+    MESSAGE_PATHS.labels(kind, path).inc()
+
+
+def observe_workflow(operation: str):
+    """Time an async RefundAgent method, labelled by the returned status"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs) -> Dict[str, Any]:
+            started = time.perf_counter()
+            status = "exception"
+            try:
+                result = await func(*args, **kwargs)
+                status = result.get("status", "unknown")
+                return result
+            finally:
+                WORKFLOW_LATENCY.labels(operation, status).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
@@ -0,0 +1,67 @@
+"""
+Model routing per LLM call site and prompt size.
+
+Classification and extraction call sites go to a small, fast model while
+their prompts are short; generation and anything large stays on the big
+model. A small-model answer that fails the caller's acceptance check
+(unparseable JSON, missing fields, low self-reported confidence) is
+retried once on the large model. Per-route latency and acceptance rates
+are exported so the thresholds below can be tuned from production data.
+"""
+import os
+from typing import Dict, List, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from utils.metrics import LATENCY_BUCKETS
+
+MODEL_TIERS: Dict[str, str] = {
+    "small": os.getenv("MODEL_TIER_SMALL", "gpt-4o-mini"),
+    "large": os.getenv("MODEL_TIER_LARGE", "gpt-4"),
+}
+
+# call site -> [(max estimated prompt tokens, tier)], first match wins; otherwise "large"
+ROUTES: Dict[str, List[Tuple[int, str]]] = {
+    "analyze_policy": [(1500, "small")],
+    "analyze_response": [(800, "small")],
+    "analyze_response_batch": [(4000, "small")],
+    "process_receipt": [(2000, "small")],
+    "validate_evidence": [(1500, "small")],
+}
+
+ROUTE_LATENCY = Histogram(
+    "refund_model_route_duration_seconds",
+    "LLM call latency by call site and model tier",
+    ["call_site", "tier"],
+    buckets=LATENCY_BUCKETS,
+)
+ROUTE_OUTCOMES = Counter(
+    "refund_model_route_outcomes_total",
+    "Small-tier answers accepted, or upgraded to the large tier on failed checks",
+    ["call_site", "tier", "outcome"],
+)
+
+
+def pinned_tier(call_site: str) -> str:
+    """MODEL_ROUTE_<CALL_SITE>=small|large forces a tier for one call site"""
+    return os.getenv(f"MODEL_ROUTE_{call_site.upper()}", "")
+
+
+def route_model(call_site: str, prompt_tokens: int) -> Tuple[str, str]:
+    """Return ``(tier, model)`` for a prompt of ``prompt_tokens`` at ``call_site``"""
+    tier = pinned_tier(call_site)
+    if tier not in MODEL_TIERS:
+        tier = next((t for limit, t in ROUTES.get(call_site, []) if prompt_tokens <= limit), "large")
+    return tier, MODEL_TIERS[tier]
+
+
+def upgrade_tier(tier: str) -> str:
+    return "large" if tier == "small" else ""
+
+
+def record_route(call_site: str, tier: str, latency: float) -> None:
+    ROUTE_LATENCY.labels(call_site, tier).observe(latency)
+
+
+def record_route_outcome(call_site: str, tier: str, accepted: bool) -> None:
+    ROUTE_OUTCOMES.labels(call_site, tier, "accepted" if accepted else "upgraded").inc()
@@ -0,0 +1,235 @@
+"""
+Columnar store of refund outcomes for success analytics.
+
+Every ``initiate_refund``, ``initiate_consolidated_refund`` and
+``handle_response`` result is appended as one row per order: time,
+platform, operation, status, escalation depth, latency, tokens, order
+amount and, for replies, seconds since the request was sent. Each column
+is a typed ``array.array`` (strings are dictionary-encoded to small
+ints), so a million rows take about 40 MB and an append is a handful of
+C-level pushes. Queries view the columns as numpy arrays without copying
+and aggregate with vectorized group-bys, which takes milliseconds over
+millions of rows. With a ``path`` the columns are appended to one binary
+file each on ``flush`` and loaded back on start.
+"""
+import functools
+import inspect
+import json
+import math
+import os
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Sequence
+
+from loguru import logger
+
+from utils.tokens import ledger
+
+# column -> array typecode
+COLUMNS = {
+    "ts": "d",
+    "platform": "H",
+    "operation": "B",
+    "status": "B",
+    "escalation_depth": "H",
+    "latency": "f",
+    "tokens": "I",
+    "amount": "d",
+    "since_start": "f",
+}
+# Dictionary-encoded columns
+CATEGORICAL = ("platform", "operation", "status")
+# Distinct values kept per categorical column (and never more than its typecode holds);
+# later new values are all counted under OTHER
+MAX_CATEGORIES = 1000
+OTHER = "other"
+WEEK_SECONDS = 7 * 24 * 3600
+# 1970-01-01 was a Thursday; shift so weeks start on Monday
+_MONDAY_OFFSET = 3 * 24 * 3600
+
+
+class OutcomeStore:
+    def __init__(self, path: Optional[str] = None, flush_rows: int = 1000):
+        self.path = path
+        self.flush_rows = flush_rows
+        self.columns: Dict[str, array] = {name: array(code) for name, code in COLUMNS.items()}
+        self.codes: Dict[str, Dict[str, int]] = {name: {} for name in CATEGORICAL}
+        self._flushed = 0
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self.columns["ts"])
+
+    def append(self, platform: str, operation: str, status: str, escalation_depth: int = 0,
+               latency: float = 0.0, tokens: int = 0, amount: Optional[float] = None,
+               since_start: Optional[float] = None, ts: Optional[float] = None) -> None:
+        row = {
+            "ts": time.time() if ts is None else ts,
+            "platform": self._code("platform", platform),
+            "operation": self._code("operation", operation),
+            "status": self._code("status", status),
+            "escalation_depth": escalation_depth,
+            "latency": latency,
+            "tokens": tokens,
+            "amount": math.nan if amount is None else amount,
+            "since_start": math.nan if since_start is None else since_start,
+        }
+        for name, value in row.items():
+            self.columns[name].append(value)
+        if self.path and len(self) - self._flushed >= self.flush_rows:
+            self.flush()
+
+    def success_rate(self, operation: str = "handle_response",
+                     platform: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Approved share of decided replies (success or rejected) per platform and week"""
+        import numpy as np
+
+        if not len(self):
+            return []
+        cols = self._view(np, "ts", "platform", "operation", "status")
+        rows = cols["operation"] == self.codes["operation"].get(operation, -1)
+        if platform is not None:
+            rows &= cols["platform"] == self.codes["platform"].get(platform, -1)
+        success = cols["status"] == self.codes["status"].get("success", -1)
+        decided = rows & (success | (cols["status"] == self.codes["status"].get("rejected", -1)))
+        # ts is positive, so truncating is flooring (and far cheaper than float //)
+        weeks = ((cols["ts"] + _MONDAY_OFFSET) * (1 / WEEK_SECONDS)).astype(np.int32)
+        first_week = int(weeks.min())
+        n_weeks = int(weeks.max()) - first_week + 1
+        key = cols["platform"].astype(np.int32) * n_weeks + (weeks - first_week)
+        size = len(self.codes["platform"]) * n_weeks
+        decided_counts = np.bincount(key, weights=decided, minlength=size).astype(np.int64)
+        success_counts = np.bincount(key, weights=decided & success, minlength=size).astype(np.int64)
+        platforms = {code: name for name, code in self.codes["platform"].items()}
+        results = []
+        for index in np.flatnonzero(decided_counts):
+            platform, week = divmod(int(index), n_weeks)
+            week_start = (first_week + week) * WEEK_SECONDS - _MONDAY_OFFSET
+            results.append({
+                "platform": platforms[platform],
+                "week": time.strftime("%Y-%m-%d", time.gmtime(week_start)),
+                "decided": int(decided_counts[index]),
+                "approved": int(success_counts[index]),
+                "success_rate": float(success_counts[index] / decided_counts[index]),
+            })
+        return results
+
+    def median_time_to_approval(self, platform: Optional[str] = None) -> Optional[float]:
+        """Median seconds from sending a request to the reply that approved it"""
+        import numpy as np
+
+        if not len(self):
+            return None
+        cols = self._view(np, "platform", "status", "since_start")
+        approved = (cols["status"] == self.codes["status"].get("success", -1)) & ~np.isnan(cols["since_start"])
+        if platform is not None:
+            approved &= cols["platform"] == self.codes["platform"].get(platform, -1)
+        if not approved.any():
+            return None
+        return float(np.median(cols["since_start"][approved]))
+
+    def flush(self) -> None:
+        """Append rows not yet on disk to the column files"""
+        if not self.path or self._flushed == len(self):
+            return
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            for name, column in self.columns.items():
+                with open(os.path.join(self.path, f"{name}.bin"), "ab") as f:
+                    column[self._flushed:].tofile(f)
+            tmp = os.path.join(self.path, "codes.json.tmp")
+            with open(tmp, "w") as f:
+                json.dump(self.codes, f)
+            os.replace(tmp, os.path.join(self.path, "codes.json"))
+            self._flushed = len(self)
+        except Exception as e:
+            logger.error(f"Error flushing outcome store: {str(e)}")
+
+    def _code(self, column: str, value: str) -> int:
+        codes = self.codes[column]
+        if value not in codes:
+            # Keep the last code free for OTHER so no row is ever dropped
+            limit = min(MAX_CATEGORIES, 1 << (8 * self.columns[column].itemsize))
+            if len(codes) >= limit - 1:
+                value = OTHER
+            codes.setdefault(value, len(codes))
+        return codes[value]
+
+    def _view(self, np, *names: str) -> Dict[str, Any]:
+        # Zero-copy views; they must not outlive the query, or appends would fail
+        # while the arrays' buffers are exported
+        n = len(self)
+        return {name: np.frombuffer(self.columns[name], dtype=np.dtype(COLUMNS[name]))[:n] for name in names}
+
+    def _load(self) -> None:
+        try:
+            with open(os.path.join(self.path, "codes.json")) as f:
+                self.codes.update(json.load(f))
+            sizes = {name: os.path.getsize(os.path.join(self.path, f"{name}.bin")) // self.columns[name].itemsize
+                     for name in COLUMNS}
+        except FileNotFoundError:
+            return
+        # A crash mid-flush can leave columns of different lengths; keep only complete rows
+        rows = min(sizes.values())
+        for name, column in self.columns.items():
+            file_path = os.path.join(self.path, f"{name}.bin")
+            with open(file_path, "rb") as f:
+                column.fromfile(f, rows)
+            os.truncate(file_path, rows * column.itemsize)
+        self._flushed = rows
+
+
+def record_outcome(operation: str):
+    """Append the result of an async RefundAgent method to ``outcomes``, one row per order"""
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs) -> Dict[str, Any]:
+            arguments = signature.bind(*args, **kwargs).arguments
+            agent = arguments["self"]
+            order_ids = _order_ids(arguments)
+            tokens_before = {order_id: _tokens(order_id) for order_id in order_ids}
+            started = time.perf_counter()
+            status = "exception"
+            try:
+                result = await func(*args, **kwargs)
+                status = result.get("status", "unknown")
+                return result
+            finally:
+                latency = time.perf_counter() - started
+                for order_id in order_ids:
+                    try:
+                        outcomes.append(
+                            platform=_platform(agent, arguments["platform"]),
+                            operation=operation,
+                            status=status,
+                            latency=latency,
+                            tokens=_tokens(order_id) - tokens_before[order_id],
+                            **agent.outcome_fields(order_id)
+                        )
+                    except Exception as e:
+                        logger.error(f"Error recording outcome: {str(e)}")
+        return wrapper
+    return decorator
+
+
+def _order_ids(arguments: Dict[str, Any]) -> Sequence[str]:
+    if "orders" in arguments:
+        return [order["order_id"] for order in arguments["orders"]]
+    return [arguments["order_id"]]
+
+
+def _platform(agent, name: str) -> str:
+    """One category per registered platform, however the request spelled it"""
+    platforms = getattr(agent.policy_fetcher, "platforms", None)
+    return platforms.canonical(name) if platforms is not None else name
+
+
+def _tokens(order_id: str) -> int:
+    usage = ledger.order_usage(order_id)
+    return usage["prompt_tokens"] + usage["completion_tokens"] if usage else 0
+
+
+outcomes = OutcomeStore(os.getenv("OUTCOME_STORE_PATH"))
@@ -0,0 +1,129 @@
+"""
+Priority scheduling of refund work.
+
+``PriorityScheduler`` bounds how many refund workflows run their LLM stages
+at once. While there is spare capacity work starts immediately; during a
+backlog waiters are admitted by priority class, so a $2,000 laptop refund
+close to its policy deadline does not queue behind hundreds of $5 claims.
+Within a class the platform served least recently goes next, so one
+platform's flood cannot starve the others, and a waiter moves up one class
+for every ``promote_after`` seconds it has waited so low-value claims are
+still served eventually.
+"""
+import asyncio
+import time
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional, Tuple
+
+from prometheus_client import Gauge, Histogram
+
+from utils.deadlines import within_deadline
+from utils.metrics import LATENCY_BUCKETS
+
+# Most to least urgent
+PRIORITY_CLASSES = ("urgent", "high", "normal", "low", "expired")
+
+QUEUE_WAIT = Histogram(
+    "refund_queue_wait_seconds",
+    "Time refund work waited for a scheduler slot",
+    ["priority"],
+    buckets=LATENCY_BUCKETS,
+)
+QUEUE_DEPTH = Gauge(
+    "refund_queue_depth",
+    "Refund work waiting for a scheduler slot",
+    ["priority"],
+)
+
+
+class _Waiter:
+    def __init__(self, platform: str, priority: str, future: asyncio.Future):
+        self.platform = platform
+        self.priority = priority
+        self.rank = PRIORITY_CLASSES.index(priority)
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+
+class PriorityScheduler:
+    def __init__(self, capacity: Optional[int] = None, promote_after: float = 30.0):
+        """``capacity`` None runs everything at once (waits are still recorded)"""
+        self.capacity = capacity
+        self.promote_after = promote_after
+        self.active = 0
+        self._queues: Dict[Tuple[str, str], Deque[_Waiter]] = defaultdict(deque)
+        self._served: Dict[str, int] = defaultdict(int)
+        self._turn = 0
+
+    @asynccontextmanager
+    async def slot(self, platform: str, priority: str) -> AsyncIterator[None]:
+        """Hold one unit of capacity for the duration of the block"""
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class {priority!r}")
+        started = time.monotonic()
+        if self._has_room() and not self.waiting():
+            self._admit(platform)
+        else:
+            # A request whose deadline passes while queued gives up its place
+            await within_deadline("queue", self._wait(platform, priority))
+        QUEUE_WAIT.labels(priority).observe(time.monotonic() - started)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def _wait(self, platform: str, priority: str) -> None:
+        waiter = _Waiter(platform, priority, asyncio.get_running_loop().create_future())
+        self._queues[(priority, platform)].append(waiter)
+        QUEUE_DEPTH.labels(priority).inc()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just as the caller gave up; hand the slot on
+                self._release()
+            elif waiter in self._queues[(priority, platform)]:
+                self._queues[(priority, platform)].remove(waiter)
+                QUEUE_DEPTH.labels(priority).dec()
+            raise
+
+    def _has_room(self) -> bool:
+        return self.capacity is None or self.active < self.capacity
+
+    def _admit(self, platform: str) -> None:
+        self.active += 1
+        self._turn += 1
+        self._served[platform] = self._turn
+
+    def _release(self) -> None:
+        self.active -= 1
+        while self._has_room():
+            waiter = self._next()
+            if waiter is None:
+                return
+            if waiter.future.done():
+                # Cancelled but not yet unwound
+                continue
+            self._admit(waiter.platform)
+            waiter.future.set_result(None)
+
+    def _next(self) -> Optional[_Waiter]:
+        """Best effective class, then least recently served platform, then oldest"""
+        now = time.monotonic()
+        best, best_key = None, None
+        for (priority, platform), queue in self._queues.items():
+            if not queue:
+                continue
+            head = queue[0]
+            promoted = int((now - head.enqueued_at) / self.promote_after) if self.promote_after else 0
+            key = (max(head.rank - promoted, 0), self._served[platform], head.enqueued_at)
+            if best_key is None or key < best_key:
+                best, best_key = (priority, platform), key
+        if best is None:
+            return None
+        QUEUE_DEPTH.labels(best[0]).dec()
+        return self._queues[best].popleft()
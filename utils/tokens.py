@@ -0,0 +1,233 @@
+"""
+Prompt token estimation, per-call-site budgets and usage accounting.
+
+``estimate_tokens`` is a fast local approximation of the GPT tokenizer
+(within ~10% on English prose). Budgets are enforced before a prompt is
+built: history is trimmed first, then the policy excerpt, and order
+details are never cut. Every LLM call is recorded against the order and
+platform of the workflow it runs under.
+"""
+import functools
+import inspect
+import re
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from prometheus_client import Counter
+
+# Words, numbers and individual punctuation marks each cost roughly one token
+_PIECES = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+CONTEXT_LIMITS = {"gpt-4": 8192, "gpt-4o": 128000, "gpt-4o-mini": 128000}
+COMPLETION_RESERVE = 1024
+
+# Prompt budgets per call site, leaving room for the completion
+PROMPT_BUDGETS: Dict[str, int] = {
+    "analyze_policy": 1500,
+    "analyze_response": 1500,
+    "analyze_response_batch": 6000,
+    "process_receipt": 3000,
+    "process_receipt_image": 2000,
+    "validate_evidence": 1500,
+    "generate_request": 3000,
+    "personalize_request": 300,
+    "generate_escalation": 4000,
+    "generate_consolidated_request": 5000,
+}
+
+# Instructions and field labels of a prompt template
+PROMPT_OVERHEAD_TOKENS = 150
+
+PROMPT_OVER_BUDGET = Counter(
+    "refund_prompt_over_budget_total",
+    "Prompts sent although their estimated size exceeded the call-site budget",
+    ["call_site"],
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count; long words split into several BPE tokens"""
+    count = 0
+    for piece in _PIECES.findall(text):
+        count += 1 + len(piece) // 8
+    return count
+
+
+def image_tokens(width: int, height: int) -> int:
+    """Tokens for one high-detail image: 170 per 512px tile after OpenAI's rescaling, plus 85"""
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    tiles = -(-int(width) // 512) * -(-int(height) // 512)
+    return 85 + 170 * tiles
+
+
+def prompt_budget(call_site: str, model: str = "gpt-4") -> int:
+    limit = CONTEXT_LIMITS.get(model, 8192) - COMPLETION_RESERVE
+    return min(PROMPT_BUDGETS.get(call_site, limit), limit)
+
+
+def fit_history(history: Sequence[str], max_tokens: int) -> List[str]:
+    """Keep the most recent messages that fit; the newest is tail-truncated if alone too big"""
+    kept: List[str] = []
+    remaining = max_tokens
+    for message in reversed(history):
+        cost = estimate_tokens(message)
+        if cost <= remaining:
+            kept.append(message)
+            remaining -= cost
+        elif not kept and remaining > 0:
+            kept.append(message[-remaining * 4:])
+            break
+        else:
+            break
+    return list(reversed(kept))
+
+
+def fit_text(text: str, max_tokens: int) -> str:
+    """Keep whole lines from the start and end of ``text`` that fit, dropping the middle"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    lines = text.splitlines()
+    head: List[str] = []
+    tail: List[str] = []
+    remaining = max_tokens - estimate_tokens("...")
+    # Alternate ends so a receipt keeps both its header (order ID, date) and its totals
+    while lines:
+        line = lines.pop(0) if len(head) <= len(tail) else lines.pop()
+        cost = estimate_tokens(line)
+        if cost > remaining:
+            break
+        (head if len(head) <= len(tail) else tail).append(line)
+        remaining -= cost
+    return "\n".join(head + ["..."] + list(reversed(tail)))
+
+
+def allocate(call_site: str, fixed: str, policy_tokens: int,
+             history: Sequence[str] = ()) -> Tuple[int, List[str]]:
+    """Split a call site's budget: fixed text first, then policy, then history"""
+    remaining = prompt_budget(call_site) - PROMPT_OVERHEAD_TOKENS - estimate_tokens(fixed)
+    policy_tokens = max(0, min(policy_tokens, remaining))
+    return policy_tokens, fit_history(history, remaining - policy_tokens)
+
+
+class TokenLedger:
+    """Prompt/completion token totals per order and per (platform, call site)"""
+
+    def __init__(self, max_orders: int = 10000):
+        self.max_orders = max_orders
+        self.orders: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.platforms: Dict[Tuple[str, str], Dict[str, float]] = defaultdict(
+            lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "latency_seconds": 0.0}
+        )
+
+    def record(self, call_site: str, prompt_tokens: int, completion_tokens: int, latency: float) -> None:
+        shared = _shared_scopes.get()
+        if shared:
+            # One call made on behalf of several orders (micro-batch, consolidated request):
+            # each gets an equal share of it, and the token remainder goes to the first few
+            # so the shares add up to the call
+            n = len(shared)
+            prompt_share, prompt_rest = divmod(prompt_tokens, n)
+            completion_share, completion_rest = divmod(completion_tokens, n)
+            for i, scope in enumerate(shared):
+                self._record(scope, call_site, prompt_share + (i < prompt_rest),
+                             completion_share + (i < completion_rest), latency / n, share=1 / n)
+            return
+        self._record(_usage_scope.get(), call_site, prompt_tokens, completion_tokens, latency)
+
+    def _record(self, scope: Optional[Tuple[str, str]], call_site: str, prompt_tokens: int,
+                completion_tokens: int, latency: float, share: float = 1.0) -> None:
+        order_id, platform = scope or (None, "unscoped")
+        stats = self.platforms[(platform, call_site)]
+        stats["calls"] += share
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        stats["latency_seconds"] += latency
+
+        if order_id is None:
+            return
+        order = self.orders.pop(order_id, None) or {
+            "platform": platform, "prompt_tokens": 0, "completion_tokens": 0, "calls": []
+        }
+        order["prompt_tokens"] += prompt_tokens
+        order["completion_tokens"] += completion_tokens
+        order["calls"].append({
+            "call_site": call_site,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency_seconds": round(latency, 4),
+            **({"share": round(share, 4)} if share < 1 else {}),
+        })
+        self.orders[order_id] = order
+        while len(self.orders) > self.max_orders:
+            self.orders.popitem(last=False)
+
+    def order_usage(self, order_id: str) -> Optional[Dict[str, Any]]:
+        return self.orders.get(order_id)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Per platform and call site, most expensive first"""
+        rows = [
+            # Shares of shared calls are fractions; float sums of them can be off in the last digits
+            {"platform": platform, "call_site": call_site, **stats, "calls": round(stats["calls"], 4)}
+            for (platform, call_site), stats in self.platforms.items()
+        ]
+        return sorted(rows, key=lambda r: r["prompt_tokens"] + r["completion_tokens"], reverse=True)
+
+
+_usage_scope: ContextVar[Optional[Tuple[str, str]]] = ContextVar("refund_usage_scope", default=None)
+
+
+@contextmanager
+def usage_scope(order_id: str, platform: str) -> Iterator[None]:
+    token = _usage_scope.set((order_id, platform))
+    try:
+        yield
+    finally:
+        _usage_scope.reset(token)
+
+
+_shared_scopes: ContextVar[Tuple[Optional[Tuple[str, str]], ...]] = ContextVar(
+    "refund_shared_usage_scopes", default=()
+)
+
+
+def current_usage_scope() -> Optional[Tuple[str, str]]:
+    return _usage_scope.get()
+
+
+@contextmanager
+def shared_usage_scope(scopes: Sequence[Optional[Tuple[str, str]]]) -> Iterator[None]:
+    """Split LLM usage inside the block evenly across the given (order_id, platform) scopes"""
+    token = _shared_scopes.set(tuple(scopes))
+    try:
+        yield
+    finally:
+        _shared_scopes.reset(token)
+
+
+def account_usage(func):
+    """Attribute LLM usage inside an async RefundAgent method to its order and platform"""
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        arguments = signature.bind(*args, **kwargs).arguments
+        with usage_scope(arguments.get("order_id"), arguments.get("platform")):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+def check_budget(call_site: str, prompt_tokens: int, model: str = "gpt-4") -> bool:
+    """Count prompts that exceed the budget; they are still sent rather than cut blindly"""
+    if prompt_tokens <= prompt_budget(call_site, model):
+        return True
+    PROMPT_OVER_BUDGET.labels(call_site).inc()
+    return False
+
+
+ledger = TokenLedger()
@@ -0,0 +1,238 @@
+"""
+Per-order tracing for the refund pipeline.
+
+A trace is started for every ``initiate_refund`` / ``handle_response`` call
+and carried through the components with a context variable, so any code
+running under it can open child spans with ``tracer.span(...)``. Sampling
+is decided once per trace; unsampled traces only cost a context lookup.
+
+Configured from the environment:
+    REFUND_TRACE_FILE           append finished spans as JSON lines
+    REFUND_TRACE_OTLP_ENDPOINT  POST OTLP/JSON batches (e.g. http://localhost:4318/v1/traces)
+    REFUND_TRACE_SAMPLE_RATE    fraction of traces kept (default 1.0 when exporting)
+"""
+import functools
+import inspect
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from loguru import logger
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, trace: "_Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.status = "ok"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class _Trace:
+    __slots__ = ("trace_id", "spans")
+
+    def __init__(self):
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.spans: List[Span] = []
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("refund_current_span", default=None)
+
+
+class SpanExporter(ABC):
+    """Exports finished traces from a background thread so requests never wait on I/O"""
+
+    def __init__(self):
+        self._queue: "queue.Queue[List[Dict[str, Any]]]" = queue.Queue(maxsize=1000)
+        threading.Thread(target=self._run, name=type(self).__name__, daemon=True).start()
+
+    def submit(self, spans: List[Dict[str, Any]]) -> None:
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning("Trace export queue full, dropping trace")
+
+    def flush(self, timeout: float = 5.0) -> None:
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _run(self) -> None:
+        while True:
+            spans = self._queue.get()
+            try:
+                self.export(spans)
+            except Exception as e:
+                logger.error(f"Error exporting trace: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    @abstractmethod
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        """Send one finished trace; runs on the exporter thread"""
+        pass
+
+
+class FileSpanExporter(SpanExporter):
+    def __init__(self, path: str):
+        self.path = path
+        super().__init__()
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a") as f:
+            for span in spans:
+                f.write(json.dumps(span, default=str) + "\n")
+
+
+class OTLPHttpSpanExporter(SpanExporter):
+    """Posts spans in the OTLP/HTTP JSON encoding to a collector"""
+
+    def __init__(self, endpoint: str, service_name: str = "refund-agent"):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        super().__init__()
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+            "scopeSpans": [{"scope": {"name": "refund-agent"}, "spans": [
+                {
+                    "traceId": span["trace_id"],
+                    "spanId": span["span_id"],
+                    "parentSpanId": span["parent_span_id"] or "",
+                    "name": span["name"],
+                    "startTimeUnixNano": str(span["start_time_unix_nano"]),
+                    "endTimeUnixNano": str(span["end_time_unix_nano"]),
+                    "attributes": [_otlp_attribute(k, v) for k, v in span["attributes"].items()],
+                    "status": {"code": 1 if span["status"] == "ok" else 2},
+                }
+                for span in spans
+            ]}],
+        }]}
+        request = urllib.request.Request(
+            self.endpoint,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        urllib.request.urlopen(request, timeout=5).close()
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Tracer:
+    def __init__(self, exporter: Optional[SpanExporter] = None, sample_rate: float = 1.0):
+        self.exporter = exporter
+        self.sample_rate = sample_rate if exporter else 0.0
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        exporter: Optional[SpanExporter] = None
+        if os.getenv("REFUND_TRACE_OTLP_ENDPOINT"):
+            exporter = OTLPHttpSpanExporter(os.environ["REFUND_TRACE_OTLP_ENDPOINT"])
+        elif os.getenv("REFUND_TRACE_FILE"):
+            exporter = FileSpanExporter(os.environ["REFUND_TRACE_FILE"])
+        return cls(exporter, float(os.getenv("REFUND_TRACE_SAMPLE_RATE", "1.0")))
+
+    @contextmanager
+    def start_trace(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """Open a root span; everything awaited inside it is part of the trace"""
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            yield None
+            return
+        trace = _Trace()
+        try:
+            with self._open(trace, name, None, attributes) as span:
+                yield span
+        finally:
+            self.exporter.submit([s.to_dict() for s in trace.spans])
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """Open a child span of the current one; a no-op outside a sampled trace"""
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+        with self._open(parent.trace, name, parent.span_id, attributes) as span:
+            yield span
+
+    @contextmanager
+    def _open(self, trace: _Trace, name: str, parent_id: Optional[str],
+              attributes: Dict[str, Any]) -> Iterator[Span]:
+        span = Span(trace, name, parent_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.attributes["error"] = type(e).__name__
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            trace.spans.append(span)
+            _current_span.reset(token)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def trace_workflow(name: str, attributes: Sequence[str] = ()):
+    """Start a trace around an async RefundAgent method, tagging the named arguments"""
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not tracer.sample_rate:
+                return await func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            tags = {key: bound.arguments[key] for key in attributes if key in bound.arguments}
+            with tracer.start_trace(name, **tags) as span:
+                result = await func(*args, **kwargs)
+                if span is not None and isinstance(result, dict):
+                    span.set_attribute("result_status", result.get("status"))
+                return result
+        return wrapper
+    return decorator
+
+
+tracer = Tracer.from_env()